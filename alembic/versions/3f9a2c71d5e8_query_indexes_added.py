@@ -0,0 +1,61 @@
+"""query indexes added
+
+Revision ID: 3f9a2c71d5e8
+Revises: 7c1e0d4b9a62
+Create Date: 2026-10-17 11:48:03.517920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a2c71d5e8'
+down_revision: Union[str, None] = '7c1e0d4b9a62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The product_id index is unique, which fails halfway on duplicates, so they are reported up front
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT product_id, COUNT(*) FROM inventory GROUP BY product_id HAVING COUNT(*) > 1 LIMIT 10"
+    )).all()
+    if duplicates:
+        raise RuntimeError(
+            "inventory has several rows for these products, keep one row per product before upgrading: "
+            + ", ".join(f"{product_id} ({count} rows)" for product_id, count in duplicates)
+        )
+
+    # Indexes are built concurrently on Postgres so large tables stay writable during the upgrade
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_sales_created_at_active', 'sales', ['created_at', 'id'], unique=False,
+            postgresql_where=sa.text('is_active'), sqlite_where=sa.text('is_active = 1'),
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_sales_product_id_created_at', 'sales', ['product_id', 'created_at'], unique=False,
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            op.f('ix_inventory_product_id'), 'inventory', ['product_id'], unique=True,
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_inventory_change_inventory_id_created_at', 'inventory_change', ['inventory_id', 'created_at'],
+            unique=False, postgresql_concurrently=True
+        )
+        op.create_index(
+            op.f('ix_product_category_id'), 'product', ['category_id'], unique=False,
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_product_category_id'), table_name='product')
+    op.drop_index('ix_inventory_change_inventory_id_created_at', table_name='inventory_change')
+    op.drop_index(op.f('ix_inventory_product_id'), table_name='inventory')
+    op.drop_index('ix_sales_product_id_created_at', table_name='sales')
+    op.drop_index('ix_sales_created_at_active', table_name='sales')
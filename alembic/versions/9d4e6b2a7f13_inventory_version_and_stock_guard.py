@@ -0,0 +1,30 @@
+"""inventory version and stock guard
+
+Revision ID: 9d4e6b2a7f13
+Revises: 3f9a2c71d5e8
+Create Date: 2026-10-17 14:02:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4e6b2a7f13'
+down_revision: Union[str, None] = '3f9a2c71d5e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Batch mode lets SQLite add the check constraint by recreating the table; Postgres alters in place
+    with op.batch_alter_table('inventory') as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+        batch_op.create_check_constraint('ck_inventory_stock_quantity_non_negative', 'stock_quantity >= 0')
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('inventory') as batch_op:
+        batch_op.drop_constraint('ck_inventory_stock_quantity_non_negative', type_='check')
+        batch_op.drop_column('version')
@@ -0,0 +1,40 @@
+"""product search indexes
+
+Revision ID: a4d7e2b9c350
+Revises: f3a8d6c1e927
+Create Date: 2026-10-17 21:12:37.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d7e2b9c350'
+down_revision: Union[str, None] = 'f3a8d6c1e927'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Other databases search with the in-process index in common/search.py
+    if op.get_context().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_product_name_trgm', 'product', ['name'], unique=False,
+            postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}, postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_product_description_trgm', 'product', ['description'], unique=False,
+            postgresql_using='gin', postgresql_ops={'description': 'gin_trgm_ops'}, postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name != 'postgresql':
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_product_description_trgm', table_name='product', postgresql_concurrently=True)
+        op.drop_index('ix_product_name_trgm', table_name='product', postgresql_concurrently=True)
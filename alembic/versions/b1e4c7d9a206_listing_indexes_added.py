@@ -0,0 +1,37 @@
+"""listing indexes added
+
+Revision ID: b1e4c7d9a206
+Revises: a4d7e2b9c350
+Create Date: 2026-10-18 10:24:51.338207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b1e4c7d9a206'
+down_revision: Union[str, None] = 'a4d7e2b9c350'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Pages of GET /product and GET /inventory are read in (created_at, id) order from these
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_product_created_at_active', 'product', ['created_at', 'id'], unique=False,
+            postgresql_where=sa.text('is_active'), sqlite_where=sa.text('is_active = 1'),
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_inventory_created_at_active', 'inventory', ['created_at', 'id'], unique=False,
+            postgresql_where=sa.text('is_active'), sqlite_where=sa.text('is_active = 1'),
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_inventory_created_at_active', table_name='inventory')
+    op.drop_index('ix_product_created_at_active', table_name='product')
@@ -0,0 +1,34 @@
+"""product normalized name index
+
+Revision ID: c9f2e6a1b835
+Revises: b1e4c7d9a206
+Create Date: 2026-10-18 14:02:19.471362
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9f2e6a1b835'
+down_revision: Union[str, None] = 'b1e4c7d9a206'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Serves the prefix filters of common/search.py, the expression must stay identical to sql_normalize
+    if op.get_context().dialect.name != 'postgresql':
+        return
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_product_normalized_name_trgm ON product "
+            "USING gin (trim(regexp_replace(lower(name), '\\W+', ' ', 'g')) gin_trgm_ops)"
+        )
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name != 'postgresql':
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_product_normalized_name_trgm', table_name='product', postgresql_concurrently=True)
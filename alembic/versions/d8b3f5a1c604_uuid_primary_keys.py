@@ -0,0 +1,85 @@
+"""uuid primary keys
+
+Revision ID: d8b3f5a1c604
+Revises: c2a7d4e9f051
+Create Date: 2026-10-17 18:12:37.440981
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8b3f5a1c604'
+down_revision: Union[str, None] = 'c2a7d4e9f051'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Every id column and the primary or foreign key columns that reference one
+COLUMNS = {
+    'category': ['id'],
+    'product': ['id', 'category_id'],
+    'inventory': ['id', 'product_id'],
+    'inventory_change': ['id', 'inventory_id'],
+    'inventory_change_archive': ['id', 'inventory_id'],
+    'inventory_snapshot': ['inventory_id'],
+    'sales': ['id', 'product_id'],
+    'sales_daily_product': ['product_id'],
+    'sales_daily_category': ['category_id'],
+}
+NULLABLE = {('product', 'category_id')}
+
+# (table, column, referenced table), named as Postgres names unnamed foreign keys
+FOREIGN_KEYS = [
+    ('product', 'category_id', 'category'),
+    ('inventory', 'product_id', 'product'),
+    ('inventory_change', 'inventory_id', 'inventory'),
+    ('inventory_change_archive', 'inventory_id', 'inventory'),
+    ('inventory_snapshot', 'inventory_id', 'inventory'),
+    ('sales', 'product_id', 'product'),
+    ('sales_daily_product', 'product_id', 'product'),
+    ('sales_daily_category', 'category_id', 'category'),
+]
+
+
+def _convert(to_type, postgresql_type: str, postgresql_using: str, sqlite_value: str, from_type):
+    """
+    Changes the type of every id column. Postgres converts in place with USING, one rewrite per table,
+    and needs the foreign keys dropped meanwhile; SQLite has no uuid type, so the values are rewritten
+    and the tables rebuilt in batch mode. Tables are rewritten, so run this in a maintenance window on
+    large databases.
+    """
+    if op.get_context().dialect.name == 'postgresql':
+        for table, column, _ in FOREIGN_KEYS:
+            op.drop_constraint(f'{table}_{column}_fkey', table, type_='foreignkey')
+        for table, columns in COLUMNS.items():
+            op.execute(f'ALTER TABLE {table} ' + ', '.join(
+                f'ALTER COLUMN {column} TYPE {postgresql_type} USING {postgresql_using.format(column=column)}'
+                for column in columns
+            ))
+        for table, column, referenced in FOREIGN_KEYS:
+            op.create_foreign_key(f'{table}_{column}_fkey', table, referenced, [column], ['id'])
+        return
+
+    for table, columns in COLUMNS.items():
+        assignments = ', '.join(f'{column} = {sqlite_value.format(column=column)}' for column in columns)
+        op.execute(f'UPDATE {table} SET {assignments}')
+        with op.batch_alter_table(table) as batch_op:
+            for column in columns:
+                batch_op.alter_column(
+                    column, type_=to_type, existing_type=from_type, existing_nullable=(table, column) in NULLABLE
+                )
+
+
+def upgrade() -> None:
+    _convert(sa.Uuid(), 'uuid', '{column}::uuid', "lower(replace({column}, '-', ''))", sa.String())
+
+
+def downgrade() -> None:
+    _convert(
+        sa.String(), 'varchar', '{column}::text',
+        "substr({column}, 1, 8) || '-' || substr({column}, 9, 4) || '-' || substr({column}, 13, 4) || '-' || "
+        "substr({column}, 17, 4) || '-' || substr({column}, 21)",
+        sa.Uuid()
+    )
@@ -0,0 +1,90 @@
+"""multi currency sales
+
+Revision ID: f3a8d6c1e927
+Revises: e5c9a3f7b214
+Create Date: 2026-10-17 20:31:09.684127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a8d6c1e927'
+down_revision: Union[str, None] = 'e5c9a3f7b214'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Minor units per major unit, by ISO 4217 exponent
+MINOR_UNITS = (
+    "CASE WHEN currency IN ('BIF', 'CLP', 'DJF', 'GNF', 'ISK', 'JPY', 'KMF', 'KRW', 'PYG', 'RWF', 'UGX', 'UYI', "
+    "'VND', 'VUV', 'XAF', 'XOF', 'XPF') THEN 1 "
+    "WHEN currency IN ('BHD', 'IQD', 'JOD', 'KWD', 'LYD', 'OMR', 'TND') THEN 1000 ELSE 100 END"
+)
+
+ROLLUPS = {'sales_daily_product': ('product_id', 'product'), 'sales_daily_category': ('category_id', 'category')}
+
+
+def _rebuild_rollups(revenue: str, revenue_type, by_currency: bool):
+    """
+    Recreates both rollup tables with the given revenue column, and currency in the primary key if asked,
+    then fills them from the sales table
+    """
+    for table, (key, referenced) in ROLLUPS.items():
+        op.drop_table(table)
+        currency = [sa.Column('currency', sa.String(length=3), nullable=False)] if by_currency else []
+        op.create_table(
+            table,
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column(key, sa.Uuid(), nullable=False),
+            *currency,
+            sa.Column('quantity', sa.Integer(), nullable=False),
+            sa.Column(revenue, revenue_type, nullable=False),
+            sa.Column('sales_count', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint([key], [f'{referenced}.id'], ),
+            sa.PrimaryKeyConstraint('day', key, *(['currency'] if by_currency else []))
+        )
+
+        source = 'sales.currency, ' if by_currency else ''
+        group = ', sales.currency' if by_currency else ''
+        join = '' if key == 'product_id' else ' JOIN product ON product.id = sales.product_id'
+        key_column = 'sales.product_id' if key == 'product_id' else 'product.category_id'
+        amount = 'sales.amount_minor' if by_currency else 'sales.amount'
+        op.execute(
+            f'INSERT INTO {table} (day, {key}, {"currency, " if by_currency else ""}quantity, '
+            f'{revenue}, sales_count) '
+            f'SELECT date(sales.created_at), {key_column}, {source}sum(sales.quantity), sum({amount}), '
+            f'count(sales.id) FROM sales{join} WHERE sales.is_active AND {key_column} IS NOT NULL '
+            f'GROUP BY date(sales.created_at), {key_column}{group}'
+        )
+
+
+def upgrade() -> None:
+    op.create_table(
+        'fx_rate',
+        sa.Column('currency', sa.String(length=3), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('rate', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('currency', 'day')
+    )
+
+    op.add_column('sales', sa.Column('amount_minor', sa.BigInteger(), nullable=True))
+    op.add_column('sales', sa.Column('currency', sa.String(length=3), nullable=True))
+    # Existing sales were recorded in their product's currency
+    op.execute('UPDATE sales SET currency = (SELECT product.currency FROM product WHERE product.id = sales.product_id)')
+    op.execute(f'UPDATE sales SET amount_minor = CAST(round(amount * {MINOR_UNITS}) AS BIGINT)')
+    with op.batch_alter_table('sales') as batch_op:
+        batch_op.alter_column('amount_minor', existing_type=sa.BigInteger(), nullable=False)
+        batch_op.alter_column('currency', existing_type=sa.String(length=3), nullable=False)
+
+    _rebuild_rollups('revenue_minor', sa.BigInteger(), by_currency=True)
+
+
+def downgrade() -> None:
+    _rebuild_rollups('revenue', sa.Float(), by_currency=False)
+
+    with op.batch_alter_table('sales') as batch_op:
+        batch_op.drop_column('currency')
+        batch_op.drop_column('amount_minor')
+    op.drop_table('fx_rate')
@@ -1,13 +1,26 @@
 from typing import Dict
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 
+from common.cache import category_cache, product_cache, report_cache
+from common.metrics import MetricsMiddleware, instrument, metrics
+from database.db import engine, read_engine
 from routes.product import product_router
 from routes.category import category_router
-from routes.sales import sales_router
+from routes.dashboard import dashboard_router
+from routes.sales import order_writer, sales_router
 from routes.inventory import inventory_router
 
 app = FastAPI(openapi_url="/openapi.json", title="Forsit Assessment")
+app.add_middleware(MetricsMiddleware)
+for database_engine in (engine, read_engine):
+    instrument(database_engine)
+
+
+@app.on_event("shutdown")
+async def drain_order_writer():
+    await order_writer.stop()
 
 
 @app.get("/ping", tags=["Health"])
@@ -15,8 +28,19 @@ async def read_root() -> Dict:
     return {"message": "pong"}
 
 
+@app.get("/cache/stats", tags=["Health"])
+async def cache_stats() -> Dict:
+    return {"category": category_cache.stats(), "product": product_cache.stats(), "report": report_cache.stats()}
+
+
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+async def read_metrics() -> str:
+    return metrics.render()
+
+
 app.router.prefix = "/api/v1"
 app.include_router(product_router, prefix="/product", tags=["Products"])
 app.include_router(category_router, prefix="/category", tags=["Category"])
 app.include_router(sales_router, prefix="/sales", tags=["Sales"])
 app.include_router(inventory_router, prefix="/inventory", tags=["Inventory"])
+app.include_router(dashboard_router, prefix="/dashboard", tags=["Dashboard"])
@@ -0,0 +1,44 @@
+from typing import List
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select
+from sqlalchemy.orm import Session
+
+MAX_BATCH_IDS = 5000
+# Ids bound per IN list, well below the bind parameter limits of SQLite and asyncpg
+BATCH_CHUNK_SIZE = 1000
+IDS_DESCRIPTION = (
+    f"Ids to look up, comma-separated or repeated, at most {MAX_BATCH_IDS}. "
+    "POST them as a JSON list when they do not fit in a URL"
+)
+
+
+def parse_ids(values: List[str]) -> List[str]:
+    """
+    Splits comma-separated query values into distinct ids, keeping their order
+    :param values: List[str]
+    :return: List[str]
+    """
+    ids = list(dict.fromkeys(id.strip() for value in values for id in value.split(",") if id.strip()))
+    if len(ids) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {MAX_BATCH_IDS} ids can be looked up at once"
+        )
+    return ids
+
+
+async def fetch_by_ids(db: Session, query: Select, column, ids: List[str]) -> list:
+    """
+    Runs a query for every chunk of ids with one IN list each
+    :param db: Session
+    :param query: Select of the columns to return
+    :param column: column the ids are matched against
+    :param ids: List[str]
+    :return: list of rows, in no particular order
+    """
+    rows = []
+    for start in range(0, len(ids), BATCH_CHUNK_SIZE):
+        result = await db.execute(query.where(column.in_(ids[start:start + BATCH_CHUNK_SIZE])))
+        rows.extend(result.all())
+    return rows
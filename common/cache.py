@@ -0,0 +1,108 @@
+import hashlib
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Hashable, Optional
+
+from fastapi import Request, Response, status
+
+from config.config import settings
+
+
+class TTLCache:
+    """
+    In-process cache bounded by entry count (least recently used entries are evicted first)
+    and by age. Values are shared between requests and must not be mutated by callers.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+category_cache = TTLCache(settings.CATALOG_CACHE_MAX_ENTRIES, settings.CATALOG_CACHE_TTL)
+product_cache = TTLCache(settings.CATALOG_CACHE_MAX_ENTRIES, settings.CATALOG_CACHE_TTL)
+# Reports over periods that have ended, which new sales no longer change
+report_cache = TTLCache(settings.REPORT_CACHE_MAX_ENTRIES, settings.REPORT_CACHE_TTL)
+
+
+class TableVersions:
+    """
+    Per-table write counters of this worker, bumped once a write to the table is committed. ETags combine
+    them with the current ETAG_EPOCH_SECONDS window of the wall clock, so a write made by another worker
+    or outside the API changes every ETag within one window at the latest.
+
+    The ETag is not derived from the data it is sent with, so freshness is only bounded by that window:
+    a client may be told its copy is current for up to ETAG_EPOCH_SECONDS after another worker's write.
+    Reads served from the read replica can also carry an ETag computed after a bump while the replica
+    has not applied the write yet; that stale copy then stays current until the next bump or window.
+    """
+
+    def __init__(self):
+        self._versions = Counter()
+
+    def bump(self, *models):
+        for model in models:
+            self._versions[model.__tablename__] += 1
+
+    def etag(self, request: Request, *models, variant: Optional[str] = None) -> str:
+        """
+        Weak ETag of a GET response built from the tables it reads, the path, the query string and its variant
+        :param request: Request
+        :param models: models the response is read from
+        :param variant: Optional[str] representation picked from request headers, such as the negotiated format
+        :return: str
+        """
+        epoch = int(time.time() // settings.ETAG_EPOCH_SECONDS)
+        versions = [self._versions[model.__tablename__] for model in models]
+        key = repr((epoch, versions, request.url.path, request.url.query, variant)).encode()
+        return f'W/"{hashlib.sha1(key).hexdigest()}"'
+
+
+table_versions = TableVersions()
+
+
+def not_modified(request: Request, response: Response, *models, variant: Optional[str] = None) -> Optional[Response]:
+    """
+    Sets the ETag of a GET response and answers If-None-Match without running the route's queries
+    :param request: Request
+    :param response: Response injected into the route
+    :param models: models the response is read from
+    :param variant: Optional[str] format negotiated from the Accept header, also sends Vary: Accept
+    :return: a 304 Response when the client's copy is current, otherwise None
+    """
+    etag = table_versions.etag(request, *models, variant=variant)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if variant is not None:
+        headers["Vary"] = "Accept"
+    response.headers.update(headers)
+    match = request.headers.get("if-none-match")
+    # If-None-Match compares weakly, a W/ prefix on either side is ignored
+    if match and (match.strip() == "*" or etag[2:] in [value.strip().removeprefix("W/") for value in match.split(",")]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return None
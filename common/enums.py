@@ -16,3 +16,19 @@ class Period(str, PEnum):
     WEEKLY = "weekly"
     MONTHLY = "monthly"
     ANNUAL = "annual"
+
+
+class ExportFormat(str, PEnum):
+    JSON = "json"
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+
+class TopSalesBy(str, PEnum):
+    PRODUCT = "product"
+    CATEGORY = "category"
+
+
+class SalesMetric(str, PEnum):
+    REVENUE = "revenue"
+    UNITS = "units"
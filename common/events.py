@@ -0,0 +1,73 @@
+import asyncio
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, Optional, Set
+
+from config.config import settings
+
+
+class Broadcaster:
+    """
+    In-process publish/subscribe fan-out. Every subscriber gets its own bounded queue; when a slow
+    subscriber's queue is full its oldest event is dropped, so publishers never wait on readers.
+    Subscribers only see events published by the same process.
+    """
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    @contextmanager
+    def subscribe(self) -> Iterator[asyncio.Queue]:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers.discard(queue)
+
+    def publish(self, event: dict):
+        for queue in self._subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    def stats(self) -> dict:
+        return {"subscribers": len(self._subscribers)}
+
+
+def stock_crossing(
+        inventory_id: str,
+        product_id: str,
+        old_stock: int,
+        current_stock: int,
+        old_threshold: Optional[int],
+        reorder_threshold: Optional[int]
+) -> Optional[dict]:
+    """
+    Builds an alert when a product moves across its reorder threshold: low_stock when stock ends up at
+    the threshold or below, restocked when it ends up above it again. Products without a threshold never alert.
+    :param inventory_id: str
+    :param product_id: str
+    :param old_stock: int
+    :param current_stock: int
+    :param old_threshold: Optional[int] threshold before the change, same as reorder_threshold for stock changes
+    :param reorder_threshold: Optional[int]
+    :return: Optional[dict]
+    """
+    was_low = old_threshold is not None and old_stock <= old_threshold
+    is_low = reorder_threshold is not None and current_stock <= reorder_threshold
+    if was_low == is_low:
+        return None
+    return {
+        "type": "low_stock" if is_low else "restocked",
+        "inventory_id": inventory_id,
+        "product_id": product_id,
+        "old_stock": old_stock,
+        "stock_quantity": current_stock,
+        "reorder_threshold": reorder_threshold,
+        "created_at": datetime.now().isoformat()
+    }
+
+
+stock_alerts = Broadcaster(settings.ALERT_QUEUE_SIZE)
@@ -0,0 +1,104 @@
+import csv
+import io
+from datetime import datetime
+from enum import Enum
+from typing import AsyncIterator, Iterable, List, Optional, Sequence, Union
+
+import orjson
+from fastapi import Response
+from sqlalchemy.ext.asyncio import AsyncResult
+
+from common.enums import ExportFormat
+
+EXPORT_CHUNK_SIZE = 1000
+
+FAST_DESCRIPTION = "Select only the response columns and encode them with orjson, skipping model validation"
+
+MEDIA_TYPES = {
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.CSV: "text/csv",
+}
+
+
+def negotiate_format(format: Optional[ExportFormat], accept: Optional[str]) -> ExportFormat:
+    """
+    Picks the response format from an explicit format parameter, falling back to the Accept header
+    :param format: Optional[ExportFormat]
+    :param accept: Optional[str]
+    :return: ExportFormat
+    """
+    if format:
+        return format
+    for export_format, media_type in MEDIA_TYPES.items():
+        if accept and media_type in accept:
+            return export_format
+    return ExportFormat.JSON
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def nested_records(columns: Sequence[str], rows: Iterable[Sequence]) -> List[dict]:
+    """
+    Builds plain dicts from column tuples, nesting columns named product_<field> under "product"
+    :param columns: Sequence[str]
+    :param rows: Iterable of row tuples
+    :return: List[dict]
+    """
+    keys = [
+        (column[len("product_"):], True) if column.startswith("product_") else (column, False)
+        for column in columns
+    ]
+    records = []
+    for row in rows:
+        record, product = {}, {}
+        for (key, is_product), value in zip(keys, row):
+            if is_product:
+                product[key] = value
+            else:
+                record[key] = value
+        if product:
+            record["product"] = product
+        records.append(record)
+    return records
+
+
+def json_response(response: Response, records: Union[list, dict]) -> Response:
+    """
+    Encodes plain records with orjson, skipping response_model validation, and keeps
+    headers already set on the injected response such as the next page cursor
+    :param response: Response injected into the route
+    :param records: list of dicts, or dicts keyed by id
+    :return: Response
+    """
+    return Response(orjson.dumps(records), media_type="application/json", headers=dict(response.headers))
+
+
+def _ndjson(columns, rows) -> bytes:
+    return b"".join(orjson.dumps(record) + b"\n" for record in nested_records(columns, rows))
+
+
+def _csv(rows) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([_plain(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+
+async def stream_rows(result: AsyncResult, export_format: ExportFormat) -> AsyncIterator[bytes]:
+    """
+    Encodes a streamed result chunk by chunk, so memory use does not grow with the result size.
+    Columns named product_<field> are nested under "product" in NDJSON records.
+    :param result: AsyncResult from AsyncSession.stream
+    :param export_format: ExportFormat.NDJSON or ExportFormat.CSV
+    :return: AsyncIterator[bytes]
+    """
+    columns = list(result.keys())
+    if export_format == ExportFormat.CSV:
+        yield _csv([columns])
+    async for rows in result.partitions(EXPORT_CHUNK_SIZE):
+        yield _csv(rows) if export_format == ExportFormat.CSV else _ndjson(columns, rows)
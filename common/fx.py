@@ -0,0 +1,118 @@
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, Iterable, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session
+
+from common import rollups
+from common.cache import TTLCache
+from config.config import settings
+from models import FxRate
+
+# ISO 4217 currencies whose minor unit is not a hundredth of the major unit
+MINOR_UNIT_EXPONENTS = {
+    **dict.fromkeys(
+        ["BIF", "CLP", "DJF", "GNF", "ISK", "JPY", "KMF", "KRW", "PYG", "RWF", "UGX", "UYI", "VND", "VUV", "XAF",
+         "XOF", "XPF"], 0
+    ),
+    **dict.fromkeys(["BHD", "IQD", "JOD", "KWD", "LYD", "OMR", "TND"], 3),
+}
+CURRENCY_PATTERN = "^[A-Z]{3}$"
+TARGET_CURRENCY_DESCRIPTION = "Currency to report revenue in, defaults to FX_BASE_CURRENCY"
+
+rate_cache = TTLCache(max_entries=366, ttl=settings.FX_RATE_CACHE_TTL)
+
+
+def exponent(currency: str) -> int:
+    return MINOR_UNIT_EXPONENTS.get(currency, 2)
+
+
+def to_minor(amount: float, currency: str) -> int:
+    """
+    Converts an amount to exact minor units, rounding half up on the decimal value the client sent
+    :param amount: float
+    :param currency: str
+    :return: int
+    """
+    return int(Decimal(str(amount)).scaleb(exponent(currency)).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_minor(amount: float, currency: str) -> float:
+    return round(amount / 10 ** exponent(currency), exponent(currency))
+
+
+async def rates_on(db: Session, day: date) -> Dict[str, float]:
+    """
+    Latest known rate of every currency on or before a day, cached per day
+    :param db: Session
+    :param day: date
+    :return: Dict[str, float] shared with other requests, must not be mutated
+    """
+    rates = rate_cache.get(day)
+    if rates is None:
+        latest = (
+            select(FxRate.currency, func.max(FxRate.day).label("day"))
+            .where(FxRate.day <= day)
+            .group_by(FxRate.currency)
+            .subquery()
+        )
+        result = await db.execute(
+            select(FxRate.currency, FxRate.rate)
+            .join(latest, and_(FxRate.currency == latest.c.currency, FxRate.day == latest.c.day))
+        )
+        rates = {settings.FX_BASE_CURRENCY: 1.0, **dict(result.all())}
+        rate_cache.set(day, rates)
+    return rates
+
+
+async def conversion_factors(db: Session, target_currency: str, day: date) -> Dict[str, float]:
+    """
+    Multipliers that turn minor units of every currency with a known rate into minor units of the target
+    currency at the rates of a day; the target currency itself maps to exactly 1 so its sums stay exact
+    :param db: Session
+    :param target_currency: str
+    :param day: date
+    :return: Dict[str, float]
+    """
+    rates = await rates_on(db, day)
+    if target_currency not in rates:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"No exchange rate for {target_currency} on or before {day}"
+        )
+    return {
+        currency: 1 if currency == target_currency else
+        rate / rates[target_currency] * 10 ** (exponent(target_currency) - exponent(currency))
+        for currency, rate in rates.items()
+    }
+
+
+async def unconverted_totals(
+        db: Session,
+        rows: Iterable,
+        start: datetime,
+        end: datetime,
+        factors: Dict[str, float],
+        product_id: Optional[str] = None,
+        category_id: Optional[str] = None
+) -> Dict[str, float]:
+    """
+    Revenue that converted totals left out for lack of a rate, per currency in that currency. Only runs a query
+    when a row flagged an unconverted currency, since the flag names one of them at most.
+    :param db: Session
+    :param rows: rows with an unconverted column from rollups.sales_totals
+    :param start: datetime start of the range the rows were totalled over
+    :param end: datetime end of the range, excluded
+    :param factors: Dict[str, float] the rows were converted with
+    :param product_id: Optional[str] filter the rows were totalled with
+    :param category_id: Optional[str] filter the rows were totalled with
+    :return: Dict[str, float]
+    """
+    if not any(row.unconverted for row in rows):
+        return {}
+    result = await db.execute(
+        rollups.sales_totals(start, end, by="currency", product_id=product_id, category_id=category_id)
+    )
+    return {row.key: from_minor(row.revenue, row.key) for row in result if row.key not in factors}
@@ -0,0 +1,135 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from common.metrics import current_request
+from common.retry import run_with_retry
+from database.db import SessionLocal
+
+
+class GroupCommitWriter:
+    """
+    Write-behind queue that applies many small writes in one transaction. Callers submit a payload
+    and wait; a background task gathers payloads for up to max_delay seconds or max_batch payloads,
+    runs each inside its own savepoint so a failing one only rolls back itself, and commits the batch once.
+    When the batch hits a database error it is rolled back and every payload is retried on its own.
+    Batches only gather writes from the same process.
+    """
+
+    def __init__(self, operation: Callable[[Session, Any], Awaitable[Any]], max_batch: int, max_delay: float):
+        self.operation = operation
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._batches = 0
+        self._writes = 0
+
+    async def submit(self, payload: Any) -> Any:
+        """
+        Queues a payload and waits until its batch is committed
+        :param payload: passed to the operation as is
+        :return: the operation's result, or raises its exception
+        """
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((payload, future))
+        return await future
+
+    async def stop(self):
+        """
+        Writes what is still queued and stops the background task
+        :return: None
+        """
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "batches": self._batches,
+            "writes": self._writes,
+            "queued": self._queue.qsize() if self._queue else 0,
+        }
+
+    async def _run(self):
+        # The task was started by a request and copied its context, but batches serve many requests
+        current_request.set(None)
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = asyncio.get_running_loop().time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - asyncio.get_running_loop().time()
+                try:
+                    item = self._queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(
+                        self._queue.get(), timeout
+                    )
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._write(batch)
+
+    async def _write(self, batch: List[Tuple[Any, asyncio.Future]]):
+        """
+        Applies a batch in one transaction and settles every caller's future
+        :param batch: list of (payload, future)
+        :return: None
+        """
+        # Callers that went away before their turn are not written at all
+        batch = [(payload, future) for payload, future in batch if not future.done()]
+        if not batch:
+            return
+        outcomes = []
+        try:
+            async with SessionLocal() as db:
+                for payload, _ in batch:
+                    try:
+                        async with db.begin_nested():
+                            outcomes.append((True, await self.operation(db, payload)))
+                    except DBAPIError:
+                        raise
+                    except Exception as error:
+                        outcomes.append((False, error))
+                await db.commit()
+        except Exception:
+            outcomes = [await self._write_one(payload) for payload, _ in batch]
+
+        self._batches += 1
+        self._writes += len(batch)
+        for (_, future), (succeeded, outcome) in zip(batch, outcomes):
+            if future.done():
+                continue
+            if succeeded:
+                future.set_result(outcome)
+            else:
+                future.set_exception(outcome)
+
+    async def _write_one(self, payload: Any) -> Tuple[bool, Any]:
+        """
+        Applies one payload in a transaction of its own, retrying transient errors
+        :param payload: Any
+        :return: (succeeded, result or exception)
+        """
+        async with SessionLocal() as db:
+            async def write():
+                result = await self.operation(db, payload)
+                await db.commit()
+                return result
+
+            try:
+                return True, await run_with_retry(db, write)
+            except Exception as error:
+                return False, error
@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime, time
 from fastapi import HTTPException
 
 
@@ -7,3 +7,13 @@ def parse_date(date_str):
         return datetime.fromisoformat(date_str)
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Please use ISO date format (YYYY-MM-DD).")
+
+
+def parse_end_date(date_str):
+    """
+    Parses the inclusive end of a time range, an end given as a bare date includes that whole day
+    """
+    try:
+        return datetime.combine(date.fromisoformat(date_str), time.max)
+    except ValueError:
+        return parse_date(date_str)
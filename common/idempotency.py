@@ -0,0 +1,221 @@
+import asyncio
+import hashlib
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import orjson
+from fastapi import HTTPException, Response, status
+from pydantic import TypeAdapter
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from config.config import settings
+from database.db import SessionLocal
+from models import IdempotencyKey
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+KEY_DESCRIPTION = "Retries with the same key get the first response back instead of repeating the write"
+PURGE_INTERVAL = 60
+
+# Requests running in this process, so duplicates arriving here wake up as soon as the result is stored
+_in_flight: Dict[Tuple[str, str], asyncio.Event] = {}
+_last_purge = 0.0
+_adapter = lru_cache(maxsize=None)(TypeAdapter)
+
+
+def fingerprint(*parts: Any) -> str:
+    return hashlib.sha256(orjson.dumps(parts, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+def _response(status_code: int, body: bytes, replayed: bool) -> Response:
+    headers = {REPLAYED_HEADER: "true"} if replayed else None
+    return Response(body, status_code=status_code, media_type="application/json", headers=headers)
+
+
+async def _claim(scope: str, key: str, request_hash: str) -> Tuple[Optional[datetime], Optional[IdempotencyKey]]:
+    """
+    Takes a key for this request unless another request holds it
+    :param scope: str
+    :param key: str
+    :param request_hash: str
+    :return: Tuple of the claim's locked_until when claimed, otherwise None and the row of the request holding the key
+    """
+    global _last_purge
+    now = datetime.now()
+    values = {
+        "fingerprint": request_hash,
+        "status_code": None,
+        "response": None,
+        "locked_until": now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT),
+        "expires_at": now + timedelta(seconds=settings.IDEMPOTENCY_TTL)
+    }
+    async with SessionLocal() as db:
+        if time.monotonic() - _last_purge > PURGE_INTERVAL:
+            _last_purge = time.monotonic()
+            await db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < now))
+
+        dialect = db.get_bind().dialect.name
+        while True:
+            inserted = await db.execute(
+                (postgresql.insert if dialect == "postgresql" else sqlite.insert)(IdempotencyKey)
+                .values(scope=scope, key=key, **values)
+                .on_conflict_do_nothing(index_elements=["scope", "key"])
+            )
+            if not inserted.rowcount:
+                # Expired keys and keys whose request died are taken over
+                inserted = await db.execute(
+                    update(IdempotencyKey)
+                    .where(
+                        IdempotencyKey.scope == scope,
+                        IdempotencyKey.key == key,
+                        or_(
+                            IdempotencyKey.expires_at < now,
+                            and_(IdempotencyKey.status_code.is_(None), IdempotencyKey.locked_until < now)
+                        )
+                    )
+                    .values(**values)
+                )
+            await db.commit()
+            if inserted.rowcount:
+                return values["locked_until"], None
+            held = (await db.execute(
+                select(IdempotencyKey).where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+            )).scalar_one_or_none()
+            if held is not None:
+                return None, held
+            # The holder released the key in between, so it can be claimed again
+
+
+def _claimed(scope: str, key: str, claimed_until: datetime) -> tuple:
+    """
+    Conditions matching a key only while this request's claim on it is pending, so a request that was
+    taken over or already stored its response never overwrites the key
+    """
+    return (
+        IdempotencyKey.scope == scope,
+        IdempotencyKey.key == key,
+        IdempotencyKey.status_code.is_(None),
+        IdempotencyKey.locked_until == claimed_until
+    )
+
+
+async def _finish(scope: str, key: str, claimed_until: datetime, status_code: Optional[int], body: Optional[bytes]):
+    """
+    Stores the response of a failed write, or releases the key when there is none to store
+    """
+    async with SessionLocal() as db:
+        where = _claimed(scope, key, claimed_until)
+        if status_code is None:
+            await db.execute(delete(IdempotencyKey).where(*where))
+        else:
+            await db.execute(
+                update(IdempotencyKey).where(*where).values(
+                    status_code=status_code, response=body, locked_until=datetime.now()
+                )
+            )
+        await db.commit()
+
+
+async def _skip_record(db: Session, result: Any):
+    pass
+
+
+async def idempotent(
+        db: Session,
+        scope: str,
+        key: Optional[str],
+        request_hash: str,
+        response_model: Any,
+        status_code: int,
+        operation: Callable[[Callable[[Session, Any], Awaitable[None]]], Awaitable[Any]]
+) -> Any:
+    """
+    Runs a write at most once per Idempotency-Key. The first request stores its response, client errors
+    included; retries with the same key get that response back without running the write, and retries
+    arriving while it is still running wait for it. The operation is given a record callable to await with
+    its session and result right before it commits, so the response is stored in the transaction of the write:
+    a write is never committed without its response, and a retry after a crash never runs it a second time.
+    :param db: Session of the request, rolled back before the outcome of a failed write is stored
+    :param scope: str route the key belongs to
+    :param key: Optional[str] header value, the write runs as usual without one
+    :param request_hash: str fingerprint of the request
+    :param response_model: type the result is serialized as
+    :param status_code: int status of a successful response
+    :param operation: callable taking record and returning an awaitable of the result
+    :return: the operation's result without a key, otherwise a Response
+    """
+    if not key:
+        return await operation(_skip_record)
+
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT
+    delay = 0.01
+    while True:
+        claimed_until, held = await _claim(scope, key, request_hash)
+        if held is None:
+            break
+        if held.fingerprint != request_hash:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used for a different request"
+            )
+        if held.status_code is not None:
+            return _response(held.status_code, held.response, replayed=True)
+        if time.monotonic() >= deadline:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still in progress"
+            )
+        event = _in_flight.get((scope, key))
+        wait = min(delay, deadline - time.monotonic())
+        if event:
+            try:
+                await asyncio.wait_for(event.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+        else:
+            await asyncio.sleep(wait)
+        delay = min(delay * 2, 0.5)
+
+    adapter = _adapter(response_model)
+    body = None
+
+    async def record(write_db: Session, result: Any):
+        nonlocal body
+        # Validated first, so the stored body holds the same fields in the same order as an unkeyed response
+        body = adapter.dump_json(adapter.validate_python(result, from_attributes=True))
+        stored = await write_db.execute(
+            update(IdempotencyKey).where(*_claimed(scope, key, claimed_until)).values(
+                status_code=status_code, response=body, locked_until=datetime.now()
+            )
+        )
+        if not stored.rowcount:
+            # Ran past IDEMPOTENCY_LOCK_TIMEOUT and a retry took the key over, so this write must not commit
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A retry with this Idempotency-Key took over the request"
+            )
+
+    event = _in_flight[(scope, key)] = asyncio.Event()
+    try:
+        try:
+            await operation(record)
+        except HTTPException as error:
+            await db.rollback()
+            # Client errors are as final as successes; server errors release the key for a retry
+            if error.status_code >= 500:
+                await _finish(scope, key, claimed_until, None, None)
+                raise
+            await _finish(scope, key, claimed_until, error.status_code, orjson.dumps({"detail": error.detail}))
+            raise
+        except Exception:
+            await db.rollback()
+            # Only releases the key when the write did not commit, a stored response is kept for retries
+            await _finish(scope, key, claimed_until, None, None)
+            raise
+        return _response(status_code, body, replayed=False)
+    finally:
+        _in_flight.pop((scope, key), None)
+        event.set()
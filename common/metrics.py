@@ -0,0 +1,201 @@
+import contextvars
+import logging
+import random
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from config.config import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+MAX_LOGGED_PARAMETERS = 1000
+
+
+class RequestStats:
+    """
+    Database work done while serving one request
+    """
+    __slots__ = ("method", "path", "statements", "db_seconds", "rows", "slow", "repeats")
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.rows = 0
+        self.slow = 0
+        self.repeats = Counter()
+
+
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "current_request", default=None
+)
+
+
+class Metrics:
+    """
+    In-process request metrics keyed by route template, rendered in the Prometheus text format.
+    Each worker process keeps and exposes its own numbers.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # (method, route, status) -> [per-bucket counts, sum of seconds, count]
+        self._latency = defaultdict(lambda: [[0] * (len(self.buckets) + 1), 0.0, 0])
+        # (method, route) -> [statements, seconds in the database, rows, slow statements, N+1 warnings]
+        self._database = defaultdict(lambda: [0, 0.0, 0, 0, 0])
+
+    def observe(self, method: str, route: str, status: int, seconds: float, stats: RequestStats, repeated: bool):
+        latency = self._latency[(method, route, str(status))]
+        latency[0][next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))] += 1
+        latency[1] += seconds
+        latency[2] += 1
+        database = self._database[(method, route)]
+        database[0] += stats.statements
+        database[1] += stats.db_seconds
+        database[2] += stats.rows
+        database[3] += stats.slow
+        database[4] += repeated
+
+    def clear(self):
+        self._latency.clear()
+        self._database.clear()
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_request_duration_seconds Time to send the whole response",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route, status), (counts, total, count) in sorted(self._latency.items()):
+            labels = f'method="{method}",route="{_escape(route)}",status="{status}"'
+            cumulative = 0
+            for bound, bucket in zip((*self.buckets, "+Inf"), counts):
+                cumulative += bucket
+                lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"http_request_duration_seconds_sum{{{labels}}} {total}")
+            lines.append(f"http_request_duration_seconds_count{{{labels}}} {count}")
+
+        for position, (name, kind, description) in enumerate([
+            ("db_statements_total", "counter", "SQL statements executed"),
+            ("db_time_seconds_total", "counter", "Time spent executing SQL statements"),
+            ("db_rows_total", "counter", "Rows returned or affected by SQL statements"),
+            ("db_slow_statements_total", "counter", "Statements slower than SLOW_QUERY_SECONDS"),
+            ("db_repeated_statement_requests_total", "counter",
+             "Requests running one statement more than N_PLUS_ONE_THRESHOLD times"),
+        ]):
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (method, route), values in sorted(self._database.items()):
+                lines.append(f'{name}{{method="{method}",route="{_escape(route)}"}} {values[position]}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+metrics = Metrics(LATENCY_BUCKETS)
+_route_paths: Dict = {}
+
+
+def _route(scope: dict) -> str:
+    """
+    Route template the request matched, so ids in paths do not create a series each
+    """
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    if endpoint not in _route_paths:
+        _route_paths.update(
+            (route.endpoint, route.path) for route in scope["app"].routes if hasattr(route, "endpoint")
+        )
+    return _route_paths.get(endpoint, "unmatched")
+
+
+class MetricsMiddleware:
+    """
+    Times every HTTP request until its last body chunk is sent and records the database work it did
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope["method"], scope["path"])
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_and_record(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            current_request.reset(token)
+            route = _route(scope)
+            repeated = _warn_repeats(stats, route)
+            metrics.observe(stats.method, route, status, time.perf_counter() - started, stats, repeated)
+
+
+def _warn_repeats(stats: RequestStats, route: str) -> bool:
+    """
+    Logs a likely N+1 query pattern when one statement ran more than N_PLUS_ONE_THRESHOLD times in a request
+    """
+    if not settings.N_PLUS_ONE_THRESHOLD or not stats.repeats:
+        return False
+    statement, count = stats.repeats.most_common(1)[0]
+    if count <= settings.N_PLUS_ONE_THRESHOLD:
+        return False
+    logger.warning("Possible N+1 queries: %s %s ran this statement %d times: %s",
+                   stats.method, route, count, statement)
+    return True
+
+
+def instrument(engine: AsyncEngine):
+    """
+    Adds statement timing, row counting and the sampled slow query log to an engine
+    :param engine: AsyncEngine
+    :return: None
+    """
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before(connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault("statement_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def failed(context):
+        if context.connection is not None and context.connection.info.get("statement_started"):
+            context.connection.info["statement_started"].pop()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after(connection, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - connection.info["statement_started"].pop()
+        stats = current_request.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_seconds += elapsed
+            # Async drivers buffer the rows of a query before this event, rowcount is -1 for queries
+            stats.rows += cursor.rowcount if cursor.rowcount >= 0 else len(getattr(cursor, "_rows", ()))
+            if settings.N_PLUS_ONE_THRESHOLD:
+                stats.repeats[statement] += 1
+
+        if elapsed < settings.SLOW_QUERY_SECONDS:
+            return
+        if stats is not None:
+            stats.slow += 1
+        if random.random() < settings.SLOW_QUERY_SAMPLE_RATE:
+            where = f"{stats.method} {stats.path}" if stats else "outside a request"
+            logger.warning("Slow query (%.3fs, %s): %s parameters: %.*s",
+                           elapsed, where, statement, MAX_LOGGED_PARAMETERS, repr(parameters))
@@ -0,0 +1,90 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Optional, Sequence
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_key(*values) -> str:
+    """
+    Encodes the JSON-serializable sort key of a row into an opaque cursor
+    :param values: parts of the sort key
+    :return: str
+    """
+    payload = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_key(cursor: str, *types) -> tuple:
+    """
+    Decodes a cursor produced by encode_key, converting each part of the key
+    :param cursor: str
+    :param types: one callable per part of the key, such as float or datetime.fromisoformat
+    :return: tuple
+    """
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(payload)
+        if len(values) != len(types):
+            raise ValueError
+        return tuple(convert(value) for convert, value in zip(types, values))
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def encode_cursor(created_at: datetime, id: str) -> str:
+    """
+    Encodes the sort key of a row into an opaque cursor
+    :param created_at: datetime
+    :param id: str
+    :return: str
+    """
+    return encode_key(created_at.isoformat(), id)
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Decodes a cursor produced by encode_cursor
+    :param cursor: str
+    :return: tuple of (datetime, str)
+    """
+    return decode_key(cursor, datetime.fromisoformat, str)
+
+
+def paginate(query, model, limit: Optional[int], cursor: Optional[str] = None, offset: int = 0):
+    """
+    Orders a query by (created_at, id) and applies keyset or offset pagination.
+    The cursor takes precedence over the offset, which is kept for compatibility.
+    :param query: Select
+    :param model: BaseModel subclass the query selects from
+    :param limit: Optional[int] page size, None for no limit
+    :param cursor: Optional[str] cursor of the last row of the previous page
+    :param offset: int
+    :return: Select
+    """
+    query = query.order_by(model.created_at, model.id)
+    if cursor:
+        cursor_key = tuple_(*decode_cursor(cursor), types=[model.created_at.type, model.id.type])
+        query = query.where(tuple_(model.created_at, model.id) > cursor_key)
+    elif offset:
+        query = query.offset(offset)
+    if limit:
+        query = query.limit(limit)
+    return query
+
+
+def set_next_cursor(response: Response, rows: Sequence, limit: Optional[int]):
+    """
+    Exposes the cursor of the next page as a response header when the page is full
+    :param response: Response
+    :param rows: Sequence of rows with created_at and id
+    :param limit: Optional[int]
+    :return: None
+    """
+    if limit and len(rows) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1].created_at, rows[-1].id)
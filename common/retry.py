@@ -0,0 +1,59 @@
+import asyncio
+import random
+from typing import Awaitable, Callable, TypeVar
+
+from sqlalchemy.exc import DBAPIError, OperationalError
+from sqlalchemy.orm import Session
+
+from config.config import settings
+
+T = TypeVar("T")
+
+# Postgres serialization failure, deadlock and lock timeout; retrying the transaction is safe for all three
+TRANSIENT_SQLSTATES = {"40001", "40P01", "55P03"}
+# SQLite reports a write lock held by another connection as SQLITE_BUSY or SQLITE_LOCKED
+SQLITE_LOCKED_MESSAGES = ("database is locked", "database table is locked")
+
+
+def is_transient(error: Exception) -> bool:
+    """
+    Whether a database error is worth retrying: lost connections, locked databases and serialization conflicts.
+    Other errors, such as invalid SQL or missing tables, fail the same way on every attempt.
+    :param error: Exception
+    :return: bool
+    """
+    if not isinstance(error, DBAPIError):
+        return False
+    if error.connection_invalidated:
+        return True
+    original = error.orig
+    if (getattr(original, "pgcode", None) or getattr(original, "sqlstate", None)) in TRANSIENT_SQLSTATES:
+        return True
+    return isinstance(error, OperationalError) and str(original).startswith(SQLITE_LOCKED_MESSAGES)
+
+
+async def run_with_retry(
+        db: Session,
+        operation: Callable[[], Awaitable[T]],
+        attempts: int = None,
+        backoff: float = None
+) -> T:
+    """
+    Runs a unit of work that ends with a commit, rolling back and retrying it with jittered
+    exponential backoff when it fails with a transient database error
+    :param db: Session
+    :param operation: callable returning an awaitable, must be safe to run again from scratch
+    :param attempts: int (defaults to DB_WRITE_RETRIES)
+    :param backoff: float seconds before the first retry (defaults to DB_WRITE_RETRY_BACKOFF)
+    :return: the operation's result
+    """
+    attempts = attempts or settings.DB_WRITE_RETRIES
+    backoff = settings.DB_WRITE_RETRY_BACKOFF if backoff is None else backoff
+    for attempt in range(attempts):
+        try:
+            return await operation()
+        except DBAPIError as error:
+            await db.rollback()
+            if attempt == attempts - 1 or not is_transient(error):
+                raise
+            await asyncio.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1.5))
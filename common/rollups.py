@@ -0,0 +1,249 @@
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, case, delete, func, insert, or_, select, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models import Product, Sales, SalesDailyProduct, SalesDailyCategory
+
+# Pareto classes by the share of the total reached before an item: A up to 80%, B up to 95%, C the rest
+ABC_CLASSES = (("A", 0.8), ("B", 0.95))
+
+
+def _upsert(db: Session, model, rows: List[dict], key: List[str]):
+    """
+    Adds quantity, revenue_minor and sales_count of each row onto the existing bucket, creating it when missing
+    :param db: Session
+    :param model: SalesDailyProduct or SalesDailyCategory
+    :param rows: List[dict]
+    :param key: List[str] primary key columns of the bucket
+    :return: Insert
+    """
+    dialect = db.get_bind().dialect.name
+    statement = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(model).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=key,
+        set_={
+            "quantity": model.quantity + statement.excluded.quantity,
+            "revenue_minor": model.revenue_minor + statement.excluded.revenue_minor,
+            "sales_count": model.sales_count + statement.excluded.sales_count
+        }
+    )
+
+
+async def record_sales(db: Session, sales: List[dict], products: Dict[str, dict]):
+    """
+    Adds freshly inserted sales to the daily rollups within the caller's transaction
+    :param db: Session
+    :param sales: List[dict] with product_id, quantity, amount_minor, currency and created_at
+    :param products: Dict[str, dict] product columns keyed by product id
+    :return: None
+    """
+    per_product = defaultdict(lambda: [0, 0, 0])
+    per_category = defaultdict(lambda: [0, 0, 0])
+    for sale in sales:
+        day = sale["created_at"].date()
+        buckets = [per_product[(day, sale["product_id"], sale["currency"])]]
+        category_id = products[sale["product_id"]]["category_id"]
+        if category_id:
+            buckets.append(per_category[(day, category_id, sale["currency"])])
+        for bucket in buckets:
+            bucket[0] += sale["quantity"]
+            bucket[1] += sale["amount_minor"]
+            bucket[2] += 1
+
+    # Sorted keys keep row lock order identical across concurrent orders, avoiding deadlocks
+    for model, key, buckets in (
+            (SalesDailyProduct, "product_id", per_product),
+            (SalesDailyCategory, "category_id", per_category)
+    ):
+        if not buckets:
+            continue
+        rows = [
+            {
+                "day": day, key: value, "currency": currency,
+                "quantity": quantity, "revenue_minor": revenue, "sales_count": count
+            }
+            for (day, value, currency), (quantity, revenue, count) in sorted(buckets.items())
+        ]
+        await db.execute(_upsert(db, model, rows, ["day", key, "currency"]))
+
+
+def _floor_day(moment: datetime) -> datetime:
+    return datetime.combine(moment.date(), time())
+
+
+def _ceil_day(moment: datetime) -> datetime:
+    day = _floor_day(moment)
+    return day if day == moment else day + timedelta(days=1)
+
+
+def sales_totals(
+        start: datetime,
+        end: datetime,
+        by: Optional[str] = None,
+        product_id: Optional[str] = None,
+        category_id: Optional[str] = None,
+        factors: Optional[Dict[str, float]] = None
+):
+    """
+    Builds a single query for quantity and revenue of active sales in [start, end).
+    Whole days are read from the daily rollups and only the partial days at the
+    edges of the range are aggregated from raw sales.
+    Revenue is in minor units. With conversion factors, every amount is converted to the target currency
+    inside the aggregate and `unconverted` names a currency that was left out for lack of a factor.
+    :param start: datetime
+    :param end: datetime
+    :param by: Optional[str] "product", "category", "day" or "currency" to group the totals by
+    :param product_id: Optional[str]
+    :param category_id: Optional[str]
+    :param factors: Optional[Dict[str, float]] from fx.conversion_factors, amounts are summed as is without
+    :return: Select of (key, quantity, revenue[, unconverted]) when grouped, else (quantity, revenue[, unconverted])
+    """
+    needs_product = by == "category" or bool(category_id)
+    use_category_rollup = (by == "category" or (category_id and by != "product")) and not product_id
+
+    def with_product(query, product_key):
+        query = query.join(Product, product_key == Product.id)
+        if category_id:
+            return query.where(Product.category_id == category_id)
+        return query.where(Product.category_id.isnot(None))
+
+    first_day, last_day = _ceil_day(start), _floor_day(end)
+    parts = []
+
+    if first_day < last_day:
+        if use_category_rollup:
+            rollup = SalesDailyCategory
+            key = {"day": rollup.day, "currency": rollup.currency}.get(by, rollup.category_id)
+            query = select(key.label("key"), rollup.currency, rollup.quantity, rollup.revenue_minor.label("revenue"))
+            if category_id:
+                query = query.where(rollup.category_id == category_id)
+        else:
+            rollup = SalesDailyProduct
+            key = {"category": Product.category_id, "day": rollup.day, "currency": rollup.currency}.get(
+                by, rollup.product_id
+            )
+            query = select(key.label("key"), rollup.currency, rollup.quantity, rollup.revenue_minor.label("revenue"))
+            if needs_product:
+                query = with_product(query, rollup.product_id)
+            if product_id:
+                query = query.where(rollup.product_id == product_id)
+        parts.append(query.where(rollup.day >= first_day.date(), rollup.day < last_day.date()))
+        edges = [(lower, upper) for lower, upper in ((start, first_day), (last_day, end)) if lower < upper]
+    else:
+        edges = [(start, end)]
+
+    if edges:
+        key = {
+            "category": Product.category_id, "day": func.date(Sales.created_at), "currency": Sales.currency
+        }.get(by, Sales.product_id)
+        query = select(key.label("key"), Sales.currency, Sales.quantity, Sales.amount_minor.label("revenue")).where(
+            Sales.is_active,
+            or_(*[and_(Sales.created_at >= lower, Sales.created_at < upper) for lower, upper in edges])
+        )
+        if needs_product:
+            query = with_product(query, Sales.product_id)
+        if product_id:
+            query = query.where(Sales.product_id == product_id)
+        parts.append(query)
+
+    source = union_all(*parts).subquery() if len(parts) > 1 else parts[0].subquery()
+    totals = [func.coalesce(func.sum(source.c.quantity), 0).label("quantity")]
+    if factors is None:
+        totals.append(func.coalesce(func.sum(source.c.revenue), 0).label("revenue"))
+    else:
+        # Amounts in currencies without a factor convert to NULL, which sum() skips
+        totals += [
+            func.coalesce(func.round(func.sum(source.c.revenue * case(factors, value=source.c.currency))), 0)
+            .label("revenue"),
+            func.max(case((source.c.currency.notin_(list(factors)), source.c.currency))).label("unconverted")
+        ]
+    if by:
+        return select(source.c.key, *totals).group_by(source.c.key)
+    return select(*totals)
+
+
+def ranked_totals(totals, metric: str, limit: int):
+    """
+    Ranks grouped totals by a metric and classifies every group with ABC_CLASSES in one pass over the
+    aggregate. Only the top `limit` groups and the first group of each class come back, the class
+    summaries are carried on every row.
+    :param totals: grouped Select from sales_totals with conversion factors
+    :param metric: str "quantity" or "revenue"
+    :param limit: int
+    :return: Select of (key, quantity, revenue, unconverted, rank, abc_class, class_count, class_total, total)
+    """
+    totals = totals.subquery()
+    value = totals.c[metric]
+    order = (value.desc(), totals.c.key)
+    ranked = select(
+        totals.c.key, totals.c.quantity, totals.c.revenue,
+        func.max(totals.c.unconverted).over().label("unconverted"),
+        func.row_number().over(order_by=order).label("rank"),
+        func.sum(value).over(order_by=order, rows=(None, -1)).label("before"),
+        func.sum(value).over().label("total"),
+        value.label("value")
+    ).subquery()
+    abc_class = case(
+        *[(func.coalesce(ranked.c.before, 0) < ranked.c.total * share, name) for name, share in ABC_CLASSES],
+        else_="C"
+    )
+    classified = select(ranked, abc_class.label("abc_class")).subquery()
+    summarized = select(
+        classified,
+        func.count().over(partition_by=classified.c.abc_class).label("class_count"),
+        func.sum(classified.c.value).over(partition_by=classified.c.abc_class).label("class_total"),
+        func.row_number().over(partition_by=classified.c.abc_class, order_by=classified.c.rank).label("class_rank")
+    ).subquery()
+    return (
+        select(
+            summarized.c.key, summarized.c.quantity, summarized.c.revenue, summarized.c.unconverted,
+            summarized.c.rank, summarized.c.abc_class, summarized.c.class_count, summarized.c.class_total,
+            summarized.c.total
+        )
+        .where(or_(summarized.c.rank <= limit, summarized.c.class_rank == 1))
+        .order_by(summarized.c.rank)
+    )
+
+
+def rebuild_statements(start: Optional[date] = None, end: Optional[date] = None) -> list:
+    """
+    Statements that rebuild the daily rollups from raw sales, optionally for days in [start, end]
+    :param start: Optional[date]
+    :param end: Optional[date]
+    :return: list of Delete and Insert statements to execute in order
+    """
+    day = func.date(Sales.created_at)
+    sales_filter = [Sales.is_active]
+    product_filter, category_filter = [], []
+    if start:
+        sales_filter.append(Sales.created_at >= datetime.combine(start, time()))
+        product_filter.append(SalesDailyProduct.day >= start)
+        category_filter.append(SalesDailyCategory.day >= start)
+    if end:
+        sales_filter.append(Sales.created_at < datetime.combine(end + timedelta(days=1), time()))
+        product_filter.append(SalesDailyProduct.day <= end)
+        category_filter.append(SalesDailyCategory.day <= end)
+
+    totals = [func.sum(Sales.quantity), func.sum(Sales.amount_minor), func.count(Sales.id)]
+    columns = ["currency", "quantity", "revenue_minor", "sales_count"]
+    return [
+        delete(SalesDailyProduct).where(*product_filter),
+        delete(SalesDailyCategory).where(*category_filter),
+        insert(SalesDailyProduct).from_select(
+            ["day", "product_id", *columns],
+            select(day, Sales.product_id, Sales.currency, *totals)
+            .where(*sales_filter)
+            .group_by(day, Sales.product_id, Sales.currency)
+        ),
+        insert(SalesDailyCategory).from_select(
+            ["day", "category_id", *columns],
+            select(day, Product.category_id, Sales.currency, *totals)
+            .join(Product, Sales.product_id == Product.id)
+            .where(*sales_filter, Product.category_id.isnot(None))
+            .group_by(day, Product.category_id, Sales.currency)
+        )
+    ]
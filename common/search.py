@@ -0,0 +1,285 @@
+import asyncio
+import heapq
+import math
+import re
+import time
+from array import array
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import Numeric, and_, case, func, literal, literal_column, or_, select
+from sqlalchemy.orm import Session
+
+from config.config import settings
+from models import Product
+
+# Scores shared by both implementations: whole name prefix, word prefix, then the share of query
+# trigrams found in the name or the description, like pg_trgm's word_similarity
+NAME_PREFIX_SCORE = 1.0
+WORD_PREFIX_SCORE = 0.9
+NAME_SIMILARITY_WEIGHT = 0.8
+DESCRIPTION_SIMILARITY_WEIGHT = 0.4
+MIN_SCORE = 0.3
+SCORE_DIGITS = 4
+# Products indexed between yields to the event loop while loading
+LOAD_BATCH = 1000
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize(text: Optional[str]) -> str:
+    return " ".join(_WORD.findall((text or "").lower()))
+
+
+def trigrams(text: str) -> Set[str]:
+    """
+    Trigrams of every word padded the way pg_trgm pads them, two spaces before and one after
+    :param text: str normalized text
+    :return: Set[str]
+    """
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def sql_normalize(column):
+    """
+    normalize() as a Postgres expression. The pattern and flags are inlined rather than bound, so the
+    expression matches the one of the ix_product_normalized_name_trgm index and the planner can use it.
+    :param column: text column
+    :return: SQL expression
+    """
+    return func.trim(func.regexp_replace(
+        func.lower(column), literal_column(r"'\W+'"), literal_column("' '"), literal_column("'g'")
+    ))
+
+
+def _like_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def set_similarity_threshold(db: Session):
+    """
+    Lowers pg_trgm's word similarity threshold for the current transaction to the least a name or description
+    match needs to reach MIN_SCORE, so the indexed `<%` prefilter of search_query keeps every product the
+    in-process index would return. The default of 0.6 drops name matches scoring between 0.3 and 0.48.
+    :param db: Session
+    :return: None
+    """
+    threshold = MIN_SCORE / max(NAME_SIMILARITY_WEIGHT, DESCRIPTION_SIMILARITY_WEIGHT)
+    await db.execute(select(func.set_config("pg_trgm.word_similarity_threshold", str(threshold), True)))
+
+
+def search_query(text: str, limit: int, after: Optional[Tuple[float, str]]):
+    """
+    Ranked product search for Postgres. Prefixes are matched against the normalized name, like the in-process
+    index does, and the prefix and trigram filters are served by the GIN trigram indexes on the normalized name,
+    name and description; run set_similarity_threshold first in the same transaction.
+    :param text: str
+    :param limit: int
+    :param after: Optional[Tuple[float, str]] score and id of the last result of the previous page
+    :return: Select of products with a score column, best first
+    """
+    text = normalize(text)
+    pattern = _like_escape(text)
+    name = sql_normalize(Product.name)
+    name_prefix = name.like(f"{pattern}%", escape="\\")
+    word_prefix = name.like(f"% {pattern}%", escape="\\")
+    score = func.round(func.greatest(
+        case((name_prefix, NAME_PREFIX_SCORE), (word_prefix, WORD_PREFIX_SCORE), else_=0),
+        func.word_similarity(text, Product.name) * NAME_SIMILARITY_WEIGHT,
+        func.word_similarity(text, func.coalesce(Product.description, "")) * DESCRIPTION_SIMILARITY_WEIGHT
+    ).cast(Numeric), SCORE_DIGITS)
+    query = (
+        select(Product, score.label("score"))
+        .where(
+            Product.is_active,
+            or_(
+                name_prefix, word_prefix,
+                literal(text).op("<%")(Product.name),
+                literal(text).op("<%")(Product.description)
+            ),
+            score >= MIN_SCORE
+        )
+        .order_by(score.desc(), Product.id)
+        .limit(limit)
+    )
+    if after:
+        query = query.where(or_(score < after[0], and_(score == after[0], Product.id > after[1])))
+    return query
+
+
+class ProductSearchIndex:
+    """
+    In-process product search for databases without trigram indexes. Name words are kept in a sorted
+    list for prefix lookups, and sorted trigram posting lists of names and descriptions count the query
+    trigrams every product shares: only the postings of the rarest query trigrams are read in full, the
+    others are probed by binary search for the candidates those found. Each worker builds its own index
+    on first use, adds the products it registers, and picks up products registered by other workers
+    every PRODUCT_SEARCH_REFRESH_SECONDS.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.loaded = False
+        self._ids: List[str] = []
+        self._names: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._words: List[Tuple[str, int]] = []
+        self._pending_words: List[Tuple[str, int]] = []
+        self._name_postings: Dict[str, array] = {}
+        self._description_postings: Dict[str, array] = {}
+        self._refreshed_at = 0.0
+        self._refreshed_from: Optional[datetime] = None
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return self.loaded and time.monotonic() - self._refreshed_at < settings.PRODUCT_SEARCH_REFRESH_SECONDS
+
+    def add(self, id: str, name: str, description: Optional[str]):
+        if not self.loaded or id in self._positions:
+            return
+        position = len(self._ids)
+        self._positions[id] = position
+        self._ids.append(id)
+        name = normalize(name)
+        self._names.append(name)
+        self._pending_words.extend((word, position) for word in set(name.split()))
+        # Positions only grow, so every posting list stays sorted
+        for postings, text in ((self._name_postings, name), (self._description_postings, normalize(description))):
+            for gram in trigrams(text):
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array("i")
+                posting.append(position)
+
+    async def refresh(self, db: Session):
+        """
+        Loads every product the first time, then products created since the previous refresh,
+        with a margin for transactions that committed late. Products bulk loaded with earlier creation
+        times are noticed by the count of active products, which triggers a full pass. Concurrent searches
+        wait for one refresh, and loading yields to the event loop so other requests keep being served meanwhile.
+        :param db: Session
+        :return: None
+        """
+        if self._fresh():
+            return
+        async with self._lock:
+            if self._fresh():
+                return
+            started = datetime.now()
+            query = select(Product.id, Product.name, Product.description).where(Product.is_active)
+            if self._refreshed_from:
+                # Found by creation time, ids are only time-ordered for keys generated by the API
+                await self._load(db, query.where(Product.created_at >= self._refreshed_from))
+                active = await db.execute(select(func.count()).select_from(Product).where(Product.is_active))
+                if active.scalar() > len(self._ids):
+                    await self._load(db, query)
+            else:
+                await self._load(db, query)
+            self._refreshed_at = time.monotonic()
+            self._refreshed_from = started - timedelta(seconds=settings.PRODUCT_SEARCH_REFRESH_SECONDS)
+
+    async def _load(self, db: Session, query):
+        result = await db.execute(query)
+        self.loaded = True
+        for count, row in enumerate(result, 1):
+            self.add(row.id, row.name, row.description)
+            if count % LOAD_BATCH == 0:
+                await asyncio.sleep(0)
+
+    def _sorted_words(self) -> List[Tuple[str, int]]:
+        # A bulk load is sorted once, products added later are inserted in place
+        if len(self._pending_words) > len(self._words) // 10:
+            self._words = sorted(self._words + self._pending_words)
+        else:
+            for word in self._pending_words:
+                insort(self._words, word)
+        self._pending_words = []
+        return self._words
+
+    @staticmethod
+    def _shared(grams: Set[str], postings: Dict[str, array], weight: float) -> Dict[int, int]:
+        """
+        Counts the query trigrams shared by every product that can reach MIN_SCORE with this weight
+        :param grams: Set[str] query trigrams
+        :param postings: Dict[str, array] name or description posting lists
+        :param weight: float
+        :return: Dict[int, int] position -> shared trigrams
+        """
+        needed = math.ceil(len(grams) * MIN_SCORE / weight)
+        if needed > len(grams):
+            return {}
+        lists = sorted((postings.get(gram, ()) for gram in grams), key=len)
+        # A product sharing `needed` trigrams appears in at least one of the rarest len(grams) - needed + 1 lists
+        split = len(grams) - needed + 1
+        counts: Dict[int, int] = {}
+        for posting in lists[:split]:
+            for position in posting:
+                counts[position] = counts.get(position, 0) + 1
+        remaining = needed - 1
+        for posting in lists[split:]:
+            remaining -= 1
+            for position, count in list(counts.items()):
+                index = bisect_left(posting, position)
+                if index < len(posting) and posting[index] == position:
+                    counts[position] = count + 1
+                elif count + remaining < needed:
+                    del counts[position]
+        return {position: count for position, count in counts.items() if count >= needed}
+
+    def search(self, text: str, limit: int, after: Optional[Tuple[float, str]]) -> List[Tuple[float, str]]:
+        """
+        Ranks products against a query
+        :param text: str
+        :param limit: int
+        :param after: Optional[Tuple[float, str]] score and id of the last result of the previous page
+        :return: List of (score, id), best first
+        """
+        text = normalize(text)
+        if not text:
+            return []
+        start = (-after[0], after[1]) if after else None
+        grams = trigrams(text)
+        name_shared: Dict[int, int] = {}
+        description_shared: Dict[int, int] = {}
+
+        def score(position: int) -> float:
+            name = self._names[position]
+            if name.startswith(text):
+                return NAME_PREFIX_SCORE
+            if f" {text}" in f" {name}":
+                return WORD_PREFIX_SCORE
+            return round(max(
+                name_shared.get(position, 0) * NAME_SIMILARITY_WEIGHT,
+                description_shared.get(position, 0) * DESCRIPTION_SIMILARITY_WEIGHT
+            ) / len(grams), SCORE_DIGITS)
+
+        def ranked(positions):
+            for position in positions:
+                key = (-score(position), self._ids[position])
+                if -key[0] >= MIN_SCORE and (start is None or key > start):
+                    yield key
+
+        # Products with a word starting with the query outrank every fuzzy match
+        words = self._sorted_words()
+        first_word = text.split()[0]
+        prefixed = set()
+        index = bisect_left(words, (first_word, -1))
+        while index < len(words) and words[index][0].startswith(first_word):
+            prefixed.add(words[index][1])
+            index += 1
+        results = heapq.nsmallest(limit, ranked(prefixed))
+        if len(results) < limit or -results[-1][0] < WORD_PREFIX_SCORE:
+            name_shared = self._shared(grams, self._name_postings, NAME_SIMILARITY_WEIGHT)
+            description_shared = self._shared(grams, self._description_postings, DESCRIPTION_SIMILARITY_WEIGHT)
+            results = heapq.nsmallest(limit, ranked(prefixed | name_shared.keys() | description_shared.keys()))
+        return [(-score, id) for score, id in results]
+
+
+product_index = ProductSearchIndex()
@@ -0,0 +1,86 @@
+from datetime import date
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from common.enums import Period
+
+
+def bucket_start(days: np.ndarray, period: Period) -> np.ndarray:
+    """
+    Maps each day to the first day of its bucket; weeks start on Monday
+    :param days: np.ndarray of datetime64[D]
+    :param period: Period
+    :return: np.ndarray of datetime64[D]
+    """
+    if period == Period.WEEKLY:
+        # 1970-01-01 was a Thursday, so day number + 3 is the offset from the previous Monday
+        return days - (days.astype(np.int64) + 3) % 7
+    if period == Period.MONTHLY:
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    if period == Period.ANNUAL:
+        return days.astype("datetime64[Y]").astype("datetime64[D]")
+    return days
+
+
+def bucket_starts(start: date, end: date, period: Period) -> np.ndarray:
+    """
+    Returns every bucket start between start and end inclusive
+    :param start: date
+    :param end: date
+    :param period: Period
+    :return: np.ndarray of datetime64[D]
+    """
+    first, last = bucket_start(np.array([start, end], dtype="datetime64[D]"), period)
+    if period == Period.MONTHLY:
+        return np.arange(first.astype("datetime64[M]"), last.astype("datetime64[M]") + 1).astype("datetime64[D]")
+    if period == Period.ANNUAL:
+        return np.arange(first.astype("datetime64[Y]"), last.astype("datetime64[Y]") + 1).astype("datetime64[D]")
+    step = 7 if period == Period.WEEKLY else 1
+    return np.arange(first, last + 1, step)
+
+
+def dense_series(
+        start: date,
+        end: date,
+        period: Period,
+        days: Sequence,
+        *values: Sequence
+) -> Tuple[np.ndarray, ...]:
+    """
+    Sums sparse per-day values into dense, zero-filled buckets covering start to end
+    :param start: date
+    :param end: date
+    :param period: Period
+    :param days: Sequence of dates (or ISO date strings) the values belong to
+    :param values: one or more Sequences aligned with days
+    :return: bucket starts followed by one summed array per values sequence
+    """
+    starts = bucket_starts(start, end, period)
+    index = np.searchsorted(starts, bucket_start(np.array(days, dtype="datetime64[D]"), period))
+    return (starts, *(
+        np.bincount(index, weights=np.asarray(value, dtype=np.float64), minlength=len(starts))
+        for value in values
+    ))
+
+
+def min_max_downsample(times: np.ndarray, values: np.ndarray, points: int) -> np.ndarray:
+    """
+    Picks at most `points` samples that keep the visual shape of a time series: the time range is split
+    into equal-width buckets and the lowest and highest value of each bucket are kept, along with the
+    first and last sample, so peaks and dips survive at any zoom level
+    :param times: np.ndarray of datetime64, sorted ascending
+    :param values: np.ndarray aligned with times
+    :param points: int maximum number of samples to return, at least 4
+    :return: np.ndarray of sorted indices into times and values
+    """
+    if len(times) <= points:
+        return np.arange(len(times))
+    buckets = (points - 2) // 2
+    offsets = (times - times[0]).astype(np.int64)
+    bucket = np.minimum(offsets * buckets // max(int(offsets[-1]), 1), buckets - 1)
+    # Ordered by bucket then value, the first entry of a bucket is its minimum and the last its maximum
+    order = np.lexsort((values, bucket))
+    first = np.flatnonzero(np.r_[True, bucket[order][1:] != bucket[order][:-1]])
+    last = np.r_[first[1:] - 1, len(order) - 1]
+    return np.unique(np.r_[0, order[first], order[last], len(times) - 1])
@@ -0,0 +1,129 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import DateTime, and_, case, delete, func, insert, literal, select
+from sqlalchemy.orm import aliased
+
+from models import Inventory, InventoryChange, InventoryChangeArchive, InventorySnapshot
+
+
+def stock_at(at: datetime, product_id: Optional[str] = None):
+    """
+    Stock of every inventory (or one product's) as of a point in time. Each inventory starts from the
+    latest snapshot at or before `at` and adds the changes since; without one it starts from the earliest
+    snapshot after `at`, or else the current stock, and subtracts the changes after `at`. Only the changes
+    between `at` and the nearest snapshot are read, live and archived, whatever the length of the history.
+    :param at: datetime
+    :param product_id: Optional[str]
+    :return: Select of inventory_id, product_id and stock_quantity
+    """
+    at = literal(at, DateTime)
+    filters = [Inventory.is_active, Inventory.created_at <= at]
+    if product_id:
+        filters.append(Inventory.product_id == product_id)
+
+    # Correlated lookups seek the snapshot primary key once per inventory
+    nearest = select(
+        Inventory.id.label("inventory_id"),
+        Inventory.product_id,
+        Inventory.stock_quantity,
+        select(func.max(InventorySnapshot.taken_at))
+        .where(InventorySnapshot.inventory_id == Inventory.id, InventorySnapshot.taken_at <= at)
+        .scalar_subquery().label("before"),
+        select(func.min(InventorySnapshot.taken_at))
+        .where(InventorySnapshot.inventory_id == Inventory.id, InventorySnapshot.taken_at > at)
+        .scalar_subquery().label("after")
+    ).where(*filters).cte("nearest")
+
+    snapshot_before = aliased(InventorySnapshot)
+    snapshot_after = aliased(InventorySnapshot)
+    has_before = nearest.c.before.isnot(None)
+    has_after = nearest.c.after.isnot(None)
+    # Changes in (lower, upper] are added forward from an earlier snapshot or subtracted backward from a later one
+    bounds = (
+        select(
+            nearest.c.inventory_id,
+            nearest.c.product_id,
+            case(
+                (has_before, snapshot_before.stock_quantity),
+                (has_after, snapshot_after.stock_quantity),
+                else_=nearest.c.stock_quantity
+            ).label("base"),
+            case((has_before, nearest.c.before), else_=at).label("lower"),
+            case((has_before, at), (has_after, nearest.c.after), else_=literal(datetime.max, DateTime)).label("upper"),
+            case((has_before, 1), else_=-1).label("direction")
+        )
+        .outerjoin(snapshot_before, and_(
+            snapshot_before.inventory_id == nearest.c.inventory_id, snapshot_before.taken_at == nearest.c.before
+        ))
+        .outerjoin(snapshot_after, and_(
+            snapshot_after.inventory_id == nearest.c.inventory_id, snapshot_after.taken_at == nearest.c.after
+        ))
+        .cte("bounds")
+    )
+
+    # Each change table is joined on its own so the (inventory_id, created_at) index bounds the scan
+    replayed = [
+        select(bounds.c.inventory_id, func.sum(model.current_stock - model.old_stock).label("delta"))
+        .join(model, and_(
+            model.inventory_id == bounds.c.inventory_id,
+            model.created_at > bounds.c.lower,
+            model.created_at <= bounds.c.upper
+        ))
+        .group_by(bounds.c.inventory_id)
+        .subquery()
+        for model in (InventoryChange, InventoryChangeArchive)
+    ]
+    return (
+        select(
+            bounds.c.inventory_id,
+            bounds.c.product_id,
+            (
+                bounds.c.base
+                + bounds.c.direction * (func.coalesce(replayed[0].c.delta, 0) + func.coalesce(replayed[1].c.delta, 0))
+            ).label("stock_quantity")
+        )
+        .outerjoin(replayed[0], replayed[0].c.inventory_id == bounds.c.inventory_id)
+        .outerjoin(replayed[1], replayed[1].c.inventory_id == bounds.c.inventory_id)
+        .order_by(bounds.c.product_id)
+    )
+
+
+def snapshot_statements(at: datetime) -> list:
+    """
+    Statements that write a snapshot of every inventory as of `at`, replacing one already taken at that time.
+    Snapshots should be taken a little in the past so changes still being committed are not missed.
+    :param at: datetime
+    :return: list of Delete and Insert statements to execute in order
+    """
+    stock = stock_at(at).subquery()
+    return [
+        delete(InventorySnapshot).where(InventorySnapshot.taken_at == at),
+        insert(InventorySnapshot).from_select(
+            ["inventory_id", "taken_at", "stock_quantity"],
+            select(stock.c.inventory_id, literal(at, DateTime), stock.c.stock_quantity)
+        )
+    ]
+
+
+def archive_statements(before: datetime) -> list:
+    """
+    Statements that move inventory changes into the archive when the inventory has a snapshot
+    taken after them and at or before `before`
+    :param before: datetime
+    :return: list of Insert and Delete statements to execute in order, in one transaction
+    """
+    covered = (
+        select(func.max(InventorySnapshot.taken_at))
+        .where(InventorySnapshot.inventory_id == InventoryChange.inventory_id, InventorySnapshot.taken_at <= before)
+        .scalar_subquery()
+    )
+    columns = ["id", "inventory_id", "old_stock", "current_stock", "created_at", "updated_at", "is_active"]
+    return [
+        insert(InventoryChangeArchive).from_select(
+            columns,
+            select(*(getattr(InventoryChange, column) for column in columns))
+            .where(InventoryChange.created_at <= covered)
+        ),
+        delete(InventoryChange).where(InventoryChange.created_at <= covered)
+    ]
@@ -1,9 +1,51 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 
 class DevelopConfig(BaseSettings):
     DATABASE_URL: str
     ALEMBIC_DATABASE_URL: str
+    READ_REPLICA_DATABASE_URL: Optional[str] = None
+
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_READ_POOL_SIZE: int = 10
+    DB_READ_MAX_OVERFLOW: int = 20
+    DB_WRITE_RETRIES: int = 3
+    DB_WRITE_RETRY_BACKOFF: float = 0.05
+
+    SALES_GROUP_COMMIT: bool = False
+    SALES_GROUP_COMMIT_MAX_BATCH: int = 100
+    SALES_GROUP_COMMIT_MAX_DELAY: float = 0.005
+
+    IDEMPOTENCY_TTL: float = 24 * 60 * 60
+    IDEMPOTENCY_LOCK_TIMEOUT: float = 30
+    IDEMPOTENCY_WAIT: float = 10
+
+    SLOW_QUERY_SECONDS: float = 0.5
+    SLOW_QUERY_SAMPLE_RATE: float = 1.0
+    N_PLUS_ONE_THRESHOLD: Optional[int] = None
+
+    CATALOG_CACHE_MAX_ENTRIES: int = 1024
+    CATALOG_CACHE_TTL: float = 60
+    REPORT_CACHE_MAX_ENTRIES: int = 256
+    REPORT_CACHE_TTL: float = 60 * 60
+    ETAG_EPOCH_SECONDS: float = 30
+
+    FX_BASE_CURRENCY: str = "USD"
+    FX_RATE_CACHE_TTL: float = 300
+
+    PRODUCT_SEARCH_REFRESH_SECONDS: float = 30
+
+    DASHBOARD_TILE_TIMEOUT: float = 2
+
+    ALERT_QUEUE_SIZE: int = 1000
+    ALERT_HEARTBEAT_SECONDS: float = 15
 
     class Config:
         env_file = ".env"
@@ -1,11 +1,68 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
 
 from config.config import settings
 
-engine = create_async_engine(settings.DATABASE_URL, echo=True, future=True)
+
+def _engine_options(url: str, pool_size: int, max_overflow: int) -> dict:
+    """
+    Engine keyword arguments from settings; SQLite uses its own pool and ignores sizing
+    :param url: str
+    :param pool_size: int
+    :param max_overflow: int
+    :return: dict
+    """
+    options = {"echo": settings.DB_ECHO, "future": True, "pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE
+        )
+    return options
+
+
+def _explicit_sqlite_transactions(engine):
+    """
+    Makes SQLite transactions begin where SQLAlchemy begins them. The sqlite3 module otherwise only opens one
+    before a write, so a savepoint opened first starts a transaction of its own and releasing it commits,
+    leaving the writes of a batch that is rolled back later committed. Transactions take the write lock when
+    they begin, as SQLite allows one writer at a time anyway; two transactions that both read before writing
+    would otherwise deadlock when upgrading their locks.
+    :param engine: AsyncEngine
+    :return: None
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine.sync_engine, "begin")
+    def begin(connection):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+engine = create_async_engine(
+    settings.DATABASE_URL,
+    **_engine_options(settings.DATABASE_URL, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW)
+)
+_explicit_sqlite_transactions(engine)
 SessionLocal = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
 
+# Read-only routes get a pool of their own, on the replica when one is configured,
+# so analytics load never takes connections away from writes
+READ_DATABASE_URL = settings.READ_REPLICA_DATABASE_URL or settings.DATABASE_URL
+read_engine = create_async_engine(
+    READ_DATABASE_URL,
+    **_engine_options(READ_DATABASE_URL, settings.DB_READ_POOL_SIZE, settings.DB_READ_MAX_OVERFLOW)
+)
+ReadSessionLocal = sessionmaker(bind=read_engine, class_=AsyncSession, expire_on_commit=False)
+
 Base = declarative_base()
 
 
@@ -14,4 +71,12 @@ async def get_db() -> Session:
         try:
             yield session
         finally:
-            session.close()
+            await session.close()
+
+
+async def get_read_db() -> Session:
+    async with ReadSessionLocal() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
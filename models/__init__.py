@@ -1,6 +1,8 @@
 from database.db import Base, engine
 from models.sales import Sales
 from models.product import Product
-from models.inventory import Inventory, InventoryChange
+from models.inventory import Inventory, InventoryChange, InventoryChangeArchive, InventorySnapshot
 from models.category import Category
-
+from models.rollup import SalesDailyProduct, SalesDailyCategory
+from models.idempotency import IdempotencyKey
+from models.fx_rate import FxRate
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Date, Float, String
+
+from database.db import Base
+
+
+class FxRate(Base):
+    """
+    Daily exchange rate of a currency, as units of FX_BASE_CURRENCY per one unit of the currency
+    """
+    __tablename__ = "fx_rate"
+
+    currency = Column(String(3), primary_key=True)
+    day = Column(Date, primary_key=True)
+    rate = Column(Float, nullable=False)
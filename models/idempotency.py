@@ -0,0 +1,22 @@
+from sqlalchemy import Column, DateTime, Integer, LargeBinary, String
+
+from database.db import Base
+
+
+class IdempotencyKey(Base):
+    """
+    Outcome of a write sent with an Idempotency-Key header, replayed to retries of the same request until it expires
+    """
+    __tablename__ = "idempotency_key"
+
+    # Route the key was used on, so clients may reuse a key across routes
+    scope = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    # Hash of the request, a key reused for a different request is rejected
+    fingerprint = Column(String(64), nullable=False)
+    # Unset while the first request is still running
+    status_code = Column(Integer, nullable=True)
+    response = Column(LargeBinary, nullable=True)
+    # A request still running past this time is presumed dead and another may take over the key
+    locked_until = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -1,14 +1,27 @@
-from sqlalchemy import Column, String, Integer, ForeignKey
+from sqlalchemy import CheckConstraint, Column, DateTime, Integer, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 
+from database.db import Base
 from models.base_model import BaseModel
+from models.types import UUIDString
 
 
 class Inventory(BaseModel):
     __tablename__ = "inventory"
+    __table_args__ = (
+        CheckConstraint("stock_quantity >= 0", name="ck_inventory_stock_quantity_non_negative"),
+        Index(
+            "ix_inventory_created_at_active", "created_at", "id",
+            postgresql_where=text("is_active"), sqlite_where=text("is_active = 1")
+        ),
+    )
 
-    product_id = Column(String, ForeignKey("product.id"), nullable=False)
+    product_id = Column(UUIDString, ForeignKey("product.id"), nullable=False, unique=True, index=True)
     stock_quantity = Column(Integer, nullable=False)
+    # Bumped by every stock adjustment so clients can make conditional updates
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Stock level at or below which low stock alerts are sent, no alerts when unset
+    reorder_threshold = Column(Integer, nullable=True)
 
     product = relationship("Product", back_populates="inventory")
     inventory_change = relationship("InventoryChange", back_populates="inventory")
@@ -16,9 +29,38 @@ class Inventory(BaseModel):
 
 class InventoryChange(BaseModel):
     __tablename__ = "inventory_change"
+    __table_args__ = (
+        Index("ix_inventory_change_inventory_id_created_at", "inventory_id", "created_at"),
+    )
 
-    inventory_id = Column(String, ForeignKey("inventory.id"), nullable=False)
+    inventory_id = Column(UUIDString, ForeignKey("inventory.id"), nullable=False)
     old_stock = Column(Integer, nullable=False)
     current_stock = Column(Integer, nullable=False)
 
     inventory = relationship("Inventory", back_populates="inventory_change")
+
+
+class InventoryChangeArchive(BaseModel):
+    """
+    Inventory changes moved out of inventory_change once a snapshot covers them
+    """
+    __tablename__ = "inventory_change_archive"
+    __table_args__ = (
+        Index("ix_inventory_change_archive_inventory_id_created_at", "inventory_id", "created_at"),
+    )
+
+    inventory_id = Column(UUIDString, ForeignKey("inventory.id"), nullable=False)
+    old_stock = Column(Integer, nullable=False)
+    current_stock = Column(Integer, nullable=False)
+
+
+class InventorySnapshot(Base):
+    """
+    Stock level of an inventory as of a point in time, written periodically so point-in-time
+    queries only replay the changes since the nearest snapshot
+    """
+    __tablename__ = "inventory_snapshot"
+
+    inventory_id = Column(UUIDString, ForeignKey("inventory.id"), primary_key=True)
+    taken_at = Column(DateTime, primary_key=True)
+    stock_quantity = Column(Integer, nullable=False)
@@ -1,19 +1,26 @@
-from sqlalchemy import Column, String, Float, Enum, ForeignKey
+from sqlalchemy import Column, String, Float, Enum, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 
 from common.enums import UnitQuantity
 from models.base_model import BaseModel
+from models.types import UUIDString
 
 
 class Product(BaseModel):
     __tablename__ = "product"
+    __table_args__ = (
+        Index(
+            "ix_product_created_at_active", "created_at", "id",
+            postgresql_where=text("is_active"), sqlite_where=text("is_active = 1")
+        ),
+    )
 
     name = Column(String, index=True, nullable=False)
     description = Column(String, nullable=True)
     price = Column(Float, nullable=False)
     currency = Column(String, default="USD", nullable=False)
     unit = Column(Enum(UnitQuantity), nullable=False)
-    category_id = Column(String, ForeignKey("category.id"), nullable=True)
+    category_id = Column(UUIDString, ForeignKey("category.id"), nullable=True, index=True)
 
     category = relationship("Category", back_populates="product")
     inventory = relationship("Inventory", back_populates="product")
@@ -0,0 +1,32 @@
+from sqlalchemy import BigInteger, Column, Date, Integer, ForeignKey, String
+
+from database.db import Base
+from models.types import UUIDString
+
+
+class SalesDailyProduct(Base):
+    """
+    Daily pre-aggregated sales per product and currency, maintained alongside every sale
+    """
+    __tablename__ = "sales_daily_product"
+
+    day = Column(Date, primary_key=True)
+    product_id = Column(UUIDString, ForeignKey("product.id"), primary_key=True)
+    currency = Column(String(3), primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue_minor = Column(BigInteger, nullable=False, default=0)
+    sales_count = Column(Integer, nullable=False, default=0)
+
+
+class SalesDailyCategory(Base):
+    """
+    Daily pre-aggregated sales per category and currency, maintained alongside every sale
+    """
+    __tablename__ = "sales_daily_category"
+
+    day = Column(Date, primary_key=True)
+    category_id = Column(UUIDString, ForeignKey("category.id"), primary_key=True)
+    currency = Column(String(3), primary_key=True)
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue_minor = Column(BigInteger, nullable=False, default=0)
+    sales_count = Column(Integer, nullable=False, default=0)
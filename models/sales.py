@@ -1,14 +1,25 @@
-from sqlalchemy import Column, String, Integer, Float, ForeignKey
+from sqlalchemy import BigInteger, Column, Integer, Float, ForeignKey, Index, String, text
 from sqlalchemy.orm import relationship
 
 from models.base_model import BaseModel
+from models.types import UUIDString
 
 
 class Sales(BaseModel):
     __tablename__ = "sales"
+    __table_args__ = (
+        Index(
+            "ix_sales_created_at_active", "created_at", "id",
+            postgresql_where=text("is_active"), sqlite_where=text("is_active = 1")
+        ),
+        Index("ix_sales_product_id_created_at", "product_id", "created_at"),
+    )
 
     quantity = Column(Integer, nullable=False)
     amount = Column(Float, nullable=False)
-    product_id = Column(String, ForeignKey("product.id"), nullable=False)
+    # Exact amount in minor units of the currency (cents for USD), revenue is summed from this column
+    amount_minor = Column(BigInteger, nullable=False)
+    currency = Column(String(3), nullable=False)
+    product_id = Column(UUIDString, ForeignKey("product.id"), nullable=False)
 
     product = relationship("Product", back_populates="sales")
@@ -0,0 +1,48 @@
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Uuid
+from sqlalchemy.types import TypeDecorator
+
+
+def uuid7(at: Optional[datetime] = None) -> str:
+    """
+    Time-ordered UUID (version 7): 48 bits of Unix milliseconds, 12 bits of sub-millisecond precision
+    and 62 random bits, so keys generated later sort later and inserts append to the end of indexes
+    :param at: Optional[datetime] time to embed, defaults to now
+    :return: str in the canonical 8-4-4-4-12 form
+    """
+    nanoseconds = time.time_ns() if at is None else int(at.timestamp() * 1_000_000) * 1000
+    milliseconds, remainder = divmod(nanoseconds, 1_000_000)
+    value = (
+        (milliseconds & 0xFFFF_FFFF_FFFF) << 80
+        | 0x7 << 76
+        | (remainder * 4096 // 1_000_000) << 64
+        | 0b10 << 62
+        | int.from_bytes(os.urandom(8), "big") >> 2
+    )
+    return str(uuid.UUID(int=value))
+
+
+class UUIDString(TypeDecorator):
+    """
+    UUID stored natively on Postgres and as 32 hex characters elsewhere, exchanged with
+    the application in its canonical string form. Strings that are not UUIDs are bound
+    as NULL, so looking them up finds nothing instead of raising a database error.
+    """
+    impl = Uuid(as_uuid=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        try:
+            return uuid.UUID(value)
+        except (ValueError, TypeError, AttributeError):
+            return None
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else str(value)
@@ -1,10 +1,12 @@
 from typing import List
 
-from fastapi import APIRouter, status, Depends, Query
+from fastapi import APIRouter, status, Depends, Query, Request, Response
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
-from database.db import get_db
+from common.cache import category_cache, not_modified, table_versions
+from common.pagination import paginate, set_next_cursor
+from database.db import get_db, get_read_db
 from models import Category
 from schemas.category import CategoryRequest, CategoryResponse
 
@@ -22,21 +24,39 @@ async def create_category(request: CategoryRequest, db: Session = Depends(get_db
     category = Category(name=request.name)
     db.add(category)
     await db.commit()
+    category_cache.clear()
+    table_versions.bump(Category)
     return category
 
 
 @category_router.get("", response_model=List[CategoryResponse], status_code=status.HTTP_200_OK)
 async def get_categories(
+        http_request: Request,
+        response: Response,
         limit: int = Query(10, description="Items per page", le=50),
         offset: int = Query(0, description="Offset for pagination", ge=0),
-        db: Session = Depends(get_db)
+        cursor: str = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+        db: Session = Depends(get_read_db)
 ):
     """
-    Fetches categories from database
+    Fetches categories from database, answering If-None-Match with 304 Not Modified while they are unchanged
+    :param http_request: Request
+    :param response: Response
     :param limit: int (default 10, max 50)
     :param offset: int (default 0)
+    :param cursor: str
     :param db: Session
     :return: List[CategoryResponse]
     """
-    result = await db.execute(select(Category).where(Category.is_active).limit(limit).offset(offset))
-    return result.scalars().all()
+    unchanged = not_modified(http_request, response, Category)
+    if unchanged:
+        return unchanged
+    key = ("list", limit, offset, cursor)
+    categories = category_cache.get(key)
+    if categories is None:
+        query = paginate(select(Category).where(Category.is_active), Category, limit, cursor, offset)
+        result = await db.execute(query)
+        categories = [CategoryResponse.model_validate(category, from_attributes=True) for category in result.scalars()]
+        category_cache.set(key, categories)
+    set_next_cursor(response, categories, limit)
+    return categories
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from common import fx, rollups
+from common.cache import category_cache
+from common.enums import Period
+from common.pagination import paginate
+from config.config import settings
+from database.db import ReadSessionLocal, get_read_db
+from models import Category, Inventory
+from schemas.category import CategoryResponse
+from schemas.dashboard import Dashboard
+from schemas.inventory import InventoryResponse
+
+logger = logging.getLogger(__name__)
+
+dashboard_router = APIRouter()
+
+
+def _period_range(period: Period, today: date) -> Tuple[datetime, datetime]:
+    """
+    The calendar day, week (from Monday), month or year containing today
+    :param period: Period
+    :param today: date
+    :return: Tuple of start and end datetimes
+    """
+    if period == Period.DAILY:
+        start = today
+        end = start + timedelta(days=1)
+    elif period == Period.WEEKLY:
+        start = today - timedelta(days=today.weekday())
+        end = start + timedelta(weeks=1)
+    elif period == Period.MONTHLY:
+        start = today.replace(day=1)
+        end = date(start.year + 1, 1, 1) if start.month == 12 else date(start.year, start.month + 1, 1)
+    else:
+        start = today.replace(month=1, day=1)
+        end = date(start.year + 1, 1, 1)
+    return datetime.combine(start, time()), datetime.combine(end, time())
+
+
+async def _load(load: Callable[[Session], Awaitable[Any]]) -> Any:
+    async with ReadSessionLocal() as db:
+        if db.get_bind().dialect.name == "postgresql":
+            # The server cancels a statement still running when the tile is given up on
+            await db.execute(
+                select(func.set_config(
+                    "statement_timeout", f"{int(settings.DASHBOARD_TILE_TIMEOUT * 1000)}ms", True
+                ))
+            )
+        return await load(db)
+
+
+def _discard(task: asyncio.Task):
+    # Marks the outcome of a tile nobody waits for anymore as retrieved
+    if not task.cancelled():
+        task.exception()
+
+
+async def _tile(name: str, load: Callable[[Session], Awaitable[Any]]) -> Tuple[str, Any, str]:
+    """
+    Loads one tile on a session of its own, giving up after DASHBOARD_TILE_TIMEOUT seconds
+    :param name: str
+    :param load: callable taking a Session and returning an awaitable of the tile
+    :return: Tuple of name, tile and failure reason, the tile is None when it failed
+    """
+    task = asyncio.create_task(_load(load))
+    done, _ = await asyncio.wait({task}, timeout=settings.DASHBOARD_TILE_TIMEOUT)
+    if not done:
+        # Cancelling a query halfway can leave the driver's connection unusable, so a late tile
+        # finishes in the background and closes its session as usual
+        task.add_done_callback(_discard)
+        return name, None, f"Timed out after {settings.DASHBOARD_TILE_TIMEOUT} seconds"
+    try:
+        return name, task.result(), None
+    except HTTPException as error:
+        return name, None, str(error.detail)
+    except Exception:
+        logger.exception("Dashboard tile %s failed", name)
+        return name, None, "Failed to load"
+
+
+@dashboard_router.get("", response_model=Dashboard, status_code=status.HTTP_200_OK)
+async def get_dashboard(
+        low_stock_threshold: int = Query(
+            None, ge=0, description="Low stock threshold quantity, each product's reorder threshold when omitted"
+        ),
+        low_stock_limit: int = Query(20, description="Low stock items to return", ge=1, le=100),
+        category_limit: int = Query(10, description="Categories to return", ge=1, le=50),
+        target_currency: str = Query(None, pattern=fx.CURRENCY_PATTERN, description=fx.TARGET_CURRENCY_DESCRIPTION),
+        db: Session = Depends(get_read_db)
+):
+    """
+    Returns every dashboard tile in one response: revenue of the current day, week, month and year, revenue by
+    category this month, low stock inventory and categories. Tiles load concurrently on separate sessions;
+    a tile that fails or takes longer than DASHBOARD_TILE_TIMEOUT seconds is left empty and listed in `failed`
+    :param low_stock_threshold: Optional[int]
+    :param low_stock_limit: int
+    :param category_limit: int
+    :param target_currency: Optional[str]
+    :param db: Session
+    :return: Dashboard
+    """
+    target_currency = target_currency or settings.FX_BASE_CURRENCY
+    today = datetime.now().date()
+    # Rates of today convert every revenue tile; an unknown currency fails the request instead of each tile
+    factors = await fx.conversion_factors(db, target_currency, today)
+    # The tiles use sessions of their own, this connection goes back to the pool meanwhile
+    await db.close()
+
+    unconverted = {}
+
+    def revenue(period: Period):
+        async def load(tile_db: Session):
+            start, end = _period_range(period, today)
+            totals = (await tile_db.execute(rollups.sales_totals(start, end, factors=factors))).one()
+            unconverted[f"revenue.{period.value}"] = await fx.unconverted_totals(
+                tile_db, [totals], start, end, factors
+            )
+            return fx.from_minor(totals.revenue, target_currency)
+        return load
+
+    async def revenue_by_category(tile_db: Session):
+        start, end = _period_range(Period.MONTHLY, today)
+        result = await tile_db.execute(rollups.sales_totals(start, end, by="category", factors=factors))
+        rows = result.all()
+        unconverted["revenue_by_category"] = await fx.unconverted_totals(tile_db, rows, start, end, factors)
+        return [
+            {"category_id": row.key, "total_revenue": fx.from_minor(row.revenue, target_currency)} for row in rows
+        ]
+
+    async def low_stock(tile_db: Session):
+        threshold = Inventory.reorder_threshold if low_stock_threshold is None else low_stock_threshold
+        result = await tile_db.execute(
+            select(*[getattr(Inventory, field) for field in InventoryResponse.model_fields])
+            .where(Inventory.is_active, Inventory.stock_quantity <= func.coalesce(threshold, -1))
+            .order_by(Inventory.stock_quantity, Inventory.id)
+            .limit(low_stock_limit)
+        )
+        return [dict(row._mapping) for row in result]
+
+    async def categories(tile_db: Session):
+        # Shares the cache of the first page of GET /category
+        key = ("list", category_limit, 0, None)
+        cached = category_cache.get(key)
+        if cached is None:
+            result = await tile_db.execute(
+                paginate(select(Category).where(Category.is_active), Category, category_limit, None)
+            )
+            cached = [CategoryResponse.model_validate(category, from_attributes=True) for category in result.scalars()]
+            category_cache.set(key, cached)
+        return cached
+
+    loaders: Dict[str, Callable[[Session], Awaitable[Any]]] = {
+        **{f"revenue.{period.value}": revenue(period) for period in Period},
+        "revenue_by_category": revenue_by_category,
+        "low_stock": low_stock,
+        "categories": categories,
+    }
+    tiles = await asyncio.gather(*(_tile(name, load) for name, load in loaders.items()))
+
+    response = {"currency": target_currency, "revenue": {}, "failed": {}, "unconverted": {}}
+    for name, tile, failure in tiles:
+        if failure is not None:
+            response["failed"][name] = failure
+            continue
+        if unconverted.get(name):
+            response["unconverted"][name] = unconverted[name]
+        if name.startswith("revenue."):
+            response["revenue"][Period(name.split(".", 1)[1])] = tile
+        else:
+            response[name] = tile
+    return response
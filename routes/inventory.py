@@ -1,88 +1,554 @@
-from typing import List
+import asyncio
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, List, Optional
 
-from fastapi import APIRouter, Depends, Query, status, HTTPException
-from sqlalchemy import select
+import numpy as np
+import orjson
+from fastapi import (
+    APIRouter, Body, Depends, Header, Query, status, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+)
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, Update, insert, select, union_all, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from database.db import get_db
-from models.inventory import Inventory, InventoryChange
-from schemas.inventory import InventoryRequest, InventoryResponse, InventoryChangeResponse
+from common import series
+from common.batch import IDS_DESCRIPTION, fetch_by_ids, parse_ids
+from common.cache import not_modified, table_versions
+from common.events import stock_alerts, stock_crossing
+from common.export import FAST_DESCRIPTION, json_response
+from common.helpers import parse_date, parse_end_date
+from common.idempotency import KEY_DESCRIPTION, fingerprint, idempotent
+from common.pagination import paginate, set_next_cursor
+from common.retry import run_with_retry
+from common.stock import stock_at
+from config.config import settings
+from database.db import get_db, get_read_db
+from models.inventory import Inventory, InventoryChange, InventoryChangeArchive
+from models.product import Product
+from models.types import uuid7
+from schemas.inventory import (
+    InventoryRequest, InventoryResponse, InventoryChangeResponse, InventoryChangeSeries, StockAtResponse
+)
 
 inventory_router = APIRouter()
 
+MAX_CHART_POINTS = 5000
+BY_PRODUCT_DESCRIPTION = "Look up and key inventory by product id instead of inventory id"
+
 
 @inventory_router.post("", response_model=InventoryResponse, status_code=status.HTTP_201_CREATED)
 async def add_inventory(request: InventoryRequest, db: Session = Depends(get_db)):
     """
-    Registers a new product in the database
+    Registers a new product in the database, 404 is returned for an unknown product
+    and 409 if the product already has inventory
     :param request: InventoryRequest
     :param db: Session
     :return: InventoryResponse
     """
+    # Checked first: ids that are not UUIDs bind as NULL and SQLite does not enforce the foreign key
+    result = await db.execute(select(Product.id).where(Product.is_active, Product.id == request.product_id))
+    if result.scalar() is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
     inventory = Inventory(**request.model_dump())
     db.add(inventory)
+    try:
+        await db.flush()
+    except IntegrityError:
+        await db.rollback()
+        # A product has one inventory row, enforced by the unique index on product_id
+        result = await db.execute(select(Inventory.id).where(Inventory.product_id == request.product_id))
+        if result.scalar() is None:
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Inventory already exists for this product"
+        )
+    # The opening stock is recorded as a change too, so stock history replays from zero
+    db.add(InventoryChange(inventory_id=inventory.id, old_stock=0, current_stock=inventory.stock_quantity))
     await db.commit()
+    table_versions.bump(Inventory, InventoryChange)
+    alert = stock_crossing(
+        inventory.id, inventory.product_id, 0, inventory.stock_quantity, None, inventory.reorder_threshold
+    )
+    if alert:
+        stock_alerts.publish(alert)
     return inventory
 
 
+def inventory_query(low_stock_threshold: Optional[int], fast: bool) -> Select:
+    """
+    Inventory listed by GET /inventory, before pagination
+    :param low_stock_threshold: Optional[int]
+    :param fast: bool select only the response columns instead of the model
+    :return: Select
+    """
+    filters = [Inventory.is_active]
+    if low_stock_threshold:
+        filters.append(Inventory.stock_quantity <= low_stock_threshold)
+    if fast:
+        query = select(
+            Inventory.product_id, Inventory.stock_quantity, Inventory.reorder_threshold, Inventory.id,
+            Inventory.version, Inventory.created_at
+        )
+    else:
+        query = select(Inventory)
+    return query.where(*filters)
+
+
 @inventory_router.get("", response_model=List[InventoryResponse], status_code=status.HTTP_200_OK)
 async def view_inventory(
+        http_request: Request,
+        response: Response,
         low_stock_threshold: int = Query(None, description="Low stock threshold quantity"),
-        db: Session = Depends(get_db)
+        limit: int = Query(None, description="Items per page", ge=1, le=1000),
+        cursor: str = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+        fast: bool = Query(False, description=FAST_DESCRIPTION),
+        db: Session = Depends(get_read_db)
 ):
     """
     View current inventory status, including low stock alerts.
+    If-None-Match is answered with 304 Not Modified while inventory is unchanged.
+    :param http_request: Request
+    :param response: Response
     :param low_stock_threshold: int
+    :param limit: Optional[int] (max 1000, all inventory when omitted)
+    :param cursor: Optional[str]
+    :param fast: bool
     :param db: Session
     :return: List[InventoryStatus]
     """
-    query = select(Inventory).where(Inventory.is_active)
-    if low_stock_threshold:
-        query = query.where(Inventory.stock_quantity <= low_stock_threshold)
-    result = await(db.execute(query))
-    return result.scalars().all()
+    unchanged = not_modified(http_request, response, Inventory)
+    if unchanged:
+        return unchanged
+
+    query = inventory_query(low_stock_threshold, fast)
+    if fast:
+        result = await db.execute(paginate(query, Inventory, limit, cursor))
+        inventory = result.all()
+        set_next_cursor(response, inventory, limit)
+        return json_response(response, [
+            {
+                "product_id": row.product_id,
+                "stock_quantity": row.stock_quantity,
+                "reorder_threshold": row.reorder_threshold,
+                "id": row.id,
+                "version": row.version
+            }
+            for row in inventory
+        ])
+
+    result = await db.execute(paginate(query, Inventory, limit, cursor))
+    inventory = result.scalars().all()
+    set_next_cursor(response, inventory, limit)
+    return inventory
+
+
+def adjust_stock_statement(product_id: str, quantity: int, expected_version: Optional[int], now: datetime) -> Update:
+    """
+    UPDATE ... RETURNING behind PUT /inventory, which only matches while enough stock remains
+    :param product_id: str
+    :param quantity: int positive to restock, negative to remove stock
+    :param expected_version: Optional[int] only adjust when the inventory is still at this version
+    :param now: datetime
+    :return: Update
+    """
+    filters = [
+        Inventory.is_active,
+        Inventory.product_id == product_id,
+        Inventory.stock_quantity + quantity >= 0
+    ]
+    if expected_version is not None:
+        filters.append(Inventory.version == expected_version)
+    return (
+        update(Inventory)
+        .where(*filters)
+        .values(stock_quantity=Inventory.stock_quantity + quantity, version=Inventory.version + 1, updated_at=now)
+        .returning(
+            Inventory.id, Inventory.product_id, Inventory.stock_quantity, Inventory.version, Inventory.reorder_threshold
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def _adjust_stock(
+        db: Session, product_id: str, quantity: int, expected_version: Optional[int], record: Callable
+) -> dict:
+    """
+    Adjusts stock in one atomic UPDATE ... RETURNING, so concurrent adjustments never read stale
+    stock and the row lock is only held until the change record is inserted and committed
+    :param db: Session
+    :param product_id: str
+    :param quantity: int positive to restock, negative to remove stock
+    :param expected_version: Optional[int] only adjust when the inventory is still at this version
+    :param record: callable given by idempotent, stores the response in the same transaction
+    :return: dict shaped as InventoryResponse
+    """
+    now = datetime.now()
+    result = await db.execute(adjust_stock_statement(product_id, quantity, expected_version, now))
+    inventory = result.one_or_none()
+
+    if inventory is None:
+        # Only the failure path reads the row, to tell the caller why nothing was updated
+        current = await db.execute(
+            select(Inventory.stock_quantity, Inventory.version)
+            .where(Inventory.is_active, Inventory.product_id == product_id)
+        )
+        current = current.one_or_none()
+        if current is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+        if expected_version is not None and current.version != expected_version:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Inventory has been modified, current version is {current.version}"
+            )
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Insufficient stock, only {current.stock_quantity} available"
+        )
+
+    await db.execute(insert(InventoryChange).values(
+        id=uuid7(now),
+        inventory_id=inventory.id,
+        old_stock=inventory.stock_quantity - quantity,
+        current_stock=inventory.stock_quantity,
+        created_at=now,
+        updated_at=now,
+        is_active=True
+    ))
+    inventory = dict(inventory._mapping)
+    await record(db, inventory)
+    await db.commit()
+    return inventory
+
+
+async def _inventory_by_id(response: Response, db: Session, ids: List[str], by_product: bool) -> Response:
+    """
+    Active inventory with the given inventory or product ids keyed by that id, ids that match none are left out
+    :param response: Response
+    :param db: Session
+    :param ids: List[str]
+    :param by_product: bool
+    :return: Response
+    """
+    query = select(*[getattr(Inventory, field) for field in InventoryResponse.model_fields]).where(Inventory.is_active)
+    key = Inventory.product_id if by_product else Inventory.id
+    inventory = await fetch_by_ids(db, query, key, ids)
+    return json_response(response, {row._mapping[key.key]: dict(row._mapping) for row in inventory})
+
+
+@inventory_router.get("/batch", response_model=Dict[str, InventoryResponse], status_code=status.HTTP_200_OK)
+async def get_inventory_by_ids(
+        http_request: Request,
+        response: Response,
+        ids: List[str] = Query([], description=IDS_DESCRIPTION),
+        by_product: bool = Query(False, description=BY_PRODUCT_DESCRIPTION),
+        db: Session = Depends(get_read_db)
+):
+    """
+    Fetches the inventory of many products in one request, answering If-None-Match with 304 Not Modified
+    while it is unchanged
+    :param http_request: Request
+    :param response: Response
+    :param ids: List[str] inventory ids, or product ids with by_product
+    :param by_product: bool
+    :param db: Session
+    :return: Dict[str, InventoryResponse]
+    """
+    unchanged = not_modified(http_request, response, Inventory)
+    if unchanged:
+        return unchanged
+    return await _inventory_by_id(response, db, parse_ids(ids), by_product)
+
+
+@inventory_router.post("/batch", response_model=Dict[str, InventoryResponse], status_code=status.HTTP_200_OK)
+async def post_inventory_by_ids(
+        response: Response,
+        ids: List[str] = Body(..., description=IDS_DESCRIPTION),
+        by_product: bool = Query(False, description=BY_PRODUCT_DESCRIPTION),
+        db: Session = Depends(get_read_db)
+):
+    """
+    Fetches the inventory of many products in one request, for id lists too long for a URL
+    :param response: Response
+    :param ids: List[str] inventory ids, or product ids with by_product
+    :param by_product: bool
+    :param db: Session
+    :return: Dict[str, InventoryResponse]
+    """
+    return await _inventory_by_id(response, db, parse_ids(ids), by_product)
 
 
 @inventory_router.put("", response_model=InventoryResponse, status_code=status.HTTP_200_OK)
 async def update_inventory(
         product_id: str,
         quantity: int = 0,
+        expected_version: int = Query(None, description="Only update if the inventory is still at this version"),
+        idempotency_key: str = Header(None, max_length=255, description=KEY_DESCRIPTION),
         db: Session = Depends(get_db)
 ):
     """
     Update inventory levels for a product and track changes over time.
+    Stock can never go below zero; transient database errors are retried a bounded number of times.
+    Crossing the product's reorder threshold publishes a stock alert once the change is committed.
     :param product_id: str
-    :param quantity: int (default 10)
+    :param quantity: int (default 0)
+    :param expected_version: Optional[int] version from a previous read, 409 is returned if it changed since
+    :param idempotency_key: Optional[str] retries with the same key replay the first response
     :param db: Session
-    :return: InventoryChangeResponse
+    :return: InventoryResponse
     """
-    result = await db.execute(select(Inventory).where(Inventory.is_active, Inventory.product_id == product_id))
-    result = result.scalars().one_or_none()
-    if not result:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
-    result.stock_quantity += quantity
-    inventory_change = InventoryChange(
-        inventory_id=result.id,
-        old_stock=result.stock_quantity - quantity,
-        current_stock=result.stock_quantity
+    async def adjust(record):
+        inventory = await run_with_retry(
+            db, lambda: _adjust_stock(db, product_id, quantity, expected_version, record)
+        )
+        table_versions.bump(Inventory, InventoryChange)
+        alert = stock_crossing(
+            inventory["id"], inventory["product_id"], inventory["stock_quantity"] - quantity,
+            inventory["stock_quantity"], inventory["reorder_threshold"], inventory["reorder_threshold"]
+        )
+        if alert:
+            stock_alerts.publish(alert)
+        return inventory
+
+    return await idempotent(
+        db, "PUT /inventory", idempotency_key, fingerprint(product_id, quantity, expected_version),
+        InventoryResponse, status.HTTP_200_OK, adjust
     )
-    db.add(result)
-    db.add(inventory_change)
+
+
+@inventory_router.put("/reorder-threshold", response_model=InventoryResponse, status_code=status.HTTP_200_OK)
+async def set_reorder_threshold(
+        product_id: str,
+        reorder_threshold: int = Query(None, ge=0, description="Stock level that triggers alerts, unset to disable"),
+        db: Session = Depends(get_db)
+):
+    """
+    Sets the stock level at or below which a product is reported as low on stock
+    :param product_id: str
+    :param reorder_threshold: Optional[int]
+    :param db: Session
+    :return: InventoryResponse
+    """
+    result = await db.execute(
+        select(Inventory).where(Inventory.is_active, Inventory.product_id == product_id).with_for_update()
+    )
+    inventory = result.scalars().one_or_none()
+    if not inventory:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+    old_threshold = inventory.reorder_threshold
+    inventory.reorder_threshold = reorder_threshold
     await db.commit()
-    return result
+    table_versions.bump(Inventory)
+    alert = stock_crossing(
+        inventory.id, inventory.product_id, inventory.stock_quantity, inventory.stock_quantity,
+        old_threshold, reorder_threshold
+    )
+    if alert:
+        stock_alerts.publish(alert)
+    return inventory
+
+
+async def _alert_stream(db: Session) -> AsyncIterator[dict]:
+    """
+    Yields a snapshot of the products currently at or below their reorder threshold, then every stock alert
+    as it is published, with a heartbeat whenever nothing happened for ALERT_HEARTBEAT_SECONDS.
+    The subscription starts before the snapshot is read so no alert is missed in between.
+    :param db: Session, closed once the snapshot is read so the stream does not hold a connection
+    :return: AsyncIterator[dict]
+    """
+    with stock_alerts.subscribe() as queue:
+        result = await db.execute(
+            select(Inventory.id, Inventory.product_id, Inventory.stock_quantity, Inventory.reorder_threshold)
+            .where(Inventory.is_active, Inventory.stock_quantity <= Inventory.reorder_threshold)
+        )
+        items = [
+            {
+                "inventory_id": row.id,
+                "product_id": row.product_id,
+                "stock_quantity": row.stock_quantity,
+                "reorder_threshold": row.reorder_threshold
+            }
+            for row in result.all()
+        ]
+        await db.close()
+        yield {"type": "snapshot", "items": items}
+
+        while True:
+            try:
+                yield await asyncio.wait_for(queue.get(), settings.ALERT_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield {"type": "heartbeat"}
+
+
+@inventory_router.get("/alerts", status_code=status.HTTP_200_OK)
+async def stream_stock_alerts(db: Session = Depends(get_read_db)):
+    """
+    Server-Sent Events stream of low stock and restock alerts, starting with a snapshot of low stock products
+    :param db: Session
+    :return: StreamingResponse
+    """
+    async def events():
+        async for event in _alert_stream(db):
+            yield b"event: " + event["type"].encode() + b"\ndata: " + orjson.dumps(event) + b"\n\n"
+
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@inventory_router.websocket("/alerts/ws")
+async def stock_alerts_websocket(websocket: WebSocket, db: Session = Depends(get_read_db)):
+    """
+    WebSocket stream of the same alerts as GET /inventory/alerts, one JSON message per event
+    :param websocket: WebSocket
+    :param db: Session
+    :return: None
+    """
+    await websocket.accept()
+
+    async def forward():
+        async for event in _alert_stream(db):
+            await websocket.send_json(event)
+
+    forwarding = asyncio.create_task(forward())
+    try:
+        # Clients are not expected to send anything, receiving only notices when they disconnect
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        forwarding.cancel()
+
+
+def _time_range(model, start: Optional[str], end: Optional[str]) -> list:
+    """
+    Filters on created_at for an optional, inclusive time range. An end given as a bare date includes that
+    whole day, like the end dates of the sales routes.
+    :param model: InventoryChange or InventoryChangeArchive
+    :param start: Optional[str]
+    :param end: Optional[str]
+    :return: list of filters
+    """
+    filters = []
+    if start:
+        filters.append(model.created_at >= parse_date(start))
+    if end:
+        filters.append(model.created_at <= parse_end_date(end))
+    return filters
+
+
+@inventory_router.get("/stock-at", response_model=List[StockAtResponse], status_code=status.HTTP_200_OK)
+async def get_stock_at(
+        at: str = Query(..., description="Point in time (format: YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS)"),
+        product_id: str = Query(None, description="Product ID, all products when omitted"),
+        db: Session = Depends(get_read_db)
+):
+    """
+    Stock levels as of a point in time, read from the nearest inventory snapshot plus the changes since.
+    Inventory created after that time is left out.
+    :param at: str
+    :param product_id: Optional[str]
+    :param db: Session
+    :return: List[StockAtResponse]
+    """
+    result = await db.execute(stock_at(parse_date(at), product_id))
+    return result.all()
+
+
+def inventory_changes_query(
+        inventory_id: str, start: Optional[str], end: Optional[str], limit: Optional[int], cursor: Optional[str]
+) -> Select:
+    """
+    One page of the changes listed by GET /inventory/change, live and archived like the change series
+    :param inventory_id: str
+    :param start: Optional[str]
+    :param end: Optional[str]
+    :param limit: Optional[int]
+    :param cursor: Optional[str]
+    :return: Select of the InventoryChangeResponse columns
+    """
+    changes = union_all(*(
+        select(*[getattr(model, field) for field in InventoryChangeResponse.model_fields])
+        .where(model.inventory_id == inventory_id, *_time_range(model, start, end))
+        for model in (InventoryChange, InventoryChangeArchive)
+    )).subquery("changes")
+    return paginate(select(changes), changes.c, limit, cursor)
 
 
 @inventory_router.get("/change", response_model=List[InventoryChangeResponse], status_code=status.HTTP_200_OK)
 async def get_inventory_changes(
+        http_request: Request,
+        response: Response,
         inventory_id: str,
-        db: Session = Depends(get_db)
+        start: str = Query(None, description="Only changes at or after this time (format: YYYY-MM-DD[THH:MM:SS])"),
+        end: str = Query(
+            None, description="Only changes at or before this time, or during this day (format: YYYY-MM-DD[THH:MM:SS])"
+        ),
+        limit: int = Query(None, description="Items per page", ge=1, le=1000),
+        cursor: str = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+        fast: bool = Query(False, description=FAST_DESCRIPTION),
+        db: Session = Depends(get_read_db)
 ):
     """
-    Fetch inventory levels for a product and track changes over time.
+    Fetch inventory levels for a product and track changes over time, oldest first. Archived changes are included.
+    If-None-Match is answered with 304 Not Modified while no change was recorded since.
+    :param http_request: Request
+    :param response: Response
     :param inventory_id: str
+    :param start: Optional[str]
+    :param end: Optional[str]
+    :param limit: Optional[int] (max 1000, full history when omitted)
+    :param cursor: Optional[str]
+    :param fast: bool
     :param db: Session
     :return: List[InventoryChangeResponse]
     """
-    query = select(InventoryChange).where(InventoryChange.inventory_id == inventory_id)
+    query = inventory_changes_query(inventory_id, start, end, limit, cursor)
+    unchanged = not_modified(http_request, response, InventoryChange)
+    if unchanged:
+        return unchanged
+
     result = await db.execute(query)
-    return result.scalars().all()
+    changes = result.all()
+    set_next_cursor(response, changes, limit)
+    if fast:
+        return json_response(response, [dict(change._mapping) for change in changes])
+    return changes
+
+
+@inventory_router.get("/change/series", response_model=InventoryChangeSeries, status_code=status.HTTP_200_OK)
+async def get_inventory_change_series(
+        inventory_id: str,
+        start: str = Query(None, description="Series start (format: YYYY-MM-DD[THH:MM:SS])"),
+        end: str = Query(None, description="Series end (format: YYYY-MM-DD[THH:MM:SS])"),
+        points: int = Query(1000, description="Maximum number of points to return", ge=4, le=MAX_CHART_POINTS),
+        db: Session = Depends(get_read_db)
+):
+    """
+    Stock level after each change, downsampled for charting to the lowest and highest level of
+    equal time buckets. Archived changes are included.
+    :param inventory_id: str
+    :param start: Optional[str]
+    :param end: Optional[str]
+    :param points: int (max 5000)
+    :param db: Session
+    :return: InventoryChangeSeries
+    """
+    query = union_all(*(
+        select(model.created_at, model.current_stock)
+        .where(model.inventory_id == inventory_id, *_time_range(model, start, end))
+        for model in (InventoryChange, InventoryChangeArchive)
+    ))
+    result = await db.execute(query.order_by("created_at"))
+    rows = result.all()
+    times = np.array([row[0] for row in rows], dtype="datetime64[us]")
+    stock = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+    kept = series.min_max_downsample(times, stock, points)
+    return {
+        "inventory_id": inventory_id,
+        "total_changes": len(rows),
+        "timestamps": times[kept].tolist(),
+        "stock": stock[kept].tolist()
+    }
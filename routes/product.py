@@ -1,16 +1,47 @@
-from typing import List
+from typing import Dict, List, Optional
 
-from fastapi import APIRouter, status, Depends, Query, HTTPException
-from sqlalchemy import select
+from fastapi import APIRouter, Body, status, Depends, Query, HTTPException, Request, Response
+from sqlalchemy import Select, select
 from sqlalchemy.orm import Session
 
-from database.db import get_db
+from common.batch import IDS_DESCRIPTION, fetch_by_ids, parse_ids
+from common.cache import category_cache, not_modified, product_cache, table_versions
+from common.export import FAST_DESCRIPTION, json_response
+from common.pagination import NEXT_CURSOR_HEADER, decode_key, encode_key, paginate, set_next_cursor
+from common.search import product_index, search_query, set_similarity_threshold
+from database.db import get_db, get_read_db
 from models import Product, Category
-from schemas.product import RegisterProductRequest, RegisterProductResponse
+from schemas.product import ProductSearchResult, RegisterProductRequest, RegisterProductResponse
 
 product_router = APIRouter()
 
 
+def category_exists_query(category_id: str) -> Select:
+    """
+    Active category lookup behind POST /product
+    :param category_id: str
+    :return: Select
+    """
+    return select(Category.id).where(Category.is_active, Category.id == category_id)
+
+
+def products_query(category_id: Optional[str], fast: bool) -> Select:
+    """
+    Products listed by GET /product, before pagination
+    :param category_id: Optional[str]
+    :param fast: bool select only the response columns instead of the model
+    :return: Select
+    """
+    if fast:
+        query = select(*[getattr(Product, field) for field in RegisterProductResponse.model_fields])
+    else:
+        query = select(Product)
+    query = query.where(Product.is_active)
+    if category_id:
+        query = query.where(Product.category_id == category_id)
+    return query
+
+
 @product_router.post("", response_model=RegisterProductResponse, status_code=status.HTTP_201_CREATED)
 async def register_product(request: RegisterProductRequest, db: Session = Depends(get_db)):
     """
@@ -19,31 +50,166 @@ async def register_product(request: RegisterProductRequest, db: Session = Depend
     :param db: Session
     :return: RegisterProductResponse
     """
-    result = await db.execute(select(Category).where(Category.is_active, Category.id == request.category_id))
-    if request.category_id and not result.scalars().all():
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Category not found"
-        )
+    if request.category_id and not category_cache.get(("id", request.category_id)):
+        result = await db.execute(category_exists_query(request.category_id))
+        if not result.scalar():
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Category not found"
+            )
+        category_cache.set(("id", request.category_id), True)
     product = Product(**request.model_dump())
     db.add(product)
     await db.commit()
+    product_cache.clear()
+    table_versions.bump(Product)
+    product_index.add(product.id, product.name, product.description)
     return product
 
 
 @product_router.get("", response_model=List[RegisterProductResponse], status_code=status.HTTP_200_OK)
 async def get_products(
+        http_request: Request,
+        response: Response,
         category_id: str = Query(None, description="ID to filter products by"),
-        db: Session = Depends(get_db)
+        limit: int = Query(None, description="Items per page", ge=1, le=1000),
+        cursor: str = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+        fast: bool = Query(False, description=FAST_DESCRIPTION),
+        db: Session = Depends(get_read_db)
 ):
     """
-    Fetches all products from the database filtered by category ID
+    Fetches all products from the database filtered by category ID, answering If-None-Match with
+    304 Not Modified while they are unchanged
+    :param http_request: Request
+    :param response: Response
     :param category_id: Optional[str]
+    :param limit: Optional[int] (max 1000, all products when omitted)
+    :param cursor: Optional[str]
+    :param fast: bool
     :param db: Session
     :return: List[RegisterProductResponse]
     """
-    query = select(Product).where(Product.is_active)
-    if category_id:
-        query = query.where(Product.category_id == category_id)
-    result = await db.execute(query)
-    return result.scalars().all()
+    unchanged = not_modified(http_request, response, Product)
+    if unchanged:
+        return unchanged
+    if fast:
+        result = await db.execute(paginate(products_query(category_id, fast), Product, limit, cursor))
+        products = result.all()
+        set_next_cursor(response, products, limit)
+        return json_response(response, [dict(product._mapping) for product in products])
+
+    # Only pages are cached, an unpaginated listing holds the whole catalog in every entry
+    key = ("list", category_id, limit, cursor)
+    products = product_cache.get(key) if limit else None
+    if products is None:
+        result = await db.execute(paginate(products_query(category_id, fast), Product, limit, cursor))
+        products = [
+            RegisterProductResponse.model_validate(product, from_attributes=True) for product in result.scalars()
+        ]
+        if limit:
+            product_cache.set(key, products)
+    set_next_cursor(response, products, limit)
+    return products
+
+
+async def _products_by_id(response: Response, db: Session, ids: List[str]) -> Response:
+    """
+    Active products with the given ids keyed by id, ids that match none are left out
+    :param response: Response
+    :param db: Session
+    :param ids: List[str]
+    :return: Response
+    """
+    query = select(*[getattr(Product, field) for field in RegisterProductResponse.model_fields]).where(
+        Product.is_active
+    )
+    products = await fetch_by_ids(db, query, Product.id, ids)
+    return json_response(response, {product.id: dict(product._mapping) for product in products})
+
+
+@product_router.get("/batch", response_model=Dict[str, RegisterProductResponse], status_code=status.HTTP_200_OK)
+async def get_products_by_ids(
+        http_request: Request,
+        response: Response,
+        ids: List[str] = Query([], description=IDS_DESCRIPTION),
+        db: Session = Depends(get_read_db)
+):
+    """
+    Fetches many products by id in one request, answering If-None-Match with 304 Not Modified while they are unchanged
+    :param http_request: Request
+    :param response: Response
+    :param ids: List[str]
+    :param db: Session
+    :return: Dict[str, RegisterProductResponse]
+    """
+    unchanged = not_modified(http_request, response, Product)
+    if unchanged:
+        return unchanged
+    return await _products_by_id(response, db, parse_ids(ids))
+
+
+@product_router.post("/batch", response_model=Dict[str, RegisterProductResponse], status_code=status.HTTP_200_OK)
+async def post_products_by_ids(
+        response: Response,
+        ids: List[str] = Body(..., description=IDS_DESCRIPTION),
+        db: Session = Depends(get_read_db)
+):
+    """
+    Fetches many products by id in one request, for id lists too long for a URL
+    :param response: Response
+    :param ids: List[str]
+    :param db: Session
+    :return: Dict[str, RegisterProductResponse]
+    """
+    return await _products_by_id(response, db, parse_ids(ids))
+
+
+@product_router.get("/search", response_model=List[ProductSearchResult], status_code=status.HTTP_200_OK)
+async def search_products(
+        http_request: Request,
+        response: Response,
+        q: str = Query(..., description="Name prefix or words to match loosely", min_length=2, max_length=100),
+        limit: int = Query(20, description="Items per page", ge=1, le=100),
+        cursor: str = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+        db: Session = Depends(get_read_db)
+):
+    """
+    Searches active products by name and description. Names starting with the query rank first, then names
+    with a word starting with it, then names and descriptions sharing enough trigrams with it, so typos still match.
+    If-None-Match is answered with 304 Not Modified while products are unchanged
+    :param http_request: Request
+    :param response: Response
+    :param q: str
+    :param limit: int
+    :param cursor: Optional[str]
+    :param db: Session
+    :return: List[ProductSearchResult] best match first
+    """
+    after = decode_key(cursor, float, str) if cursor else None
+    unchanged = not_modified(http_request, response, Product)
+    if unchanged:
+        return unchanged
+    if db.get_bind().dialect.name == "postgresql":
+        await set_similarity_threshold(db)
+        result = await db.execute(search_query(q, limit, after))
+        products = [
+            ProductSearchResult(
+                **RegisterProductResponse.model_validate(row.Product, from_attributes=True).model_dump(),
+                score=float(row.score)
+            )
+            for row in result
+        ]
+    else:
+        await product_index.refresh(db)
+        ranked = product_index.search(q, limit, after)
+        result = await db.execute(select(Product).where(Product.is_active, Product.id.in_([id for _, id in ranked])))
+        found = {product.id: product for product in result.scalars()}
+        products = [
+            ProductSearchResult(
+                **RegisterProductResponse.model_validate(found[id], from_attributes=True).model_dump(), score=score
+            )
+            for score, id in ranked if id in found
+        ]
+    if len(products) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_key(products[-1].score, products[-1].id)
+    return products
@@ -1,109 +1,342 @@
+from collections import defaultdict
 from datetime import datetime, time, timedelta
-from typing import List
+from typing import Callable, Dict, List, Optional, Tuple
 
-from fastapi import APIRouter, Depends, status, Query, HTTPException
-from sqlalchemy import func, select
+import numpy as np
+
+from fastapi import APIRouter, Depends, status, Query, HTTPException, Header, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, Update, case, func, insert, select, update
 from sqlalchemy.orm import Session, selectinload
 
-from common.enums import Period
-from common.helpers import parse_date
-from database.db import get_db
+from common import fx, rollups, series
+from common.cache import not_modified, report_cache, table_versions
+from common.enums import ExportFormat, Period, SalesMetric, TopSalesBy
+from common.events import stock_alerts, stock_crossing
+from common.export import (
+    EXPORT_CHUNK_SIZE, FAST_DESCRIPTION, MEDIA_TYPES, json_response, negotiate_format, nested_records, stream_rows
+)
+from common.group_commit import GroupCommitWriter
+from common.helpers import parse_date, parse_end_date
+from common.idempotency import KEY_DESCRIPTION, fingerprint, idempotent
+from common.pagination import paginate, set_next_cursor
+from common.retry import run_with_retry
+from config.config import settings
+from database.db import get_db, get_read_db
 from models import Category, Product, Sales, Inventory, InventoryChange
-from schemas.sales import SalesRequest, SalesResponse, SalesRevenue, SalesRevenueComparison
+from models.types import uuid7
+from schemas.sales import (
+    SalesRequest, SalesResponse, SalesRevenue, SalesRevenueComparison, SalesRevenueSeries, TopSales
+)
 
 sales_router = APIRouter()
 
+MAX_SERIES_DAYS = 20 * 366
 
-@sales_router.post("", response_model=List[SalesResponse], status_code=status.HTTP_201_CREATED)
-async def create_sale(request: List[SalesRequest], db: Session = Depends(get_db)):
+# Flat sale and product columns for exports and the fast path, product fields prefixed with product_
+SALES_COLUMNS = [
+    Sales.id, Sales.quantity, Sales.amount, Sales.currency,
+    Sales.product_id, Product.name.label("product_name"),
+    Product.description.label("product_description"), Product.price.label("product_price"),
+    Product.currency.label("product_currency"), Product.unit.label("product_unit"),
+    Product.category_id.label("product_category_id"),
+    Sales.created_at, Sales.updated_at, Sales.is_active
+]
+
+
+def order_products_query(product_ids: List[str]) -> Select:
     """
-    Creates a new sale in the database
-    :param request: List[SalesRequest]
+    Products of an order read by POST /sales
+    :param product_ids: List[str]
+    :return: Select
+    """
+    return select(
+        Product.id, Product.name, Product.description, Product.price, Product.currency, Product.unit,
+        Product.category_id
+    ).where(Product.id.in_(product_ids))
+
+
+def decrement_stock_statement(quantities: Dict[str, int], now: datetime) -> Update:
+    """
+    UPDATE ... RETURNING taking the stock of an order in POST /sales. Stock only goes down where enough remains,
+    so concurrent orders can never oversell; products without enough stock are left out of the returned rows
+    :param quantities: Dict[str, int] quantity ordered per product id, not empty
+    :param now: datetime
+    :return: Update
+    """
+    # Compared through the column so product ids are bound with its type
+    decrement = case(*(
+        (Inventory.product_id == product_id, quantity) for product_id, quantity in quantities.items()
+    ))
+    return (
+        update(Inventory)
+        .where(
+            Inventory.is_active,
+            Inventory.product_id.in_(list(quantities)),
+            Inventory.stock_quantity >= decrement
+        )
+        .values(
+            stock_quantity=Inventory.stock_quantity - decrement, version=Inventory.version + 1, updated_at=now
+        )
+        .returning(Inventory.id, Inventory.product_id, Inventory.stock_quantity, Inventory.reorder_threshold)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def sales_query(
+        start_date: datetime, end_date: datetime, product_id: Optional[str], category_id: Optional[str], columns: bool
+) -> Select:
+    """
+    Sales listed by GET /sales, before pagination
+    :param start_date: datetime
+    :param end_date: datetime inclusive
+    :param product_id: Optional[str]
+    :param category_id: Optional[str]
+    :param columns: bool select SALES_COLUMNS instead of the models with their products
+    :return: Select
+    """
+    filters = [Sales.created_at >= start_date, Sales.created_at <= end_date, Sales.is_active]
+    if product_id:
+        filters.append(Sales.product_id == product_id)
+    if category_id:
+        filters.append(Product.category_id == category_id)
+    if columns:
+        return select(*SALES_COLUMNS).join(Product, Sales.product_id == Product.id).where(*filters)
+    query = select(Sales).options(selectinload(Sales.product)).where(*filters)
+    if category_id:
+        query = query.join(Product)
+    return query
+
+
+def all_sales_query(columns: bool) -> Select:
+    """
+    Sales listed by GET /sales/all, before pagination
+    :param columns: bool select SALES_COLUMNS instead of the models with their products
+    :return: Select
+    """
+    if columns:
+        return select(*SALES_COLUMNS).join(Product, Sales.product_id == Product.id).where(Sales.is_active)
+    return select(Sales).options(selectinload(Sales.product)).where(Sales.is_active)
+
+
+async def _place_order(db: Session, request: List[SalesRequest]) -> Tuple[List[dict], List[dict]]:
+    """
+    Places an order in one set-based pass: stock is decremented conditionally for
+    every product in a single UPDATE, then inventory changes and sales are bulk inserted
     :param db: Session
-    :return: List[SalesResponse]
+    :param request: List[SalesRequest]
+    :return: Tuple of List[dict] shaped as SalesResponse and the stock alerts to publish once committed
     """
-    sales = []
+    quantities = defaultdict(int)
     for order_request in request:
-        query = select(Inventory).where(Inventory.is_active, Inventory.product_id == order_request.product_id)
-        inventory = await db.execute(query)
-        inventory = inventory.scalar()
+        quantities[order_request.product_id] += order_request.quantity
+    if not quantities:
+        return [], []
 
-        if not inventory or order_request.quantity > inventory.stock_quantity:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Insufficient inventory found for product: {order_request.product_id}"
-            )
+    products = await db.execute(order_products_query(list(quantities)))
+    products = {product.id: dict(product._mapping) for product in products.all()}
+
+    now = datetime.now()
+    result = await db.execute(decrement_stock_statement(quantities, now))
+    rows = {row.product_id: row for row in result.all()}
+
+    missing = [product_id for product_id in quantities if product_id not in rows]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Insufficient inventory found for product: {missing[0]}"
+        )
+
+    await db.execute(insert(InventoryChange), [
+        {
+            "id": uuid7(now),
+            "inventory_id": row.id,
+            "old_stock": row.stock_quantity + quantities[product_id],
+            "current_stock": row.stock_quantity,
+            "created_at": now,
+            "updated_at": now,
+            "is_active": True
+        }
+        for product_id, row in rows.items()
+    ])
+
+    # Sales are recorded in the product's currency, with the amount kept exact in minor units
+    sales = [
+        {
+            "id": uuid7(now),
+            **order_request.model_dump(),
+            "amount_minor": fx.to_minor(order_request.amount, products[order_request.product_id]["currency"]),
+            "currency": products[order_request.product_id]["currency"],
+            "created_at": now,
+            "updated_at": now,
+            "is_active": True
+        }
+        for order_request in request
+    ]
+    await db.execute(insert(Sales), sales)
+    await rollups.record_sales(db, sales, products)
 
-        inventory.stock_quantity -= order_request.quantity
-        inventory_change = InventoryChange(
-            inventory_id=inventory.id,
-            old_stock=inventory.stock_quantity + order_request.quantity,
-            current_stock=inventory.stock_quantity
+    alerts = [
+        stock_crossing(
+            row.id, product_id, row.stock_quantity + quantities[product_id], row.stock_quantity,
+            row.reorder_threshold, row.reorder_threshold
         )
-        db.add(inventory_change)
+        for product_id, row in rows.items()
+    ]
+    return [{**sale, "product": products[sale["product_id"]]} for sale in sales], [alert for alert in alerts if alert]
+
 
-        sales.append(Sales(**order_request.model_dump()))
+async def _place_recorded_order(
+        db: Session, payload: Tuple[List[SalesRequest], Callable]
+) -> Tuple[List[dict], List[dict]]:
+    """
+    Places an order and records its idempotency outcome in the same transaction
+    :param db: Session
+    :param payload: Tuple of List[SalesRequest] and the record callable given by idempotent
+    :return: Tuple of List[dict] shaped as SalesResponse and the stock alerts to publish once committed
+    """
+    request, record = payload
+    sales, alerts = await _place_order(db, request)
+    await record(db, sales)
+    return sales, alerts
 
-    db.add_all(sales)
-    await db.commit()
-    query = select(Sales).options(selectinload(Sales.product)).where(
-        Sales.is_active,
-        Sales.id.in_([sale.id for sale in sales])
+
+# Opt-in ingestion mode: orders from concurrent requests share one transaction per batch
+order_writer = GroupCommitWriter(
+    _place_recorded_order, settings.SALES_GROUP_COMMIT_MAX_BATCH, settings.SALES_GROUP_COMMIT_MAX_DELAY
+)
+
+
+@sales_router.post("", response_model=List[SalesResponse], status_code=status.HTTP_201_CREATED)
+async def create_sale(
+        request: List[SalesRequest],
+        idempotency_key: str = Header(None, max_length=255, description=KEY_DESCRIPTION),
+        db: Session = Depends(get_db)
+):
+    """
+    Creates a new sale in the database
+    :param request: List[SalesRequest]
+    :param idempotency_key: Optional[str] retries with the same key replay the first response
+    :param db: Session
+    :return: List[SalesResponse]
+    """
+    async def create(record):
+        if settings.SALES_GROUP_COMMIT:
+            sales, alerts = await order_writer.submit((request, record))
+        else:
+            async def place_order():
+                placed = await _place_recorded_order(db, (request, record))
+                await db.commit()
+                return placed
+
+            sales, alerts = await run_with_retry(db, place_order)
+        table_versions.bump(Sales, Inventory, InventoryChange)
+        for alert in alerts:
+            stock_alerts.publish(alert)
+        return sales
+
+    return await idempotent(
+        db, "POST /sales", idempotency_key, fingerprint([order.model_dump() for order in request]),
+        List[SalesResponse], status.HTTP_201_CREATED, create
     )
-    sales = await db.execute(query)
-    return sales.scalars().all()
 
 
 @sales_router.get("", response_model=List[SalesResponse], status_code=status.HTTP_200_OK)
 async def get_sales(
+        http_request: Request,
+        response: Response,
         start_date: str = Query(..., description="Start date for sales data (format: YYYY-MM-DD)"),
         end_date: str = Query(..., description="End date for sales data (format: YYYY-MM-DD)"),
         product_id: str = Query(None, description="Product ID to filter sales data"),
         category_id: str = Query(None, description="Category ID to filter sales data"),
-        db: Session = Depends(get_db)
+        limit: int = Query(None, description="Items per page", ge=1, le=1000),
+        cursor: str = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+        format: ExportFormat = Query(None, description="Stream the sales as ndjson or csv instead of a JSON list"),
+        fast: bool = Query(False, description=FAST_DESCRIPTION),
+        accept: str = Header(None),
+        db: Session = Depends(get_read_db)
 ):
     """
-    Returns sales based on time interval, product_id, or category_id
+    Returns sales based on time interval, product_id, or category_id.
+    NDJSON and CSV exports are streamed in chunks from a server-side cursor.
+    If-None-Match is answered with 304 Not Modified while sales and products are unchanged.
+    :param http_request: Request
+    :param response: Response
     :param start_date: str
     :param end_date: str
     :param product_id: str
     :param category_id: str
+    :param limit: Optional[int] (max 1000, all matching sales when omitted)
+    :param cursor: Optional[str]
+    :param format: Optional[ExportFormat] (defaults to the Accept header, then json)
+    :param fast: bool
+    :param accept: Optional[str]
     :param db: Session
-    :return: List[SalesResponse]
+    :return: List[SalesResponse] or StreamingResponse
     """
     start_date = parse_date(start_date)
-    end_date = parse_date(end_date)
-    end_date = datetime.combine(end_date.date(), time(23, 59, 59))
-    query = select(Sales).options(selectinload(Sales.product)).where(
-        Sales.created_at >= start_date,
-        Sales.created_at <= end_date,
-        Sales.is_active
-    )
-    if product_id:
-        query = query.where(Sales.product_id == product_id)
-    if category_id:
-        query = query.join(Product).where(Product.category_id == category_id)
+    end_date = parse_end_date(end_date)
+    export_format = negotiate_format(format, accept)
+    unchanged = not_modified(http_request, response, Sales, Product, variant=export_format.value)
+    if unchanged:
+        return unchanged
+
+    # Exports and the fast path select the response columns, the default path loads the models
+    columns = fast or export_format != ExportFormat.JSON
+    query = sales_query(start_date, end_date, product_id, category_id, columns)
+    if export_format != ExportFormat.JSON:
+        result = await db.stream(paginate(query, Sales, limit, cursor).execution_options(yield_per=EXPORT_CHUNK_SIZE))
+        return StreamingResponse(
+            stream_rows(result, export_format), media_type=MEDIA_TYPES[export_format], headers=dict(response.headers)
+        )
+
+    if fast:
+        result = await db.execute(paginate(query, Sales, limit, cursor))
+        sales = result.all()
+        set_next_cursor(response, sales, limit)
+        return json_response(response, nested_records(result.keys(), sales))
 
-    sales = await db.execute(query)
-    return sales.scalars().all()
+    sales = await db.execute(paginate(query, Sales, limit, cursor))
+    sales = sales.scalars().all()
+    set_next_cursor(response, sales, limit)
+    return sales
 
 
 @sales_router.get("/all", response_model=List[SalesResponse], status_code=status.HTTP_200_OK)
 async def get_all_sales(
+        http_request: Request,
+        response: Response,
         limit: int = Query(10, description="Items per page", le=50),
         offset: int = Query(0, description="Offset for pagination", ge=0),
-        db: Session = Depends(get_db)
+        cursor: str = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+        fast: bool = Query(False, description=FAST_DESCRIPTION),
+        db: Session = Depends(get_read_db)
 ):
     """
-    Returns paginated sales data
+    Returns paginated sales data, answering If-None-Match with 304 Not Modified while it is unchanged
+    :param http_request: Request
+    :param response: Response
     :param limit: int (default 10, max 50)
     :param offset: int (default 0)
+    :param cursor: str
+    :param fast: bool
     :param db: Session
     :return: List[SalesResponse]
     """
-    query = select(Sales).options(selectinload(Sales.product)).limit(limit).offset(offset)
-    result = await db.execute(query)
-    return result.scalars().all()
+    unchanged = not_modified(http_request, response, Sales, Product)
+    if unchanged:
+        return unchanged
+    query = all_sales_query(columns=fast)
+    if fast:
+        result = await db.execute(paginate(query, Sales, limit, cursor, offset))
+        sales = result.all()
+        set_next_cursor(response, sales, limit)
+        return json_response(response, nested_records(result.keys(), sales))
+
+    result = await db.execute(paginate(query, Sales, limit, cursor, offset))
+    sales = result.scalars().all()
+    set_next_cursor(response, sales, limit)
+    return sales
 
 
 @sales_router.get("/revenue", response_model=SalesRevenue, status_code=status.HTTP_200_OK)
@@ -113,18 +346,22 @@ async def calculate_revenue(
         week_start: str = Query(None, description="Start date of the week (format: YYYY-MM-DD)"),
         month: str = Query(None, description="Month for monthly revenue analysis (format: YYYY-MM)"),
         year: int = Query(None, description="Year for annual revenue analysis"),
-        db: Session = Depends(get_db)
+        target_currency: str = Query(None, pattern=fx.CURRENCY_PATTERN, description=fx.TARGET_CURRENCY_DESCRIPTION),
+        db: Session = Depends(get_read_db)
 ):
     """
-    Returns revenue in a particular time span based on date, week, month, and year
+    Returns revenue in a particular time span based on date, week, month, and year,
+    converted at the latest exchange rates on or before the last day of the span
     :param period: Period
     :param date: str
     :param week_start: str
     :param month: str
     :param year: int
+    :param target_currency: Optional[str]
     :param db: Session
     :return: SalesRevenue
     """
+    target_currency = target_currency or settings.FX_BASE_CURRENCY
     if period == Period.DAILY:
         if not date:
             raise HTTPException(
@@ -157,53 +394,184 @@ async def calculate_revenue(
         start_date = datetime(year, 1, 1)
         end_date = datetime(year + 1, 1, 1)
     else:
-        return {"revenue": 0}
+        return {"revenue": 0, "currency": target_currency}
 
-    query = await db.execute(
-        select(Sales.amount)
-        .where(Sales.created_at >= start_date)
-        .where(Sales.created_at < end_date)
-        .where(Sales.is_active)
-    )
-    result = query.scalars().all()
-    total_revenue = sum(result)
-    return {"revenue": total_revenue}
+    rate_day = (end_date - timedelta(days=1)).date()
+    factors = await fx.conversion_factors(db, target_currency, rate_day)
+    totals = (await db.execute(rollups.sales_totals(start_date, end_date, factors=factors))).one()
+    return {
+        "revenue": fx.from_minor(totals.revenue, target_currency),
+        "currency": target_currency,
+        "unconverted": await fx.unconverted_totals(db, [totals], start_date, end_date, factors)
+    }
+
+
+@sales_router.get("/revenue/series", response_model=SalesRevenueSeries, status_code=status.HTTP_200_OK)
+async def revenue_series(
+        period: Period = Query(..., description="Bucket size of the series"),
+        start_date: str = Query(..., description="Start date of the series (format: YYYY-MM-DD)"),
+        end_date: str = Query(..., description="End date of the series (format: YYYY-MM-DD)"),
+        product_id: str = Query(None, description="Product ID to filter sales data"),
+        category_id: str = Query(None, description="Category ID to filter sales data"),
+        target_currency: str = Query(None, pattern=fx.CURRENCY_PATTERN, description=fx.TARGET_CURRENCY_DESCRIPTION),
+        db: Session = Depends(get_read_db)
+):
+    """
+    Returns dense, zero-filled revenue and units per bucket between two dates,
+    converted at the latest exchange rates on or before the end date
+    :param period: Period
+    :param start_date: str
+    :param end_date: str
+    :param product_id: str
+    :param category_id: str
+    :param target_currency: Optional[str]
+    :param db: Session
+    :return: SalesRevenueSeries
+    """
+    target_currency = target_currency or settings.FX_BASE_CURRENCY
+    start_date = parse_date(start_date).date()
+    end_date = parse_date(end_date).date()
+    if end_date < start_date:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="End date is before start date"
+        )
+    if (end_date - start_date).days >= MAX_SERIES_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Series cannot span more than {MAX_SERIES_DAYS} days"
+        )
+
+    factors = await fx.conversion_factors(db, target_currency, end_date)
+    start, end = datetime.combine(start_date, time()), datetime.combine(end_date + timedelta(days=1), time())
+    result = await db.execute(rollups.sales_totals(
+        start, end, by="day", product_id=product_id, category_id=category_id, factors=factors
+    ))
+    rows = result.all()
+    days, units, revenue, _ = zip(*rows) if rows else ((), (), (), ())
+    starts, revenue, units = series.dense_series(start_date, end_date, period, days, revenue, units)
+    decimals = fx.exponent(target_currency)
+    return {
+        "period": period,
+        "bucket_starts": starts.tolist(),
+        "revenue": np.round(revenue / 10 ** decimals, decimals).tolist(),
+        "units": units.astype(int).tolist(),
+        "currency": target_currency,
+        "unconverted": await fx.unconverted_totals(db, rows, start, end, factors, product_id, category_id)
+    }
 
 
 @sales_router.get("/compare-revenue", response_model=SalesRevenueComparison, status_code=status.HTTP_200_OK)
 async def compare_revenue(
         start_date: str = Query(..., description="Start date for revenue comparison (format: YYYY-MM-DD)"),
         end_date: str = Query(..., description="End date for revenue comparison (format: YYYY-MM-DD)"),
-        db: Session = Depends(get_db)
+        target_currency: str = Query(None, pattern=fx.CURRENCY_PATTERN, description=fx.TARGET_CURRENCY_DESCRIPTION),
+        db: Session = Depends(get_read_db)
 ):
     """
-    Compares revenue of categories in a particular time span
+    Compares revenue of categories in a particular time span,
+    converted at the latest exchange rates on or before the end date
     :param start_date: str
     :param end_date: str
+    :param target_currency: Optional[str]
     :param db: Session
     :return: SalesRevenueComparison
     """
+    target_currency = target_currency or settings.FX_BASE_CURRENCY
     start_date = parse_date(start_date)
-    end_date = parse_date(end_date)
-    end_date = datetime.combine(end_date.date(), time(23, 59, 59))
+    rate_day = parse_date(end_date).date()
+    end_date = datetime.combine(rate_day + timedelta(days=1), time())
 
-    sales_data = await db.execute(
-        select(
-            Product.category_id,
-            func.sum(Sales.amount)
-        )
-        .join(Product, Sales.product_id == Product.id)
-        .join(Category, Product.category_id == Category.id)
-        .where(Sales.created_at >= start_date, Sales.created_at <= end_date)
-        .group_by(Product.category_id, Category.id)
-    )
+    factors = await fx.conversion_factors(db, target_currency, rate_day)
+    sales_data = await db.execute(rollups.sales_totals(start_date, end_date, by="category", factors=factors))
+    sales_data = sales_data.all()
 
     result = [
         {
-            "category_id": category_id,
-            "total_revenue": total_revenue
+            "category_id": totals.key,
+            "total_revenue": fx.from_minor(totals.revenue, target_currency)
         }
-        for (category_id, total_revenue) in sales_data.all()
+        for totals in sales_data
     ]
 
-    return {"revenue_comparison": result}
+    return {
+        "currency": target_currency,
+        "revenue_comparison": result,
+        "unconverted": await fx.unconverted_totals(db, sales_data, start_date, end_date, factors)
+    }
+
+
+@sales_router.get("/top", response_model=TopSales, status_code=status.HTTP_200_OK)
+async def top_sales(
+        start_date: str = Query(..., description="Start date of the range (format: YYYY-MM-DD)"),
+        end_date: str = Query(..., description="End date of the range, included (format: YYYY-MM-DD)"),
+        by: TopSalesBy = Query(TopSalesBy.PRODUCT, description="Rank products or categories"),
+        metric: SalesMetric = Query(SalesMetric.REVENUE, description="Rank by revenue or by units sold"),
+        limit: int = Query(10, description="Number of best sellers to return", ge=1, le=100),
+        target_currency: str = Query(None, pattern=fx.CURRENCY_PATTERN, description=fx.TARGET_CURRENCY_DESCRIPTION),
+        db: Session = Depends(get_read_db)
+):
+    """
+    Returns the best selling products or categories in a date range with the ABC classification of everything
+    sold in it: A makes up the first 80% of the metric, B the next 15% and C the rest. Revenue is converted
+    at the latest exchange rates on or before the end date. Ranges that ended before today are cached.
+    :param start_date: str
+    :param end_date: str
+    :param by: TopSalesBy
+    :param metric: SalesMetric
+    :param limit: int
+    :param target_currency: Optional[str]
+    :param db: Session
+    :return: TopSales
+    """
+    target_currency = target_currency or settings.FX_BASE_CURRENCY
+    start = parse_date(start_date)
+    rate_day = parse_date(end_date).date()
+    if rate_day < start.date():
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="End date is before start date"
+        )
+    key = ("top", start, rate_day, by, metric, limit, target_currency)
+    closed = rate_day < datetime.now().date()
+    if closed:
+        cached = report_cache.get(key)
+        if cached is not None:
+            return cached
+
+    factors = await fx.conversion_factors(db, target_currency, rate_day)
+    end = datetime.combine(rate_day + timedelta(days=1), time())
+    totals = rollups.sales_totals(start, end, by=by.value, factors=factors)
+    result = await db.execute(
+        rollups.ranked_totals(totals, "revenue" if metric == SalesMetric.REVENUE else "quantity", limit)
+    )
+    rows = result.all()
+
+    model = Product if by == TopSalesBy.PRODUCT else Category
+    catalog = await db.execute(select(func.count()).select_from(model).where(model.is_active))
+    classes = {}
+    for row in rows:
+        classes.setdefault(row.abc_class, {
+            "abc_class": row.abc_class,
+            "count": row.class_count,
+            "share": round(row.class_total / row.total, 4) if row.total else 0
+        })
+    response = {
+        "by": by,
+        "metric": metric,
+        "currency": target_currency,
+        "items": [
+            {
+                "id": row.key,
+                "rank": row.rank,
+                "quantity": row.quantity,
+                "revenue": fx.from_minor(row.revenue, target_currency),
+                "abc_class": row.abc_class
+            }
+            for row in rows if row.rank <= limit
+        ],
+        "classes": [classes[name] for name in sorted(classes)],
+        "unsold": max(catalog.scalar() - sum(summary["count"] for summary in classes.values()), 0),
+        "unconverted": await fx.unconverted_totals(db, rows, start, end, factors)
+    }
+    if closed:
+        report_cache.set(key, response)
+    return response
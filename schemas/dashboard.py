@@ -0,0 +1,19 @@
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+from common.enums import Period
+from schemas.category import CategoryResponse
+from schemas.inventory import InventoryResponse
+from schemas.sales import RevenueComparison
+
+
+class Dashboard(BaseModel):
+    currency: str
+    revenue: Dict[Period, float]
+    revenue_by_category: Optional[List[RevenueComparison]] = None
+    low_stock: Optional[List[InventoryResponse]] = None
+    categories: Optional[List[CategoryResponse]] = None
+    failed: Dict[str, str]
+    # Revenue left out of each tile for lack of an exchange rate, per currency
+    unconverted: Dict[str, Dict[str, float]] = {}
@@ -1,14 +1,17 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
+from typing import List, Optional
 
 
 class InventoryRequest(BaseModel):
     product_id: str
-    stock_quantity: int
+    stock_quantity: int = Field(ge=0)
+    reorder_threshold: Optional[int] = Field(None, ge=0)
 
 
 class InventoryResponse(InventoryRequest):
     id: str
+    version: int
 
 
 class InventoryChangeResponse(BaseModel):
@@ -19,3 +22,16 @@ class InventoryChangeResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     is_active: bool
+
+
+class StockAtResponse(BaseModel):
+    inventory_id: str
+    product_id: str
+    stock_quantity: int
+
+
+class InventoryChangeSeries(BaseModel):
+    inventory_id: str
+    total_changes: int
+    timestamps: List[datetime]
+    stock: List[int]
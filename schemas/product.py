@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 from common.enums import UnitQuantity
 from datetime import datetime
@@ -8,6 +8,7 @@ class RegisterProductRequest(BaseModel):
     name: str
     description: Optional[str] = None
     price: float
+    currency: str = Field("USD", pattern="^[A-Z]{3}$")
     unit: UnitQuantity = UnitQuantity.UNIT
     category_id: Optional[str] = None
 
@@ -17,8 +18,13 @@ class RegisterProductResponse(BaseModel):
     name: str
     description: Optional[str] = None
     price: float
+    currency: str
     unit: UnitQuantity
     category_id: Optional[str] = None
     created_at: datetime
     updated_at: datetime
     is_active: bool
+
+
+class ProductSearchResult(RegisterProductResponse):
+    score: float
@@ -1,7 +1,9 @@
-from datetime import datetime
-from typing import List
+from datetime import date, datetime
+from typing import Dict, List
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from common.enums import Period, SalesMetric, TopSalesBy
 
 from schemas.product import RegisterProductRequest
 
@@ -11,7 +13,7 @@ class ProductSchema(RegisterProductRequest):
 
 
 class SalesRequest(BaseModel):
-    quantity: int
+    quantity: int = Field(gt=0)
     amount: float
     product_id: str
 
@@ -20,6 +22,7 @@ class SalesResponse(BaseModel):
     id: str
     quantity: int
     amount: float
+    currency: str
     product: ProductSchema
     created_at: datetime
     updated_at: datetime
@@ -31,6 +34,9 @@ class SalesResponse(BaseModel):
 
 class SalesRevenue(BaseModel):
     revenue: float
+    currency: str
+    # Revenue per currency without an exchange rate, in that currency, left out of the totals
+    unconverted: Dict[str, float] = {}
 
 
 class RevenueComparison(BaseModel):
@@ -39,4 +45,39 @@ class RevenueComparison(BaseModel):
 
 
 class SalesRevenueComparison(BaseModel):
+    currency: str
     revenue_comparison: List[RevenueComparison]
+    unconverted: Dict[str, float] = {}
+
+
+class SalesRevenueSeries(BaseModel):
+    period: Period
+    bucket_starts: List[date]
+    revenue: List[float]
+    units: List[int]
+    currency: str
+    unconverted: Dict[str, float] = {}
+
+
+class TopSalesItem(BaseModel):
+    id: str
+    rank: int
+    quantity: int
+    revenue: float
+    abc_class: str
+
+
+class AbcClassSummary(BaseModel):
+    abc_class: str
+    count: int
+    share: float
+
+
+class TopSales(BaseModel):
+    by: TopSalesBy
+    metric: SalesMetric
+    currency: str
+    items: List[TopSalesItem]
+    classes: List[AbcClassSummary]
+    unsold: int
+    unconverted: Dict[str, float] = {}
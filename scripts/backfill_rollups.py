@@ -0,0 +1,27 @@
+import argparse
+import asyncio
+from datetime import date
+
+from common import rollups
+from database.db import engine
+
+
+async def backfill(start: date = None, end: date = None):
+    """
+    Rebuilds the daily sales rollups from raw sales in a single transaction
+    :param start: Optional[date] first day to rebuild
+    :param end: Optional[date] last day to rebuild
+    :return: None
+    """
+    async with engine.begin() as connection:
+        for statement in rollups.rebuild_statements(start, end):
+            await connection.execute(statement)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild daily sales rollups from raw sales")
+    parser.add_argument("--start", type=date.fromisoformat, help="First day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, help="Last day to rebuild (YYYY-MM-DD)")
+    args = parser.parse_args()
+    asyncio.run(backfill(args.start, args.end))
+    print("Sales rollups have been rebuilt")
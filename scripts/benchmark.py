@@ -0,0 +1,266 @@
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+DEFAULT_DATABASE = os.path.join(tempfile.gettempdir(), "ecommerce-benchmark.sqlite")
+# Ids per batch lookup request
+BATCH_SIZE = 1000
+
+statement_counter = contextvars.ContextVar("statement_counter", default=None)
+
+
+def _configure(database_url: str):
+    """
+    Points the application settings at the benchmark database; must run before the app is imported
+    :param database_url: str async SQLAlchemy URL
+    :return: None
+    """
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["ALEMBIC_DATABASE_URL"] = database_url.replace("+aiosqlite", "").replace("+asyncpg", "")
+    os.environ.pop("READ_REPLICA_DATABASE_URL", None)
+
+
+def _count_statements(engine):
+    from sqlalchemy import event
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count(*_):
+        counter = statement_counter.get()
+        if counter is not None:
+            counter[0] += 1
+
+
+def seed(scale: int, products: int, reset: bool):
+    """
+    Generates a synthetic dataset of the given number of sales and bulk loads it
+    :param scale: int number of sales
+    :param products: int
+    :param reset: bool drop and recreate every table first
+    :return: None
+    """
+    from sqlalchemy import create_engine
+
+    import models
+    from config.config import settings
+    from scripts.generate_data import generate
+    from scripts.load_data import load
+
+    engine = create_engine(settings.ALEMBIC_DATABASE_URL)
+    if reset:
+        models.Base.metadata.drop_all(engine)
+    models.Base.metadata.create_all(engine)
+    engine.dispose()
+    with tempfile.TemporaryDirectory() as directory:
+        generate(directory, categories=20, products=products, sales=scale, years=2, end=date.today(),
+                 popularity_skew=1.1, seed=scale)
+        load(directory)
+
+
+async def sample_ids() -> dict:
+    from sqlalchemy import select
+
+    from database.db import SessionLocal
+    from models import Inventory, Product
+
+    async with SessionLocal() as db:
+        row = (await db.execute(
+            select(Product.id, Product.category_id, Inventory.id.label("inventory_id"))
+            .join(Inventory, Inventory.product_id == Product.id)
+            .order_by(Inventory.stock_quantity.desc())
+            .limit(1)
+        )).one()
+        product_ids = (await db.execute(select(Product.id).limit(BATCH_SIZE))).scalars().all()
+    return {
+        "product_id": row.id, "category_id": row.category_id, "inventory_id": row.inventory_id,
+        "product_ids": product_ids
+    }
+
+
+def scenarios(ids: dict) -> dict:
+    """
+    One representative request per route, keyed by a readable name
+    :param ids: dict with product_id, category_id, inventory_id and product_ids to use in requests
+    :return: dict of name to (method, path, params, body) or (method, path, params, body, headers)
+    """
+    today = date.today()
+    week_ago = (today - timedelta(days=7)).isoformat()
+    return {
+        "GET /category": ("GET", "/api/v1/category", {"limit": 50}, None),
+        "POST /category": ("POST", "/api/v1/category", None, lambda: {"name": f"Category {time.time_ns()}"}),
+        "GET /product": ("GET", "/api/v1/product", {"limit": 100}, None),
+        # A client revalidating its copy, answered with 304 from the write counters
+        "GET /product If-None-Match": ("GET", "/api/v1/product", {"limit": 100}, None, {"If-None-Match": "*"}),
+        "GET /product?category_id": ("GET", "/api/v1/product", {"category_id": ids["category_id"]}, None),
+        "GET /product/search": ("GET", "/api/v1/product/search", {"q": "prod"}, None),
+        "POST /product/batch": ("POST", "/api/v1/product/batch", None, lambda: ids["product_ids"]),
+        "POST /product": ("POST", "/api/v1/product", None, lambda: {
+            "name": "Benchmark product", "price": 9.99, "category_id": ids["category_id"]
+        }),
+        "GET /inventory": ("GET", "/api/v1/inventory", {"low_stock_threshold": 5, "limit": 100}, None),
+        "PUT /inventory": ("PUT", "/api/v1/inventory", {"product_id": ids["product_id"], "quantity": 1}, None),
+        "GET /inventory/change": ("GET", "/api/v1/inventory/change", {"inventory_id": ids["inventory_id"],
+                                                                      "limit": 100}, None),
+        "POST /inventory/batch": ("POST", "/api/v1/inventory/batch", {"by_product": True},
+                                  lambda: ids["product_ids"]),
+        "GET /inventory/stock-at": ("GET", "/api/v1/inventory/stock-at", {"at": week_ago}, None),
+        "GET /sales": ("GET", "/api/v1/sales", {"start_date": week_ago, "end_date": today.isoformat(),
+                                                "limit": 100}, None),
+        "GET /sales/all": ("GET", "/api/v1/sales/all", {"limit": 50}, None),
+        "POST /sales": ("POST", "/api/v1/sales", None, lambda: [
+            {"product_id": ids["product_id"], "quantity": 1, "amount": 9.99}
+        ]),
+        "GET /sales/revenue daily": ("GET", "/api/v1/sales/revenue", {"period": "daily",
+                                                                      "date": today.isoformat()}, None),
+        "GET /sales/revenue annual": ("GET", "/api/v1/sales/revenue", {"period": "annual", "year": today.year}, None),
+        "GET /sales/revenue/series": ("GET", "/api/v1/sales/revenue/series", {
+            "period": "daily", "start_date": (today - timedelta(days=365)).isoformat(),
+            "end_date": today.isoformat()
+        }, None),
+        "GET /sales/compare-revenue": ("GET", "/api/v1/sales/compare-revenue", {
+            "start_date": (today - timedelta(days=365)).isoformat(), "end_date": today.isoformat()
+        }, None),
+        "GET /dashboard": ("GET", "/api/v1/dashboard", None, None),
+        "GET /sales/top": ("GET", "/api/v1/sales/top", {
+            "start_date": (today - timedelta(days=365)).isoformat(), "end_date": today.isoformat()
+        }, None),
+    }
+
+
+async def run_scenario(client, scenario: tuple, requests: int, concurrency: int) -> dict:
+    """
+    Sends a number of requests split over concurrent workers and summarises latency
+    :param client: httpx.AsyncClient
+    :param scenario: tuple of (method, path, params, body) with optional headers
+    :param requests: int
+    :param concurrency: int
+    :return: dict
+    """
+    method, path, params, body, headers = scenario if len(scenario) == 5 else (*scenario, None)
+    latencies, statements, errors = [], [], 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            counter = [0]
+            statement_counter.set(counter)
+            started = time.perf_counter()
+            response = await client.request(
+                method, path, params=params, json=body() if body else None, headers=headers
+            )
+            latencies.append(time.perf_counter() - started)
+            statements.append(counter[0])
+            errors += response.status_code >= 400
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "statements_per_request": round(float(np.mean(statements)), 2),
+    }
+
+
+def compare(results: dict, baseline_path: str, tolerance: float) -> list:
+    """
+    Lists scenarios whose p95 latency regressed beyond the tolerance compared with a saved run
+    :param results: dict
+    :param baseline_path: str
+    :param tolerance: float allowed relative slowdown, 0.2 means 20%
+    :return: list of messages
+    """
+    with open(baseline_path) as file:
+        baseline = json.load(file)["results"]
+    regressions = []
+    for scale, scenarios_ in results.items():
+        for name, current in scenarios_.items():
+            previous = baseline.get(scale, {}).get(name)
+            if previous and current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+                regressions.append(
+                    f"{name} at {scale} sales: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms"
+                )
+    return regressions
+
+
+async def main(args) -> int:
+    import httpx
+
+    from app import app
+    from common.cache import category_cache, product_cache
+    from database.db import engine, read_engine
+
+    for database_engine in {engine, read_engine}:
+        _count_statements(database_engine)
+
+    results = {}
+    for scale in args.scales:
+        if not args.no_seed:
+            seed(scale, args.products, reset=args.reset or args.database_url is None)
+            await engine.dispose()
+            await read_engine.dispose()
+            category_cache.clear()
+            product_cache.clear()
+        ids = await sample_ids()
+        results[str(scale)] = {}
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for name, scenario in scenarios(ids).items():
+                if args.only and not any(part in name for part in args.only):
+                    continue
+                summary = await run_scenario(client, scenario, args.requests, args.concurrency)
+                results[str(scale)][name] = summary
+                print(f"{scale:>9} {name:<28} p50 {summary['p50_ms']:>8.2f}ms  p95 {summary['p95_ms']:>8.2f}ms  "
+                      f"p99 {summary['p99_ms']:>8.2f}ms  {summary['throughput_rps']:>8.1f} rps  "
+                      f"{summary['statements_per_request']:>5} sql/req  {summary['errors']} errors")
+
+    report = {
+        "meta": {
+            "created_at": datetime.now().isoformat(),
+            "database": "sqlite" if "sqlite" in os.environ["DATABASE_URL"] else "postgresql",
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results have been saved to {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every router in-process against a seeded database")
+    parser.add_argument("--database-url", help=f"Async SQLAlchemy URL, defaults to SQLite at {DEFAULT_DATABASE}. "
+                                               "Tables are only dropped for other databases when --reset is given")
+    parser.add_argument("--reset", action="store_true", help="Drop and recreate every table before seeding")
+    parser.add_argument("--no-seed", action="store_true", help="Benchmark the data already in the database")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10_000, 100_000], help="Numbers of sales to seed")
+    parser.add_argument("--products", type=int, default=2_000)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per route and scale")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--only", nargs="+", help="Only run routes whose name contains one of these strings")
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--baseline", help="Previous results file to compare p95 latency against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 slowdown against the baseline")
+    arguments = parser.parse_args()
+    _configure(arguments.database_url or f"sqlite+aiosqlite:///{DEFAULT_DATABASE}")
+    raise SystemExit(asyncio.run(main(arguments)))
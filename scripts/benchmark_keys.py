@@ -0,0 +1,121 @@
+import argparse
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, create_engine, insert, text
+
+from models.types import UUIDString, uuid7
+
+KEY_SCHEMES = {
+    "uuid4 string": (String, lambda at: str(uuid.uuid4())),
+    "uuid7 native": (UUIDString, uuid7),
+}
+
+
+def _table(metadata: MetaData, name: str, key_type) -> Table:
+    """
+    A table shaped like sales, with the key scheme under test on id and product_id
+    """
+    return Table(
+        name, metadata,
+        Column("id", key_type, primary_key=True),
+        Column("product_id", key_type, nullable=False, index=True),
+        Column("quantity", Integer, nullable=False),
+        Column("created_at", DateTime, nullable=False),
+    )
+
+
+def _index_bytes(connection, table: Table) -> int:
+    """
+    Size on disk of every index of a table, primary key included
+    :param connection: Connection
+    :param table: Table
+    :return: int
+    """
+    if connection.dialect.name == "postgresql":
+        return connection.execute(text("SELECT pg_indexes_size(:name)"), {"name": table.name}).scalar()
+    # The dbstat virtual table reports the pages of every SQLite table and index
+    return connection.execute(text(
+        "SELECT coalesce(sum(pgsize), 0) FROM dbstat WHERE name IN "
+        "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :name)"
+    ), {"name": table.name}).scalar()
+
+
+def run(database_url: str, rows: int, batch_size: int, products: int) -> dict:
+    """
+    Inserts the same synthetic sales with each key scheme, one transaction per batch,
+    and measures batch latency, throughput and index size
+    :param database_url: str synchronous SQLAlchemy URL
+    :param rows: int
+    :param batch_size: int
+    :param products: int distinct product ids the rows reference
+    :return: dict of scheme name to results
+    """
+    engine = create_engine(database_url)
+    results = {}
+    start = datetime.now() - timedelta(days=365)
+    step = timedelta(days=365) / rows
+    for number, (name, (key_type, make_key)) in enumerate(KEY_SCHEMES.items()):
+        metadata = MetaData()
+        table = _table(metadata, f"benchmark_keys_{number}", key_type)
+        metadata.drop_all(engine)
+        metadata.create_all(engine)
+        product_ids = [make_key(start) for _ in range(products)]
+        rng = np.random.default_rng(0)
+
+        latencies = []
+        for offset in range(0, rows, batch_size):
+            batch = [
+                {
+                    "id": make_key(start + step * i),
+                    "product_id": product_ids[product],
+                    "quantity": 1,
+                    "created_at": start + step * i
+                }
+                for i, product in zip(
+                    range(offset, min(offset + batch_size, rows)), rng.integers(0, products, size=batch_size)
+                )
+            ]
+            started = time.perf_counter()
+            with engine.begin() as connection:
+                connection.execute(insert(table), batch)
+            latencies.append(time.perf_counter() - started)
+
+        with engine.begin() as connection:
+            if connection.dialect.name == "postgresql":
+                connection.execute(text(f"ANALYZE {table.name}"))
+            index_bytes = _index_bytes(connection, table)
+        metadata.drop_all(engine)
+
+        latencies = np.array(latencies) * 1000
+        results[name] = {
+            "rows_per_second": round(rows / latencies.sum() * 1000),
+            "batch_p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "batch_p95_ms": round(float(np.percentile(latencies, 95)), 2),
+            "index_mb": round(index_bytes / 2 ** 20, 2),
+        }
+    engine.dispose()
+    return results
+
+
+if __name__ == "__main__":
+    default_database = os.path.join(tempfile.gettempdir(), "ecommerce-benchmark-keys.sqlite")
+    parser = argparse.ArgumentParser(
+        description="Compare insert latency and index size of random string keys and time-ordered native UUID keys"
+    )
+    parser.add_argument(
+        "--database-url", default=f"sqlite:///{default_database}",
+        help="Synchronous SQLAlchemy URL; the benchmark creates and drops its own tables"
+    )
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=1_000)
+    parser.add_argument("--products", type=int, default=10_000)
+    args = parser.parse_args()
+    print(f"{'scheme':<14} {'rows/s':>9} {'batch p50 (ms)':>15} {'batch p95 (ms)':>15} {'index (MB)':>11}")
+    for scheme, result in run(args.database_url, args.rows, args.batch_size, args.products).items():
+        print(f"{scheme:<14} {result['rows_per_second']:>9} {result['batch_p50_ms']:>15} "
+              f"{result['batch_p95_ms']:>15} {result['index_mb']:>11}")
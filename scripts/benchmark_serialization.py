@@ -0,0 +1,97 @@
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import List
+
+import orjson
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from common.enums import UnitQuantity
+from common.export import nested_records
+from schemas.sales import SalesResponse
+
+COLUMNS = [
+    "id", "quantity", "amount", "currency", "product_id", "product_name", "product_description", "product_price",
+    "product_currency", "product_unit", "product_category_id", "created_at", "updated_at", "is_active"
+]
+
+
+def make_rows(count: int) -> list:
+    """
+    Synthetic sales rows as the tuples the fast path selects
+    :param count: int
+    :return: list of tuples ordered like COLUMNS
+    """
+    start = datetime(2023, 1, 1)
+    products = [(str(uuid.uuid4()), f"Product {i}", str(uuid.uuid4())) for i in range(100)]
+    rows = []
+    for i in range(count):
+        product_id, name, category_id = products[i % len(products)]
+        created_at = start + timedelta(seconds=i)
+        rows.append((
+            str(uuid.uuid4()), i % 5 + 1, (i % 5 + 1) * 9.99, "USD", product_id, name, "Benchmark product", 9.99,
+            "USD", UnitQuantity.UNIT, category_id, created_at, created_at, True
+        ))
+    return rows
+
+
+def as_orm_objects(rows: list) -> list:
+    """
+    The same rows shaped like Sales objects with a loaded product relationship
+    :param rows: list of tuples
+    :return: list of SimpleNamespace
+    """
+    return [
+        SimpleNamespace(
+            id=row[0], quantity=row[1], amount=row[2], currency=row[3],
+            created_at=row[11], updated_at=row[12], is_active=row[13],
+            product=SimpleNamespace(
+                id=row[4], name=row[5], description=row[6], price=row[7], currency=row[8], unit=row[9],
+                category_id=row[10]
+            )
+        )
+        for row in rows
+    ]
+
+
+async def current_path(objects: list) -> bytes:
+    field = create_response_field(name="Response_get_sales", type_=List[SalesResponse])
+    content = await serialize_response(field=field, response_content=objects, is_coroutine=True)
+    return JSONResponse(content).body
+
+
+async def fast_path(rows: list) -> bytes:
+    return orjson.dumps(nested_records(COLUMNS, rows))
+
+
+async def timed(function, payload, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await function(payload)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+async def main(sizes: List[int], repeat: int):
+    print(f"{'rows':>8} {'current (ms)':>14} {'fast (ms)':>11} {'speedup':>9}")
+    for size in sizes:
+        rows = make_rows(size)
+        objects = as_orm_objects(rows)
+        assert orjson.loads(await current_path(objects[:10])) == orjson.loads(await fast_path(rows[:10]))
+        current = await timed(current_path, objects, repeat)
+        fast = await timed(fast_path, rows, repeat)
+        print(f"{size:>8} {current * 1000:>14.1f} {fast * 1000:>11.1f} {current / fast:>8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare list response serialization paths for GET /sales")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3, help="Best of this many runs is reported")
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.repeat))
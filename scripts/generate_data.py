@@ -0,0 +1,214 @@
+import argparse
+import csv
+import os
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from common.enums import UnitQuantity
+from models.types import uuid7
+
+WRITE_CHUNK_SIZE = 500_000
+RESTOCK_INTERVAL_DAYS = 14
+
+
+class _Lazy:
+    """
+    A column whose values are produced one write chunk at a time, so large files never hold every value in memory
+    """
+
+    def __init__(self, length: int, make):
+        self.length = length
+        self.make = make
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, chunk: slice):
+        return self.make(*chunk.indices(self.length)[:2])
+
+
+def _ids(seconds: np.ndarray, origin: datetime) -> _Lazy:
+    """
+    Time-ordered ids embedding each row's creation time, as the API would have generated them
+    """
+    return _Lazy(
+        len(seconds),
+        lambda start, stop: [uuid7(origin + timedelta(seconds=int(second))) for second in seconds[start:stop]]
+    )
+
+
+def _constant(value, count: int) -> _Lazy:
+    return _Lazy(count, lambda start, stop: [value] * (stop - start))
+
+
+def _lookup(values: list, index: np.ndarray) -> _Lazy:
+    values = np.array(values, dtype=object)
+    return _Lazy(len(index), lambda start, stop: values[index[start:stop]].tolist())
+
+
+def _timestamps(seconds: np.ndarray, origin: datetime) -> _Lazy:
+    origin = np.datetime64(origin, "s")
+    return _Lazy(
+        len(seconds),
+        lambda start, stop: np.datetime_as_string(origin + seconds[start:stop].astype("timedelta64[s]")).tolist()
+    )
+
+
+def _write(path: str, header: list, columns: list):
+    """
+    Writes columns to a CSV file in chunks; None values become empty fields (NULL)
+    :param path: str
+    :param header: list of column names
+    :param columns: list of equally long lists, numpy arrays or lazy columns, one per header entry
+    :return: None
+    """
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(header)
+        for offset in range(0, len(columns[0]), WRITE_CHUNK_SIZE):
+            chunks = [column[offset:offset + WRITE_CHUNK_SIZE] for column in columns]
+            writer.writerows(zip(*(chunk.tolist() if isinstance(chunk, np.ndarray) else chunk for chunk in chunks)))
+
+
+def generate(
+        out: str,
+        categories: int,
+        products: int,
+        sales: int,
+        years: int,
+        end: date,
+        popularity_skew: float,
+        seed: int
+):
+    """
+    Writes category, product, inventory, sales and inventory_change CSV files with
+    Zipf-like product popularity, yearly and weekly seasonality, periodic restocks and an
+    inventory change history that is consistent with the sales and restocks
+    :param out: str output directory
+    :param categories: int
+    :param products: int
+    :param sales: int
+    :param years: int span of the sales history
+    :param end: date the history ends on (exclusive)
+    :param popularity_skew: float Zipf exponent, higher means fewer best sellers take more sales
+    :param seed: int
+    :return: None
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(out, exist_ok=True)
+    end = datetime.combine(end, datetime.min.time())
+    days = years * 365
+    start = end - timedelta(days=days)
+    catalog_created_at = start - timedelta(days=1)
+    catalog_created = catalog_created_at.isoformat()
+
+    category_ids = [uuid7(catalog_created_at) for _ in range(categories)]
+    _write(
+        os.path.join(out, "category.csv"),
+        ["name", "id", "created_at", "updated_at", "is_active"],
+        [[f"Category {i + 1}" for i in range(categories)], category_ids,
+         _constant(catalog_created, categories), _constant(catalog_created, categories), _constant(True, categories)]
+    )
+
+    product_ids = [uuid7(catalog_created_at) for _ in range(products)]
+    prices = np.round(rng.lognormal(mean=3, sigma=0.8, size=products), 2)
+    units = [unit.name for unit in UnitQuantity]
+    unit_weights = np.array([8 if unit == UnitQuantity.UNIT.name else 1 for unit in units])
+    unit_weights = unit_weights / unit_weights.sum()
+    _write(
+        os.path.join(out, "product.csv"),
+        ["name", "description", "price", "currency", "unit", "category_id", "id", "created_at", "updated_at",
+         "is_active"],
+        [[f"Product {i + 1}" for i in range(products)], _constant(None, products), prices,
+         _constant("USD", products), _lookup(units, rng.choice(len(units), size=products, p=unit_weights)),
+         _lookup(category_ids, rng.integers(0, categories, size=products)), product_ids,
+         _constant(catalog_created, products), _constant(catalog_created, products), _constant(True, products)]
+    )
+
+    # Zipf-like popularity over a random ranking of the catalog
+    popularity = 1 / np.arange(1, products + 1) ** popularity_skew
+    popularity = rng.permutation(popularity / popularity.sum())
+
+    # Yearly seasonality with a year-end peak, plus busier weekends
+    calendar = np.datetime64(start.date()) + np.arange(days)
+    day_of_year = (calendar - calendar.astype("datetime64[Y]")).astype(np.int64)
+    # 1970-01-01 was a Thursday, so day numbers 2 and 3 modulo 7 are Saturday and Sunday
+    weekend = np.isin(calendar.astype(np.int64) % 7, (2, 3))
+    day_weights = (1.3 + 0.3 * np.cos(2 * np.pi * (day_of_year - 350) / 365)) * np.where(weekend, 1.25, 1.0)
+    # Steady growth over the whole history
+    day_weights = day_weights * np.linspace(0.7, 1.3, days)
+    sale_seconds = rng.choice(days, size=sales, p=day_weights / day_weights.sum()) * 86400
+    sale_seconds = np.sort(sale_seconds + rng.integers(8 * 3600, 22 * 3600, size=sales))
+    sale_products = rng.choice(products, size=sales, p=popularity)
+    quantities = np.minimum(rng.geometric(0.6, size=sales), 10)
+
+    sale_times = _timestamps(sale_seconds, start)
+    amounts = np.round(quantities * prices[sale_products], 2)
+    _write(
+        os.path.join(out, "sales.csv"),
+        ["quantity", "amount", "amount_minor", "currency", "product_id", "id", "created_at", "updated_at",
+         "is_active"],
+        [quantities, amounts, np.rint(amounts * 100).astype(np.int64), _constant("USD", sales),
+         _lookup(product_ids, sale_products), _ids(sale_seconds, start), sale_times, sale_times,
+         _constant(True, sales)]
+    )
+
+    # Restock every product periodically with 1.5x its expected demand for the interval
+    restock_days = np.arange(0, days, RESTOCK_INTERVAL_DAYS)
+    expected_demand = popularity * sales * quantities.mean() * RESTOCK_INTERVAL_DAYS / days
+    restock_quantity = np.ceil(expected_demand * 1.5).astype(np.int64) + 1
+    restock_products = np.repeat(np.arange(products), len(restock_days))
+    restock_seconds = np.tile(restock_days * 86400 + 6 * 3600, products)
+
+    event_products = np.concatenate([sale_products, restock_products])
+    event_seconds = np.concatenate([sale_seconds, restock_seconds])
+    event_deltas = np.concatenate([-quantities, restock_quantity[restock_products]])
+    order = np.lexsort((event_seconds, event_products))
+    event_products, event_seconds, event_deltas = event_products[order], event_seconds[order], event_deltas[order]
+
+    # Running stock per product; the opening stock is whatever keeps every product non-negative
+    running = np.cumsum(event_deltas)
+    group_starts = np.flatnonzero(np.r_[True, event_products[1:] != event_products[:-1]])
+    group_offsets = np.r_[0, running[group_starts[1:] - 1]]
+    group_products = event_products[group_starts]
+    running -= np.repeat(group_offsets, np.diff(np.r_[group_starts, len(running)]))
+    opening = np.zeros(products, dtype=np.int64)
+    opening[group_products] = np.maximum(0, -np.minimum.reduceat(running, group_starts))
+    opening += restock_quantity
+    current = opening[event_products] + running
+
+    final_stock = opening.copy()
+    final_stock[group_products] += running[np.r_[group_starts[1:] - 1, len(running) - 1]]
+    inventory_ids = [uuid7(catalog_created_at) for _ in range(products)]
+    _write(
+        os.path.join(out, "inventory.csv"),
+        ["product_id", "stock_quantity", "id", "created_at", "updated_at", "is_active"],
+        [product_ids, final_stock, inventory_ids,
+         _constant(catalog_created, products), _constant(catalog_created, products), _constant(True, products)]
+    )
+
+    change_times = _timestamps(event_seconds, start)
+    _write(
+        os.path.join(out, "inventory_change.csv"),
+        ["inventory_id", "old_stock", "current_stock", "id", "created_at", "updated_at", "is_active"],
+        [_lookup(inventory_ids, event_products), current - event_deltas, current,
+         _ids(event_seconds, start), change_times, change_times, _constant(True, len(current))]
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic e-commerce dataset as CSV files")
+    parser.add_argument("out", help="Directory the CSV files are written to")
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--sales", type=int, default=1_000_000)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--end", type=date.fromisoformat, default=date.today(), help="Last day (exclusive)")
+    parser.add_argument("--popularity-skew", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    generate(
+        args.out, args.categories, args.products, args.sales, args.years, args.end, args.popularity_skew, args.seed
+    )
+    print(f"Dataset has been written to {args.out}")
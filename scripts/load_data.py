@@ -1,63 +1,145 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import argparse
+import csv
+import io
+import json
+import os
+import time
+from datetime import date, datetime
+from itertools import islice
+from typing import Iterator
 
-from common.enums import UnitQuantity
-from models import Category, Inventory, Product, Sales
+from sqlalchemy import Boolean, Date, DateTime, Enum, Float, Integer, create_engine, insert
+
+from common import rollups
 from config.config import settings
+from models import Category, FxRate, Inventory, InventoryChange, Product, Sales
+
+# Load order follows the foreign keys
+TABLES = [Category, Product, Inventory, Sales, InventoryChange, FxRate]
+BATCH_SIZE = 10_000
+
+
+def _read(path: str) -> Iterator[dict]:
+    """
+    Yields records from a CSV file with a header row or from a JSON lines file
+    :param path: str
+    :return: Iterator[dict]
+    """
+    with open(path, newline="") as file:
+        if path.endswith(".jsonl"):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(file)
+
+
+def _converter(table):
+    """
+    Builds a function that turns text fields of a record into values of the table's column types
+    :param table: Table
+    :return: callable
+    """
+    parsers = {}
+    for column in table.columns:
+        column_type = column.type
+        if isinstance(column_type, Enum) and column_type.enum_class:
+            parsers[column.name] = lambda value, enum_class=column_type.enum_class: enum_class[value]
+        elif isinstance(column_type, DateTime):
+            parsers[column.name] = datetime.fromisoformat
+        elif isinstance(column_type, Date):
+            parsers[column.name] = date.fromisoformat
+        elif isinstance(column_type, Boolean):
+            parsers[column.name] = lambda value: value.lower() in ("true", "t", "1", "yes")
+        elif isinstance(column_type, Integer):
+            parsers[column.name] = int
+        elif isinstance(column_type, Float):
+            parsers[column.name] = float
+
+    def convert(record: dict) -> dict:
+        converted = {}
+        for name, value in record.items():
+            if value == "":
+                value = None
+            elif isinstance(value, str) and name in parsers:
+                value = parsers[name](value)
+            converted[name] = value
+        return converted
+    return convert
+
+
+def _copy(connection, table, path: str):
+    """
+    Streams a CSV file into Postgres with COPY; missing columns take their server defaults
+    :param connection: Connection
+    :param table: Table
+    :param path: str
+    :return: None
+    """
+    with open(path, newline="") as file:
+        header = next(csv.reader(io.StringIO(file.readline())))
+        file.seek(0)
+        quote = connection.dialect.identifier_preparer.quote
+        columns = ", ".join(quote(column) for column in header)
+        cursor = connection.connection.cursor()
+        cursor.copy_expert(f"COPY {quote(table.name)} ({columns}) FROM STDIN WITH (FORMAT csv, HEADER true)", file)
+
+
+def load_file(connection, table, path: str, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Loads one file into a table, with COPY on Postgres for CSV and batched multi-row inserts otherwise
+    :param connection: Connection
+    :param table: Table
+    :param path: str
+    :param batch_size: int
+    :return: int number of rows loaded, -1 when COPY was used
+    """
+    if connection.dialect.name == "postgresql" and path.endswith(".csv"):
+        _copy(connection, table, path)
+        return -1
+
+    convert = _converter(table)
+    records = _read(path)
+    loaded = 0
+    while True:
+        batch = [convert(record) for record in islice(records, batch_size)]
+        if not batch:
+            return loaded
+        connection.execute(insert(table), batch)
+        loaded += len(batch)
+
+
+def load(directory: str, batch_size: int = BATCH_SIZE):
+    """
+    Loads every <table>.csv or <table>.jsonl found in a directory in one transaction,
+    then rebuilds the sales rollups
+    :param directory: str
+    :param batch_size: int
+    :return: None
+    """
+    engine = create_engine(settings.ALEMBIC_DATABASE_URL)
+    with engine.begin() as connection:
+        for model in TABLES:
+            table = model.__table__
+            for extension in (".csv", ".jsonl"):
+                path = os.path.join(directory, table.name + extension)
+                if not os.path.exists(path):
+                    continue
+                started = time.perf_counter()
+                loaded = load_file(connection, table, path, batch_size)
+                rows = "all" if loaded < 0 else loaded
+                print(f"{table.name}: loaded {rows} rows from {path} in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        for statement in rollups.rebuild_statements():
+            connection.execute(statement)
+        print(f"sales rollups: rebuilt in {time.perf_counter() - started:.1f}s")
+
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True, pool_recycle=3600)
-Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-# engine = create_engine(settings.DATABASE_URL)
-# Session = sessionmaker(bind=engine)
-session = Session()
-
-categories = [
-    Category(name="Test Category 1"),
-    Category(name="Test Category 2"),
-    Category(name="Test Category 3")
-]
-session.add_all(categories)
-session.flush(categories)
-
-products = [
-    Product(
-        name="Test Product 1",
-        description="This is a test product",
-        price=10.0, unit=UnitQuantity.UNIT,
-        category_id=categories[0].id
-    ),
-    Product(
-        name="Test Product 2",
-        description="This is a test product",
-        price=15.0,
-        unit=UnitQuantity.UNIT,
-        category_id=categories[0].id
-    ),
-    Product(
-        name="Test Product 3",
-        description="This is a test product",
-        price=15.0,
-        unit=UnitQuantity.UNIT,
-        category_id=categories[0].id
-    ),
-]
-session.add_all(products)
-session.flush(products)
-
-inventory = [
-    Inventory(product_id=products[0].id, stock_quantity=100),
-    Inventory(product_id=products[1].id, stock_quantity=50),
-    Inventory(product_id=products[2].id, stock_quantity=50),
-]
-session.add_all(inventory)
-
-sales = [
-    Sales(product_id=products[0].id, quantity=5, amount=50.0),
-    Sales(product_id=products[0].id, quantity=3, amount=45.0),
-]
-session.add_all(sales)
-
-session.commit()
-session.close()
-
-print("Data has been loaded into the database")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk load CSV or JSON lines files into the database")
+    parser.add_argument("directory", help="Directory holding <table>.csv or <table>.jsonl files")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows per multi-row insert")
+    args = parser.parse_args()
+    load(args.directory, args.batch_size)
+    print("Data has been loaded into the database")
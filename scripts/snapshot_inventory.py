@@ -0,0 +1,60 @@
+import argparse
+import asyncio
+from datetime import datetime, time, timedelta
+
+from common import stock
+from database.db import engine
+
+
+async def snapshot(at: datetime):
+    """
+    Writes a stock snapshot of every inventory as of a point in time
+    :param at: datetime
+    :return: None
+    """
+    async with engine.begin() as connection:
+        for statement in stock.snapshot_statements(at):
+            await connection.execute(statement)
+
+
+async def compact(before: datetime) -> int:
+    """
+    Moves inventory changes covered by a snapshot taken at or before a point in time into the archive table
+    :param before: datetime
+    :return: int number of archived changes
+    """
+    async with engine.begin() as connection:
+        archived = 0
+        for statement in stock.archive_statements(before):
+            archived = (await connection.execute(statement)).rowcount
+    return archived
+
+
+async def main(args):
+    for day in range(args.days, 0, -1):
+        at = args.at - timedelta(days=day)
+        await snapshot(at)
+        print(f"Snapshot taken as of {at.isoformat()}")
+    await snapshot(args.at)
+    print(f"Snapshot taken as of {args.at.isoformat()}")
+    if args.archive_days is not None:
+        before = args.at - timedelta(days=args.archive_days)
+        archived = await compact(before)
+        print(f"{archived} inventory changes up to the last snapshot before {before.isoformat()} have been archived")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Snapshot inventory stock levels for point-in-time queries and archive old inventory changes. "
+                    "Meant to run daily, e.g. from cron shortly after midnight"
+    )
+    parser.add_argument(
+        "--at", type=datetime.fromisoformat, default=datetime.combine(datetime.now().date(), time()),
+        help="Time to snapshot (default: today at midnight, which leaves in-flight changes time to commit)"
+    )
+    parser.add_argument("--days", type=int, default=0, help="Also snapshot each of this many days before --at")
+    parser.add_argument(
+        "--archive-days", type=int,
+        help="Archive changes covered by a snapshot that is at least this many days older than --at"
+    )
+    asyncio.run(main(parser.parse_args()))
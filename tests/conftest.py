@@ -0,0 +1,74 @@
+import os
+import tempfile
+from datetime import datetime
+from typing import List, Tuple
+
+import pytest
+
+# The settings are read on import, so the test database is configured before the app is imported
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(), "test.sqlite")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DATABASE_PATH}"
+os.environ["ALEMBIC_DATABASE_URL"] = f"sqlite:///{DATABASE_PATH}"
+os.environ.pop("READ_REPLICA_DATABASE_URL", None)
+
+import httpx  # noqa: E402
+
+from app import app  # noqa: E402
+from common.cache import category_cache, product_cache, report_cache  # noqa: E402
+from common.search import product_index  # noqa: E402
+from common import fx  # noqa: E402
+from database.db import Base, engine  # noqa: E402
+from models import Sales  # noqa: E402
+from models.types import uuid7  # noqa: E402
+from routes.sales import order_writer  # noqa: E402
+
+API = "/api/v1"
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def client():
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+    for cache in (category_cache, product_cache, report_cache, fx.rate_cache):
+        cache.clear()
+    product_index.clear()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+    # The transport does not run shutdown handlers, and the writer's task must not outlive the test's event loop
+    await order_writer.stop()
+
+
+async def create_stocked_product(client: httpx.AsyncClient, stock_quantity: int = 10) -> dict:
+    """
+    Registers a product with inventory
+    :param client: httpx.AsyncClient
+    :param stock_quantity: int
+    :return: dict product
+    """
+    product = (await client.post(f"{API}/product", json={"name": "Desk lamp", "price": 25})).json()
+    await client.post(f"{API}/inventory", json={"product_id": product["id"], "stock_quantity": stock_quantity})
+    return product
+
+
+async def insert_sales(product: dict, sales: List[Tuple[datetime, int, float]]):
+    """
+    Inserts sales of a product directly, as a bulk load outside the API would, without maintaining the rollups
+    :param product: dict
+    :param sales: List of (created_at, quantity, amount)
+    :return: None
+    """
+    async with engine.begin() as connection:
+        await connection.execute(Sales.__table__.insert(), [
+            {
+                "id": uuid7(created_at), "product_id": product["id"], "quantity": quantity, "amount": amount,
+                "amount_minor": fx.to_minor(amount, product["currency"]), "currency": product["currency"],
+                "created_at": created_at, "updated_at": created_at, "is_active": True
+            }
+            for created_at, quantity, amount in sales
+        ])
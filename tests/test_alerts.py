@@ -0,0 +1,63 @@
+import pytest
+
+from common.events import Broadcaster, stock_alerts
+from database.db import SessionLocal
+from routes.inventory import _alert_stream
+from tests.conftest import API, create_stocked_product
+
+pytestmark = pytest.mark.anyio
+
+
+def drain(queue) -> list:
+    events = []
+    while not queue.empty():
+        events.append(queue.get_nowait())
+    return events
+
+
+async def test_crossing_the_reorder_threshold_publishes_alerts(client):
+    product = await create_stocked_product(client)
+    order = [{"product_id": product["id"], "quantity": 3, "amount": 75}]
+    threshold = f"{API}/inventory/reorder-threshold"
+
+    with stock_alerts.subscribe() as queue:
+        await client.put(threshold, params={"product_id": product["id"], "reorder_threshold": 5})
+        for _ in range(3):
+            await client.post(f"{API}/sales", json=order)
+        await client.put(f"{API}/inventory", params={"product_id": product["id"], "quantity": 10})
+        await client.put(threshold, params={"product_id": product["id"], "reorder_threshold": 11})
+        await client.put(threshold, params={"product_id": product["id"]})
+
+    events = [(event["type"], event["old_stock"], event["stock_quantity"]) for event in drain(queue)]
+    # Only moves across the threshold alert: 10 -> 7 stays above 5, 4 -> 1 stays below it
+    assert events == [
+        ("low_stock", 7, 4), ("restocked", 1, 11), ("low_stock", 11, 11), ("restocked", 11, 11)
+    ]
+
+
+async def test_stream_starts_with_the_products_low_on_stock(client):
+    low = await create_stocked_product(client, stock_quantity=2)
+    await create_stocked_product(client, stock_quantity=20)
+    for product in (await client.get(f"{API}/product")).json():
+        await client.put(
+            f"{API}/inventory/reorder-threshold", params={"product_id": product["id"], "reorder_threshold": 5}
+        )
+
+    async with SessionLocal() as db:
+        stream = _alert_stream(db)
+        snapshot = await stream.__anext__()
+        stock_alerts.publish({"type": "low_stock", "product_id": "next"})
+        published = await stream.__anext__()
+        await stream.aclose()
+    assert snapshot["type"] == "snapshot"
+    assert [(item["product_id"], item["stock_quantity"]) for item in snapshot["items"]] == [(low["id"], 2)]
+    assert published == {"type": "low_stock", "product_id": "next"}
+
+
+async def test_full_subscriber_queue_drops_its_oldest_event():
+    broadcaster = Broadcaster(2)
+    with broadcaster.subscribe() as queue:
+        for number in range(3):
+            broadcaster.publish({"number": number})
+        assert drain(queue) == [{"number": 1}, {"number": 2}]
+    assert broadcaster.stats() == {"subscribers": 0}
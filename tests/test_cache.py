@@ -0,0 +1,46 @@
+from datetime import date
+
+import pytest
+
+from tests.conftest import API, create_stocked_product
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_unchanged_list_is_not_modified_until_a_write(client):
+    await create_stocked_product(client)
+    first = await client.get(f"{API}/product")
+    etag = first.headers["ETag"]
+
+    unchanged = await client.get(f"{API}/product", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+
+    await client.post(f"{API}/product", json={"name": "Floor lamp", "price": 40})
+    changed = await client.get(f"{API}/product", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert len(changed.json()) == 2
+
+
+async def test_sales_formats_have_their_own_etag(client):
+    product = await create_stocked_product(client)
+    await client.post(f"{API}/sales", json=[{"product_id": product["id"], "quantity": 1, "amount": 25}])
+    today = date.today().isoformat()
+    params = {"start_date": today, "end_date": today}
+
+    etags = {}
+    for accept in ("application/json", "text/csv", "application/x-ndjson"):
+        response = await client.get(f"{API}/sales", params=params, headers={"Accept": accept})
+        assert response.status_code == 200
+        assert response.headers["Vary"] == "Accept"
+        etags[accept] = response.headers["ETag"]
+    assert len(set(etags.values())) == 3
+
+    csv = await client.get(f"{API}/sales", params=params, headers={"Accept": "text/csv"})
+    assert csv.text.splitlines()[0].startswith("id,")
+    json_etag = {"If-None-Match": etags["application/json"]}
+    as_csv = await client.get(f"{API}/sales", params=params, headers={"Accept": "text/csv", **json_etag})
+    assert as_csv.status_code == 200
+    as_json = await client.get(f"{API}/sales", params=params, headers={"Accept": "application/json", **json_etag})
+    assert as_json.status_code == 304
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+from sqlalchemy import insert, select
+from sqlalchemy.exc import OperationalError
+
+from common.group_commit import GroupCommitWriter
+from config.config import settings
+from database.db import engine
+from models import Category
+from routes.sales import order_writer
+from tests.conftest import API, create_stocked_product
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_concurrent_orders_share_a_transaction_and_fail_alone(client, monkeypatch):
+    monkeypatch.setattr(settings, "SALES_GROUP_COMMIT", True)
+    monkeypatch.setattr(order_writer, "max_delay", 0.05)
+    product = await create_stocked_product(client, stock_quantity=5)
+    batches = order_writer.stats()["batches"]
+
+    responses = await asyncio.gather(*(
+        client.post(f"{API}/sales", json=[{"product_id": product["id"], "quantity": 1, "amount": 25}])
+        for _ in range(6)
+    ))
+    assert sorted(response.status_code for response in responses) == [201] * 5 + [404]
+    assert order_writer.stats()["batches"] - batches == 1
+    inventory = (await client.get(f"{API}/inventory/batch", params={"ids": product["id"], "by_product": True})).json()
+    assert inventory[product["id"]]["stock_quantity"] == 0
+    assert len((await client.get(f"{API}/sales/all", params={"limit": 50})).json()) == 5
+
+
+async def test_batch_database_error_falls_back_to_a_transaction_per_write(client):
+    attempts = []
+
+    async def add_category(db, name):
+        attempts.append(name)
+        if name == "Broken":
+            raise OperationalError("INSERT INTO category", {}, Exception("disk I/O error"))
+        await db.execute(insert(Category).values(name=name))
+        return name
+
+    writer = GroupCommitWriter(add_category, max_batch=10, max_delay=0.05)
+    results = await asyncio.gather(
+        *(writer.submit(name) for name in ("Lighting", "Broken", "Garden")), return_exceptions=True
+    )
+    await writer.stop()
+
+    assert results[0] == "Lighting" and results[2] == "Garden"
+    assert isinstance(results[1], OperationalError)
+    # The batch stops at the failing write and is rolled back, then every write runs on its own
+    assert attempts == ["Lighting", "Broken", "Lighting", "Broken", "Garden"]
+    assert writer.stats()["batches"] == 1
+    async with engine.connect() as connection:
+        names = (await connection.execute(select(Category.name).order_by(Category.name))).scalars().all()
+    assert names == ["Garden", "Lighting"]
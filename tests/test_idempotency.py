@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from common import idempotency
+from config.config import settings
+from routes import sales
+from tests.conftest import API, create_stocked_product
+
+pytestmark = pytest.mark.anyio
+
+# Fields that differ between two writes of the same request
+VOLATILE = {"id", "created_at", "updated_at", "version", "stock_quantity"}
+
+
+def _shape(body: bytes):
+    """
+    Field names in order and stable values of a JSON body, nested objects included
+    """
+    def shape(value):
+        if isinstance(value, list):
+            return [shape(item) for item in value]
+        if isinstance(value, dict):
+            return [(name, None if name in VOLATILE else shape(item)) for name, item in value.items()]
+        return value
+    return shape(json.loads(body))
+
+
+async def test_keyed_sale_matches_unkeyed_sale(client):
+    product = await create_stocked_product(client)
+    order = [{"product_id": product["id"], "quantity": 1, "amount": 25}]
+
+    unkeyed = await client.post(f"{API}/sales", json=order)
+    first = await client.post(f"{API}/sales", json=order, headers={"Idempotency-Key": "order-1"})
+    replay = await client.post(f"{API}/sales", json=order, headers={"Idempotency-Key": "order-1"})
+
+    assert unkeyed.status_code == first.status_code == replay.status_code == 201
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.content == first.content
+    assert _shape(first.content) == _shape(unkeyed.content)
+
+
+async def test_keyed_inventory_update_matches_unkeyed_update(client):
+    product = await create_stocked_product(client)
+    params = {"product_id": product["id"], "quantity": -1}
+
+    unkeyed = await client.put(f"{API}/inventory", params=params)
+    first = await client.put(f"{API}/inventory", params=params, headers={"Idempotency-Key": "stock-1"})
+    replay = await client.put(f"{API}/inventory", params=params, headers={"Idempotency-Key": "stock-1"})
+
+    assert unkeyed.status_code == first.status_code == replay.status_code == 200
+    assert replay.content == first.content
+    assert _shape(first.content) == _shape(unkeyed.content)
+
+
+@pytest.mark.parametrize("group_commit", [False, True])
+async def test_key_replays_order_that_committed_before_a_crash(client, monkeypatch, group_commit):
+    product = await create_stocked_product(client)
+    order = [{"product_id": product["id"], "quantity": 1, "amount": 25}]
+
+    def crash(*tables):
+        raise RuntimeError("worker died after the commit")
+
+    async def die(*args):
+        pass
+
+    # The process dies right after the sale commits: nothing runs after it and the key's lock expires at once
+    monkeypatch.setattr(settings, "SALES_GROUP_COMMIT", group_commit)
+    monkeypatch.setattr(settings, "IDEMPOTENCY_LOCK_TIMEOUT", 0)
+    monkeypatch.setattr(sales.table_versions, "bump", crash)
+    monkeypatch.setattr(idempotency, "_finish", die)
+    with pytest.raises(RuntimeError):
+        await client.post(f"{API}/sales", json=order, headers={"Idempotency-Key": "order-1"})
+    monkeypatch.undo()
+
+    replay = await client.post(f"{API}/sales", json=order, headers={"Idempotency-Key": "order-1"})
+    assert replay.status_code == 201
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    inventory = (await client.get(f"{API}/inventory/batch", params={"ids": product["id"], "by_product": True})).json()
+    assert inventory[product["id"]]["stock_quantity"] == 9
+    assert len((await client.get(f"{API}/sales/all")).json()) == 1
@@ -0,0 +1,87 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, insert, select
+
+from database.db import engine
+from models import Inventory, InventoryChange, InventoryChangeArchive
+from models.types import uuid7
+from tests.conftest import API, create_stocked_product
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_second_inventory_for_product_conflicts(client):
+    product = await create_stocked_product(client)
+    response = await client.post(f"{API}/inventory", json={"product_id": product["id"], "stock_quantity": 5})
+    assert response.status_code == 409
+
+
+@pytest.mark.parametrize("product_id", ["not-a-uuid", "0192d3a4-5b6c-7d8e-9f01-23456789abcd"])
+async def test_inventory_for_unknown_product_is_not_found(client, product_id):
+    response = await client.post(f"{API}/inventory", json={"product_id": product_id, "stock_quantity": 5})
+    assert response.status_code == 404
+
+
+@pytest.mark.parametrize("day_format", ["%Y-%m-%d", "%Y%m%d"])
+async def test_changes_end_date_includes_that_day(client, day_format):
+    product = await create_stocked_product(client)
+    inventory = (await client.get(f"{API}/inventory/batch", params={"ids": product["id"], "by_product": True})).json()
+    today = date.today().strftime(day_format)
+
+    changes = await client.get(
+        f"{API}/inventory/change", params={"inventory_id": inventory[product["id"]]["id"], "end": today}
+    )
+    assert changes.status_code == 200
+    assert len(changes.json()) == 1
+
+
+async def test_changes_include_archived_changes(client):
+    product = await create_stocked_product(client)
+    await client.put(f"{API}/inventory", params={"product_id": product["id"], "quantity": -1})
+    inventory_id = (await client.get(
+        f"{API}/inventory/batch", params={"ids": product["id"], "by_product": True}
+    )).json()[product["id"]]["id"]
+    async with engine.begin() as connection:
+        opening = (await connection.execute(
+            select(InventoryChange).where(InventoryChange.current_stock == 10)
+        )).one()
+        await connection.execute(insert(InventoryChangeArchive).values(**opening._mapping))
+        await connection.execute(delete(InventoryChange).where(InventoryChange.id == opening.id))
+
+    for fast in (False, True):
+        params = {"inventory_id": inventory_id, "limit": 1, "fast": fast}
+        first = await client.get(f"{API}/inventory/change", params=params)
+        second = await client.get(
+            f"{API}/inventory/change", params={**params, "cursor": first.headers["X-Next-Cursor"]}
+        )
+        assert [change["current_stock"] for change in first.json() + second.json()] == [10, 9]
+
+
+async def test_change_series_keeps_peaks_and_dips_when_downsampled(client):
+    await create_stocked_product(client)
+    start = datetime(2024, 1, 1)
+    # A sawtooth around 50 with one spike and one dip the chart must not lose
+    levels = [50 + i % 5 for i in range(200)]
+    levels[77], levels[143] = 500, 0
+    async with engine.begin() as connection:
+        inventory_id = (await connection.execute(select(Inventory.id))).scalar()
+        await connection.execute(insert(InventoryChange), [
+            {
+                "id": uuid7(start + timedelta(minutes=i)), "inventory_id": inventory_id,
+                "old_stock": levels[i - 1] if i else 10, "current_stock": level,
+                "created_at": start + timedelta(minutes=i), "updated_at": start, "is_active": True
+            }
+            for i, level in enumerate(levels)
+        ])
+    params = {"inventory_id": inventory_id, "start": "2024-01-01", "end": "2024-01-01"}
+
+    chart = (await client.get(f"{API}/inventory/change/series", params={**params, "points": 10})).json()
+    assert chart["total_changes"] == 200
+    assert len(chart["stock"]) <= 10
+    assert chart["stock"][0] == levels[0] and chart["stock"][-1] == levels[-1]
+    assert max(chart["stock"]) == 500 and min(chart["stock"]) == 0
+    assert chart["timestamps"] == sorted(chart["timestamps"])
+
+    full = (await client.get(f"{API}/inventory/change/series", params={**params, "points": 200})).json()
+    assert full["stock"] == levels
@@ -0,0 +1,78 @@
+from datetime import datetime
+
+import pytest
+
+from tests.conftest import API, create_stocked_product, insert_sales
+
+pytestmark = pytest.mark.anyio
+
+
+async def walk(client, path: str, limit: int, **params) -> list:
+    """
+    Follows X-Next-Cursor from the first page to the last
+    :return: list of pages, each a list of ids
+    """
+    pages, cursor = [], None
+    while True:
+        page_params = {**params, "limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = await client.get(f"{API}{path}", params=page_params)
+        assert response.status_code == 200
+        pages.append([item["id"] for item in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+
+
+async def test_cursors_walk_every_list_in_creation_order(client):
+    for i in range(5):
+        await client.post(f"{API}/category", json={"name": f"Category {i}"})
+        await create_stocked_product(client)
+    products = (await client.get(f"{API}/product")).json()
+    await client.post(f"{API}/sales", json=[
+        {"product_id": product["id"], "quantity": 1, "amount": 25} for product in products
+    ])
+    today = datetime.now().date().isoformat()
+
+    for path, params in (
+            ("/category", {}), ("/product", {}), ("/product", {"fast": True}), ("/inventory", {}),
+            ("/inventory", {"fast": True}), ("/sales/all", {}), ("/sales/all", {"fast": True}),
+            ("/sales", {"start_date": today, "end_date": today}),
+            ("/sales", {"start_date": today, "end_date": today, "fast": True})
+    ):
+        pages = await walk(client, path, 2, **params)
+        assert [len(page) for page in pages] == [2, 2, 1], path
+        everything = (await client.get(f"{API}{path}", params={**params, "limit": 50})).json()
+        assert sum(pages, []) == [item["id"] for item in everything], path
+
+
+async def test_cursor_breaks_creation_time_ties_by_id(client):
+    product = await create_stocked_product(client)
+    moment = datetime(2024, 3, 5, 12)
+    await insert_sales(product, [(moment, 1, 25)] * 5)
+
+    pages = await walk(client, "/sales", 2, start_date="2024-03-05", end_date="2024-03-05")
+    ids = sum(pages, [])
+    assert len(ids) == len(set(ids)) == 5
+    assert ids == sorted(ids)
+
+
+async def test_full_last_page_ends_with_an_empty_page(client):
+    for i in range(4):
+        await client.post(f"{API}/category", json={"name": f"Category {i}"})
+    assert [len(page) for page in await walk(client, "/category", 2)] == [2, 2, 0]
+
+
+async def test_cursor_takes_precedence_over_offset(client):
+    for i in range(4):
+        await client.post(f"{API}/category", json={"name": f"Category {i}"})
+    first = await client.get(f"{API}/category", params={"limit": 1})
+    second = await client.get(
+        f"{API}/category", params={"limit": 2, "offset": 3, "cursor": first.headers["X-Next-Cursor"]}
+    )
+    assert [category["name"] for category in second.json()] == ["Category 1", "Category 2"]
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "WyJ4Il0"])
+async def test_invalid_cursor_is_rejected(client, cursor):
+    response = await client.get(f"{API}/category", params={"cursor": cursor})
+    assert response.status_code == 400
@@ -0,0 +1,21 @@
+import pytest
+
+from tests.conftest import API
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_only_product_pages_are_cached(client):
+    for name in ("Desk lamp", "Floor lamp", "Wall lamp"):
+        await client.post(f"{API}/product", json={"name": name, "price": 25})
+
+    await client.get(f"{API}/product")
+    assert (await client.get("/cache/stats")).json()["product"]["entries"] == 0
+
+    first = await client.get(f"{API}/product", params={"limit": 2})
+    cached = await client.get(f"{API}/product", params={"limit": 2})
+    stats = (await client.get("/cache/stats")).json()["product"]
+    assert stats["entries"] == 1
+    assert stats["hits"] >= 1
+    assert cached.json() == first.json()
+    assert cached.headers["X-Next-Cursor"] == first.headers["X-Next-Cursor"]
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from common.pagination import paginate
+from database.db import engine
+from models import Inventory, Product, Sales
+from routes.inventory import adjust_stock_statement, inventory_changes_query, inventory_query
+from routes.product import category_exists_query, products_query
+from routes.sales import all_sales_query, decrement_stock_statement, order_products_query, sales_query
+from tests.conftest import API
+
+pytestmark = pytest.mark.anyio
+
+
+def route_queries(product_id: str, category_id: str, inventory_id: str) -> dict:
+    """
+    Statements issued by the routes, built with the same functions the routes use, keyed by a readable name
+    :param product_id: str
+    :param category_id: str
+    :param inventory_id: str
+    :return: dict of name to Select or Update
+    """
+    end = datetime.now()
+    start = end - timedelta(days=7)
+    return {
+        "GET /sales": paginate(sales_query(start, end, None, None, columns=False), Sales, 100),
+        "GET /sales?fast": paginate(sales_query(start, end, None, None, columns=True), Sales, 100),
+        "GET /sales?product_id": paginate(sales_query(start, end, product_id, None, columns=False), Sales, 100),
+        "GET /sales?category_id": paginate(sales_query(start, end, None, category_id, columns=False), Sales, 100),
+        "GET /sales/all": paginate(all_sales_query(columns=False), Sales, 10),
+        "GET /sales/all?fast": paginate(all_sales_query(columns=True), Sales, 10),
+        "POST /sales products": order_products_query([product_id]),
+        "POST /sales stock": decrement_stock_statement({product_id: 1}, end),
+        "GET /inventory": paginate(inventory_query(None, fast=False), Inventory, 100),
+        "GET /inventory?fast": paginate(inventory_query(None, fast=True), Inventory, 100),
+        "PUT /inventory": adjust_stock_statement(product_id, 1, None, end),
+        "GET /inventory/change": inventory_changes_query(inventory_id, None, None, 100, None),
+        "GET /product": paginate(products_query(None, fast=False), Product, 100),
+        "GET /product?fast": paginate(products_query(None, fast=True), Product, 100),
+        "GET /product?category_id": paginate(products_query(category_id, fast=False), Product, 100),
+        "POST /product": category_exists_query(category_id),
+    }
+
+
+def sequential_scans(dialect: str, plan: list) -> list:
+    """
+    Returns the plan lines that read a whole table
+    :param dialect: str
+    :param plan: list of plan lines
+    :return: list
+    """
+    if dialect == "postgresql":
+        return [line for line in plan if "Seq Scan" in line]
+    return [line for line in plan if line.startswith("SCAN") and "USING" not in line]
+
+
+async def test_route_queries_use_indexes(client):
+    category = (await client.post(f"{API}/category", json={"name": "Lighting"})).json()
+    product = (await client.post(
+        f"{API}/product", json={"name": "Desk lamp", "price": 25, "category_id": category["id"]}
+    )).json()
+    inventory = (await client.post(f"{API}/inventory", json={"product_id": product["id"], "stock_quantity": 10})).json()
+    await client.post(f"{API}/sales", json=[{"product_id": product["id"], "quantity": 1, "amount": 25}])
+
+    failures = {}
+    async with engine.connect() as connection:
+        dialect = connection.dialect.name
+        explain = "EXPLAIN" if dialect == "postgresql" else "EXPLAIN QUERY PLAN"
+        for name, query in route_queries(product["id"], category["id"], inventory["id"]).items():
+            compiled = query.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True})
+            plan = await connection.execute(text(f"{explain} {compiled}"))
+            scans = sequential_scans(dialect, [str(row[-1]).strip() for row in plan.all()])
+            if scans:
+                failures[name] = scans
+    assert failures == {}
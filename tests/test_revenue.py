@@ -0,0 +1,98 @@
+from datetime import date, datetime
+
+import pytest
+
+from database.db import engine
+from models import FxRate
+from scripts.backfill_rollups import backfill
+from tests.conftest import API, create_stocked_product, insert_sales
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_sales_without_exchange_rate_are_reported_unconverted(client):
+    for name, currency, amount in (("Kettle", "USD", 30), ("Toaster", "EUR", 20)):
+        product = (await client.post(f"{API}/product", json={"name": name, "price": amount, "currency": currency}))
+        product = product.json()
+        await client.post(f"{API}/inventory", json={"product_id": product["id"], "stock_quantity": 5})
+        await client.post(f"{API}/sales", json=[{"product_id": product["id"], "quantity": 1, "amount": amount}])
+    today = date.today().isoformat()
+
+    revenue = await client.get(f"{API}/sales/revenue", params={"period": "daily", "date": today})
+    assert revenue.status_code == 200
+    assert revenue.json() == {"revenue": 30.0, "currency": "USD", "unconverted": {"EUR": 20.0}}
+
+    top = await client.get(f"{API}/sales/top", params={"start_date": today, "end_date": today})
+    assert top.status_code == 200
+    assert top.json()["unconverted"] == {"EUR": 20.0}
+
+    dashboard = (await client.get(f"{API}/dashboard")).json()
+    assert dashboard["failed"] == {}
+    assert dashboard["revenue"]["daily"] == 30.0
+    assert dashboard["unconverted"]["revenue.daily"] == {"EUR": 20.0}
+
+
+async def test_revenue_is_converted_at_the_latest_rate_of_the_range(client):
+    async with engine.begin() as connection:
+        await connection.execute(FxRate.__table__.insert(), [
+            {"currency": "EUR", "day": date(2024, 3, 1), "rate": 1.1},
+            {"currency": "EUR", "day": date(2024, 3, 20), "rate": 1.5},
+            {"currency": "JPY", "day": date(2024, 3, 1), "rate": 0.01}
+        ])
+    for name, currency, amount in (("Kettle", "USD", 30), ("Toaster", "EUR", 20), ("Teapot", "JPY", 1000)):
+        product = (await client.post(f"{API}/product", json={"name": name, "price": amount, "currency": currency}))
+        await insert_sales(product.json(), [(datetime(2024, 3, 10, 12), 1, amount)])
+    await backfill()
+
+    def revenue(**params):
+        return client.get(f"{API}/sales/revenue", params=params)
+
+    daily = (await revenue(period="daily", date="2024-03-10")).json()
+    assert daily == {"revenue": 62.0, "currency": "USD", "unconverted": {}}
+    # The month is converted at the rate of its last day, which a later EUR rate replaced
+    assert (await revenue(period="monthly", month="2024-03")).json()["revenue"] == 70.0
+    assert (await revenue(period="daily", date="2024-03-10", target_currency="EUR")).json()["revenue"] == 56.36
+    # Yen have no minor unit
+    assert (await revenue(period="daily", date="2024-03-10", target_currency="JPY")).json()["revenue"] == 6200
+
+    top = (await client.get(f"{API}/sales/top", params={"start_date": "2024-03-01", "end_date": "2024-03-15"})).json()
+    assert [item["revenue"] for item in top["items"]] == [30, 22, 10]
+
+    missing = await revenue(period="daily", date="2024-03-10", target_currency="GBP")
+    assert missing.status_code == 422
+
+
+async def test_series_buckets_are_dense_and_zero_filled(client):
+    lamp = await create_stocked_product(client)
+    other = await create_stocked_product(client)
+    await insert_sales(lamp, [
+        (datetime(2024, 1, 31, 12), 1, 10), (datetime(2024, 2, 27, 8), 1, 25),
+        (datetime(2024, 3, 5, 9), 2, 50), (datetime(2024, 3, 10, 23), 1, 25)
+    ])
+    await insert_sales(other, [(datetime(2024, 3, 5, 10), 4, 100)])
+    await backfill()
+    params = {"start_date": "2024-02-28", "end_date": "2024-03-12", "product_id": lamp["id"]}
+
+    weekly = (await client.get(f"{API}/sales/revenue/series", params={**params, "period": "weekly"})).json()
+    # Weeks start on Monday, the first bucket begins before the start date but only sums days from it on
+    assert weekly["bucket_starts"] == ["2024-02-26", "2024-03-04", "2024-03-11"]
+    assert weekly["revenue"] == [0, 75, 0]
+    assert weekly["units"] == [0, 3, 0]
+
+    params = {**params, "start_date": "2024-01-01", "period": "monthly"}
+    monthly = (await client.get(f"{API}/sales/revenue/series", params=params)).json()
+    assert monthly["bucket_starts"] == ["2024-01-01", "2024-02-01", "2024-03-01"]
+    assert monthly["revenue"] == [10, 25, 75]
+
+    daily = (await client.get(f"{API}/sales/revenue/series", params={
+        "start_date": "2024-03-04", "end_date": "2024-03-06", "period": "daily"
+    })).json()
+    assert daily["revenue"] == [0, 150, 0]
+    assert daily["units"] == [0, 6, 0]
+
+
+async def test_series_rejects_an_end_before_the_start(client):
+    response = await client.get(f"{API}/sales/revenue/series", params={
+        "start_date": "2024-03-05", "end_date": "2024-03-04", "period": "daily"
+    })
+    assert response.status_code == 422
@@ -0,0 +1,36 @@
+from datetime import date
+
+import pytest
+
+from tests.conftest import API, create_stocked_product
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_empty_basket_places_no_sales(client):
+    response = await client.post(f"{API}/sales", json=[])
+    assert response.status_code == 201
+    assert response.json() == []
+
+
+@pytest.mark.parametrize("quantity", [0, -3])
+async def test_orders_without_a_positive_quantity_are_rejected(client, quantity):
+    product = await create_stocked_product(client)
+    response = await client.post(
+        f"{API}/sales", json=[{"product_id": product["id"], "quantity": quantity, "amount": 25}]
+    )
+    assert response.status_code == 422
+    inventory = (await client.get(f"{API}/inventory/batch", params={"ids": product["id"], "by_product": True})).json()
+    assert inventory[product["id"]]["stock_quantity"] == 10
+
+
+async def test_sales_end_date_includes_that_day(client):
+    product = await create_stocked_product(client)
+    await client.post(f"{API}/sales", json=[{"product_id": product["id"], "quantity": 1, "amount": 25}])
+    today = date.today()
+
+    for end in (today.isoformat(), today.strftime("%Y%m%d")):
+        sales = await client.get(f"{API}/sales", params={"start_date": today.isoformat(), "end_date": end})
+        assert len(sales.json()) == 1
+    before = await client.get(f"{API}/sales", params={"start_date": today.isoformat(), "end_date": f"{today}T00:00"})
+    assert before.json() == []
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from common.enums import UnitQuantity
+from config.config import settings
+from database.db import engine
+from models import Product
+from models.types import uuid7
+from tests.conftest import API
+
+pytestmark = pytest.mark.anyio
+
+
+async def search(client, q: str, **params):
+    response = await client.get(f"{API}/product/search", params={"q": q, **params})
+    assert response.status_code == 200
+    return response
+
+
+async def test_name_prefixes_outrank_word_prefixes_and_fuzzy_matches(client):
+    for name, description in (
+        ("Lamp shade", None), ("Desk lamp", None), ("Lampshade cleaner", None), ("Chair", "Comes with a lamp"),
+        ("Lamb rug", None), ("Table", None)
+    ):
+        await client.post(f"{API}/product", json={"name": name, "description": description, "price": 10})
+
+    results = (await search(client, "lamp")).json()
+    assert [(product["name"], product["score"]) for product in results] == [
+        ("Lamp shade", 1.0), ("Lampshade cleaner", 1.0), ("Desk lamp", 0.9), ("Lamb rug", 0.48), ("Chair", 0.4)
+    ]
+
+
+async def test_pages_follow_the_cursor_without_repeats(client):
+    for i in range(5):
+        await client.post(f"{API}/product", json={"name": f"Lamp {i}", "price": 10})
+
+    first = await search(client, "lamp", limit=3)
+    second = await search(client, "lamp", limit=3, cursor=first.headers["X-Next-Cursor"])
+    names = [product["name"] for product in first.json() + second.json()]
+    assert sorted(names) == [f"Lamp {i}" for i in range(5)]
+    assert "X-Next-Cursor" not in second.headers
+
+
+async def test_punctuation_in_names_is_ignored(client):
+    await client.post(f"{API}/product", json={"name": "Desk-Lamp (LED)", "price": 10})
+    results = (await search(client, "desk lamp")).json()
+    assert [(product["name"], product["score"]) for product in results] == [("Desk-Lamp (LED)", 1.0)]
+
+
+async def test_refresh_finds_products_whatever_their_id_and_creation_time(client, monkeypatch):
+    await client.post(f"{API}/product", json={"name": "Desk lamp", "price": 10})
+    assert len((await search(client, "lamp")).json()) == 1
+
+    # A migrated random key, and a bulk loaded row whose key and creation time are both from last year
+    now = datetime.now()
+    last_year = now - timedelta(days=400)
+    loaded = [
+        ("Floor lamp", "0012ab34-2f4d-4e6b-9a1c-5d8f7e6a4b3c", now), ("Wall lamp", uuid7(last_year), last_year)
+    ]
+    async with engine.begin() as connection:
+        await connection.execute(insert(Product), [
+            {
+                "id": id, "name": name, "price": 10, "currency": "USD", "unit": UnitQuantity.UNIT,
+                "created_at": created_at, "updated_at": created_at, "is_active": True
+            }
+            for name, id, created_at in loaded
+        ])
+    monkeypatch.setattr(settings, "PRODUCT_SEARCH_REFRESH_SECONDS", 0)
+
+    names = [product["name"] for product in (await search(client, "lamp")).json()]
+    assert sorted(names) == ["Desk lamp", "Floor lamp", "Wall lamp"]
@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert, select, update
+
+from database.db import engine
+from models import Inventory, InventoryChange
+from models.types import uuid7
+from scripts.snapshot_inventory import compact, snapshot
+from tests.conftest import API, create_stocked_product
+
+pytestmark = pytest.mark.anyio
+
+# Stock of the product at points in its history, which starts on 2024-01-01 with 10 units
+EXPECTED = {"2024-01-01T12:00": 10, "2024-01-03": 7, "2024-01-04T10:00": 15, "2024-01-05": 15, "2024-01-07": 12}
+
+
+async def stock_at(client, at: str, **params) -> list:
+    response = await client.get(f"{API}/inventory/stock-at", params={"at": at, **params})
+    assert response.status_code == 200
+    return [item["stock_quantity"] for item in response.json()]
+
+
+async def test_stock_at_replays_changes_around_snapshots_and_archives(client):
+    product = await create_stocked_product(client)
+    async with engine.begin() as connection:
+        await connection.execute(update(Inventory).values(created_at=datetime(2024, 1, 1), stock_quantity=12))
+        await connection.execute(update(InventoryChange).values(created_at=datetime(2024, 1, 1)))
+        inventory_id = (await connection.execute(select(Inventory.id))).scalar()
+        await connection.execute(insert(InventoryChange), [
+            {
+                "id": uuid7(created_at), "inventory_id": inventory_id, "old_stock": old, "current_stock": current,
+                "created_at": created_at, "updated_at": created_at, "is_active": True
+            }
+            for created_at, old, current in (
+                (datetime(2024, 1, 2, 10), 10, 7), (datetime(2024, 1, 4, 10), 7, 15), (datetime(2024, 1, 6, 10), 15, 12)
+            )
+        ])
+
+    async def check():
+        for at, quantity in EXPECTED.items():
+            assert await stock_at(client, at) == [quantity], at
+        assert await stock_at(client, "2024-01-05", product_id=product["id"]) == [15]
+        # Inventory created after that time is left out
+        assert await stock_at(client, "2023-12-31") == []
+
+    # Without snapshots stock is replayed backward from the current level
+    await check()
+    await snapshot(datetime(2024, 1, 3))
+    await snapshot(datetime(2024, 1, 5))
+    await check()
+    assert await compact(datetime(2024, 1, 5)) == 3
+    await check()
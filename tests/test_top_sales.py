@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import pytest
+
+from scripts.backfill_rollups import backfill
+from tests.conftest import API, insert_sales
+
+pytestmark = pytest.mark.anyio
+
+RANGE = {"start_date": "2024-03-01", "end_date": "2024-03-31"}
+
+
+async def create_catalog(client) -> dict:
+    """
+    Registers four sold products in two categories, one unsold product and an empty category. By revenue they
+    rank Ceiling, Desk, Shovel, Rake; by units Shovel, Rake, Desk, Ceiling.
+    :param client: httpx.AsyncClient
+    :return: dict of name to product
+    """
+    categories = {}
+    for name in ("Lighting", "Garden", "Kitchen"):
+        categories[name] = (await client.post(f"{API}/category", json={"name": name})).json()
+    products = {}
+    for name, category in (
+            ("Ceiling", "Lighting"), ("Desk", "Lighting"), ("Shovel", "Garden"), ("Rake", "Garden"),
+            ("Kettle", "Kitchen")
+    ):
+        products[name] = (await client.post(f"{API}/product", json={
+            "name": name, "price": 1, "category_id": categories[category]["id"]
+        })).json()
+    for name, quantity, amount in (("Ceiling", 1, 70), ("Desk", 2, 20), ("Shovel", 6, 6), ("Rake", 4, 4)):
+        await insert_sales(products[name], [(datetime(2024, 3, 10, 12), quantity, amount)])
+    await insert_sales(products["Kettle"], [(datetime(2024, 4, 2, 12), 3, 30)])
+    await backfill()
+    return {**products, **categories}
+
+
+async def test_products_are_ranked_and_classified_by_revenue(client):
+    catalog = await create_catalog(client)
+
+    response = await client.get(f"{API}/sales/top", params=RANGE)
+    assert response.status_code == 200
+    top = response.json()
+    assert [item["id"] for item in top["items"]] == [
+        catalog[name]["id"] for name in ("Ceiling", "Desk", "Shovel", "Rake")
+    ]
+    assert [(item["rank"], item["revenue"], item["abc_class"]) for item in top["items"]] == [
+        (1, 70, "A"), (2, 20, "A"), (3, 6, "B"), (4, 4, "C")
+    ]
+    assert top["classes"] == [
+        {"abc_class": "A", "count": 2, "share": 0.9},
+        {"abc_class": "B", "count": 1, "share": 0.06},
+        {"abc_class": "C", "count": 1, "share": 0.04}
+    ]
+    assert top["unsold"] == 1
+
+
+async def test_products_are_ranked_by_units(client):
+    catalog = await create_catalog(client)
+
+    top = (await client.get(f"{API}/sales/top", params={**RANGE, "metric": "units"})).json()
+    assert top["metric"] == "units"
+    assert [(item["id"], item["quantity"], item["abc_class"]) for item in top["items"]] == [
+        (catalog["Shovel"]["id"], 6, "A"), (catalog["Rake"]["id"], 4, "A"),
+        (catalog["Desk"]["id"], 2, "A"), (catalog["Ceiling"]["id"], 1, "B")
+    ]
+
+
+async def test_limit_keeps_the_classification_of_everything_sold(client):
+    catalog = await create_catalog(client)
+
+    top = (await client.get(f"{API}/sales/top", params={**RANGE, "limit": 1})).json()
+    assert [item["id"] for item in top["items"]] == [catalog["Ceiling"]["id"]]
+    assert [(summary["abc_class"], summary["count"]) for summary in top["classes"]] == [("A", 2), ("B", 1), ("C", 1)]
+    assert top["unsold"] == 1
+
+
+async def test_categories_are_ranked(client):
+    catalog = await create_catalog(client)
+
+    top = (await client.get(f"{API}/sales/top", params={**RANGE, "by": "category"})).json()
+    assert top["by"] == "category"
+    assert [(item["id"], item["revenue"], item["quantity"], item["abc_class"]) for item in top["items"]] == [
+        (catalog["Lighting"]["id"], 90, 3, "A"), (catalog["Garden"]["id"], 10, 10, "B")
+    ]
+    assert top["unsold"] == 1
+
+
+async def test_end_date_before_start_date_is_rejected(client):
+    response = await client.get(f"{API}/sales/top", params={"start_date": "2024-03-31", "end_date": "2024-03-01"})
+    assert response.status_code == 422